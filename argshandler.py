@@ -0,0 +1,171 @@
+"""Blackhole specific command-line arguments.
+"""
+import logging
+import argparse
+
+from astrocats.catalog.argshandler import ArgsHandler
+
+from .entry_store import ENTRY_STORE
+from .utils.progress import PROGRESS_MODE
+from .validation import VALIDATION
+
+
+def _positive_int(value):
+    """Argument type for a positive integer (e.g. `--sample`).
+    """
+    try:
+        num = int(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{}' is not an integer".format(value))
+    if num <= 0:
+        raise argparse.ArgumentTypeError("must be positive, not {}".format(num))
+    return num
+
+
+def _unit_fraction(value):
+    """Argument type for a fraction in (0.0, 1.0] (e.g. `--sample-fraction`).
+    """
+    try:
+        frac = float(value)
+    except ValueError:
+        raise argparse.ArgumentTypeError("'{}' is not a number".format(value))
+    if not (0.0 < frac <= 1.0):
+        raise argparse.ArgumentTypeError("must be in (0.0, 1.0], not {}".format(frac))
+    return frac
+
+
+class BH_ArgsHandler(ArgsHandler):
+    """Add blackhole-catalog specific arguments to the standard `ArgsHandler`.
+    """
+
+    def run_subcommand(self, args, catalog):
+        if args.subcommand == 'prefetch':
+            self.log.log(logging.WARNING, "Running 'prefetch'.")
+            catalog.prefetch()
+            return
+
+        return super().run_subcommand(args, catalog)
+
+    def _add_parser_arguments_import(self, subparsers):
+        import_pars = super()._add_parser_arguments_import(subparsers)
+        self._add_parser_arguments_prefetch(subparsers)
+
+        # Row sampling (see `utils.sampling.RowSampler`)
+        # ----------------------------------------------
+        import_pars.add_argument(
+            '--sample', dest='sample', type=_positive_int, default=None,
+            help='Import (approximately) this many rows from each task, chosen deterministically.')
+        import_pars.add_argument(
+            '--sample-fraction', dest='sample_fraction', type=_unit_fraction, default=None,
+            help='Import this fraction of rows from each task, chosen deterministically.')
+        import_pars.add_argument(
+            '--sample-seed', dest='sample_seed', type=int, default=0,
+            help='Seed used to choose rows when sampling.')
+
+        # Checkpoints (see `utils.checkpoint.TaskCheckpoint`)
+        # --------------------------------------------------
+        import_pars.add_argument(
+            '--resume', dest='resume', default=False, action='store_true',
+            help='Continue each task from its last checkpoint (if any), skipping completed tasks.')
+
+        # Progress reporting (see `utils.progress`)
+        # -----------------------------------------
+        import_pars.add_argument(
+            '--progress', dest='progress', default=PROGRESS_MODE.AUTO,
+            choices=[PROGRESS_MODE.AUTO, PROGRESS_MODE.BAR, PROGRESS_MODE.LOG, PROGRESS_MODE.NONE],
+            help="How task progress is shown: 'auto' uses a progress bar when run in a terminal, "
+                 "and otherwise periodic log lines with `--verbose` or `--debug` (none if not).")
+        import_pars.add_argument(
+            '--progress-interval', dest='progress_interval', type=float, default=None,
+            help='Seconds between progress log lines.')
+
+        # Entry storage (see `entry_store`)
+        # --------------------------------
+        import_pars.add_argument(
+            '--entry-store', dest='entry_store', default=ENTRY_STORE.MEMORY,
+            choices=[ENTRY_STORE.MEMORY, ENTRY_STORE.SQLITE],
+            help='Backend used to hold entries in memory, or in an on-disk SQLite database.')
+        import_pars.add_argument(
+            '--entry-store-path', dest='entry_store_path', default=None,
+            help='Filename for the SQLite entry store (default: temporary file).')
+        import_pars.add_argument(
+            '--entry-cache-size', dest='entry_cache_size', type=int, default=None,
+            help='Number of entries kept in memory by the SQLite entry store.')
+
+        # Parallel parsing of large inputs (see `utils.delimited`)
+        # --------------------------------------------------------
+        import_pars.add_argument(
+            '--parse-processes', dest='parse_processes', type=int, default=None,
+            help='Number of processes used to parse large input tables (default: number of CPUs).')
+        import_pars.add_argument(
+            '--lazy-rows', dest='lazy_rows', default=False, action='store_true',
+            help='Keep the rows of large input tables unparsed until their entries are journaled.')
+
+        # Validation (see `validation`)
+        # -----------------------------
+        import_pars.add_argument(
+            '--validation', dest='validation', default=VALIDATION.STRICT,
+            choices=[VALIDATION.STRICT, VALIDATION.DEFERRED, VALIDATION.ARCHIVED],
+            help="When additions to entries are validated: 'strict' immediately, 'deferred' in "
+                 "batches before saving and at the end of each task, 'archived' deferred only "
+                 "for tasks using archived data.")
+
+        # Task scheduling (see `scheduler`)
+        # ---------------------------------
+        import_pars.add_argument(
+            '--task-workers', dest='task_workers', type=int, default=1,
+            help='Maximum number of tasks run at the same time, in the order allowed by their '
+                 '`depends_on` fields in tasks.json.')
+
+        # Memory profiling (see `utils.memory`)
+        # -------------------------------------
+        import_pars.add_argument(
+            '--memory-profile', dest='memory_profile', default=False, action='store_true',
+            help='Record memory use of each task and phase in the run report.')
+        import_pars.add_argument(
+            '--memory-top', dest='memory_top', type=int, default=None,
+            help='Number of top allocation sites recorded for each phase.')
+
+        return import_pars
+
+    def _add_parser_arguments_prefetch(self, subparsers):
+        """Create parser for the 'prefetch' subcommand, which downloads task inputs in advance.
+
+        Tasks are selected with the same arguments as for 'import'.
+        """
+        prefetch_pars = subparsers.add_parser(
+            "prefetch", help="Download the remote inputs of all active tasks into their caches.")
+        prefetch_pars.set_defaults(load_stubs=False, delete_old=False, travis=False)
+
+        prefetch_pars.add_argument(
+            '--update', '-u', dest='update', default=False, action='store_true',
+            help='Only prefetch inputs of update tasks.')
+        prefetch_pars.add_argument(
+            '--archived', '-a', dest='archived', default=False, action='store_true',
+            help='Only download inputs which are not already cached.')
+        prefetch_pars.add_argument(
+            '--prefetch-workers', dest='prefetch_workers', type=int, default=None,
+            help='Number of tasks downloading their inputs at the same time.')
+
+        # Control which 'tasks' are prefetched, as for 'import'
+        # -----------------------------------------------------
+        prefetch_pars.add_argument(
+            '--tasks', dest='args_task_list', nargs='*', default=None,
+            help='space delimited list of tasks to prefetch.')
+        prefetch_pars.add_argument(
+            '--yes', dest='yes_task_list', nargs='+', default=None,
+            help='space delimited list of tasks to turn on.')
+        prefetch_pars.add_argument(
+            '--no', dest='no_task_list', nargs='+', default=None,
+            help='space delimited list of tasks to turn off.')
+        prefetch_pars.add_argument(
+            '--min-task-priority', dest='min_task_priority', default=None,
+            help='minimum priority for a task to prefetch')
+        prefetch_pars.add_argument(
+            '--max-task-priority', dest='max_task_priority', default=None,
+            help='maximum priority for a task to prefetch')
+        prefetch_pars.add_argument(
+            '--task-groups', dest='task_groups', default=None,
+            help='predefined group(s) of tasks to prefetch.')
+
+        return prefetch_pars
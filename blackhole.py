@@ -5,11 +5,16 @@ import os
 import pyastroschema as pas
 
 import astrocats
-from astrocats.catalog.struct import ENTRY, Entry
+from astrocats.catalog.struct import ENTRY, Entry, QUANTITY
 from astrocats.catalog import struct, utils
 from astrocats import blackholes
+from astrocats.blackholes.columnar import PhotometryColumns, default_sort_key
+from astrocats.blackholes.validation import ValidationHook, validation_skipped
 
 
+# Arguments of `Entry.add_quantity` which are not fields of the quantity
+_ADD_QUANTITY_ARGS = ['check_for_dupes', 'compare_to_existing']
+
 PATH_BH_SCHEMA_INPUT = os.path.join(blackholes.PATH_BH_SCHEMA, "")
 # print("`PATH_BH_SCHEMA_INPUT` = '{}'".format(PATH_BH_SCHEMA_INPUT))
 
@@ -24,11 +29,159 @@ class Blackhole(Entry):
     """Single entry in the Blackhole catalog, representing a single Blackhole.
     """
 
+    # Rows of input data not yet added to the entry, and the keys they change (see `add_raw_row`)
+    _raw_rows = None
+    _raw_keys = frozenset()
+
     def __init__(self, catalog, name, stub=False):
         name = catalog.clean_entry_name(name)
         super().__init__(catalog, name, stub=stub)
         return
 
+    def add_quantity(self, quantities, value, source, **kwargs):
+        """Add a quantity, with repeated strings (units, descriptions, etc) interned.
+        """
+        interner = self.catalog.interner
+        interner.intern_kwargs(kwargs)
+        source = interner.intern(source)
+
+        # Use the compiled validators (see `schema_validators`) instead of generic validation
+        validators = self.catalog.schema_validators
+        if (validators is None) or self.catalog.validation.active:
+            return super().add_quantity(quantities, value, source, **kwargs)
+
+        checks = [validators.get(qq) for qq in utils.listify(quantities)]
+        if None in checks:
+            return super().add_quantity(quantities, value, source, **kwargs)
+
+        data = {kk: vv for kk, vv in kwargs.items() if kk not in _ADD_QUANTITY_ARGS}
+        data[QUANTITY.VALUE] = value
+        data[QUANTITY.SOURCE] = source
+        for check in checks:
+            check(data)
+
+        # Keep any default values set during validation
+        for kk, vv in data.items():
+            if (kk not in kwargs) and (kk != QUANTITY.VALUE) and (kk != QUANTITY.SOURCE):
+                kwargs[kk] = vv
+
+        with validation_skipped(utils.listify(quantities)):
+            return super().add_quantity(quantities, value, source, **kwargs)
+
+    def add_photometry(self, compare_to_existing=True, **kwargs):
+        """Add photometry, which is stored in a compact `columnar.PhotometryColumns` table.
+
+        Repeated strings (bands, units, descriptions, etc) are interned.
+        """
+        self.catalog.interner.intern_kwargs(kwargs)
+        retval = super().add_photometry(compare_to_existing=compare_to_existing, **kwargs)
+        # Convert a newly created (or loaded) list of photometry into a table
+        phot = self.get(self._KEYS.PHOTOMETRY)
+        if (phot is not None) and not isinstance(phot, PhotometryColumns):
+            self[self._KEYS.PHOTOMETRY] = PhotometryColumns(
+                phot, categories=self.catalog.photometry_categories)
+        return retval
+
+    def save(self, *args, **kwargs):
+        """Save to JSON, with photometry converted back into a list of `Photometry` structures.
+
+        The base `save` (and `sanitize`) work on the list, which is then stored as a table again,
+        including any changes made by `sanitize` (e.g. sorting).  Any rows kept by `add_raw_row`
+        are added first.
+        """
+        self.materialize()
+        key = self._KEYS.PHOTOMETRY
+        phot = self.get(key)
+        if not isinstance(phot, PhotometryColumns):
+            return super().save(*args, **kwargs)
+
+        rows = phot.to_list()
+        # The rows were validated when they were added
+        with validation_skipped([key] * len(rows)):
+            self[key] = [BlackholePhotometry(self, key=key, **row) for row in rows]
+        try:
+            return super().save(*args, **kwargs)
+        finally:
+            rows = self.get(key)
+            if rows is not None:
+                self[key] = PhotometryColumns(rows, categories=phot.categories)
+
+    def sanitize(self):
+        """Sanitize before saving, with photometry sorted by `columnar.default_sort_key`.
+
+        The sort key of the base `Entry.sanitize` cannot compare photometry with and without
+        magnitudes (at the same time and band).
+        """
+        key = self._KEYS.PHOTOMETRY
+        phot = self.get(key)
+        if isinstance(phot, list):
+            self[key] = _PhotometryList(phot)
+        return super().sanitize()
+
+    def _init_cat_dict(self, cat_dict_class, key_in_self, **kwargs):
+        """Construct a structure, using the catalog's own class of each (see `STRUCT_CLASSES`).
+        """
+        cat_dict_class = STRUCT_CLASSES.get(cat_dict_class, cat_dict_class)
+        return super()._init_cat_dict(cat_dict_class, key_in_self, **kwargs)
+
+    def add_raw_row(self, spec, row, source):
+        """Keep a (prepared) row of input data, to be added with `spec.add_row` only when needed.
+
+        Large tables add many quantities to each entry which are not used again before the entry
+        is saved.  Instead of constructing them immediately, the entry keeps the compact row
+        (outside of its own data), until the rows are added by `materialize`.  The entry itself
+        does not include these values until then: the catalog materializes entries before they
+        are journaled, merged, or used by 'meta' tasks (see
+        `BlackholeCatalog.materialize_entries`), and entries are materialized whenever they are
+        saved or stored.  Accessing a key which the kept rows change (`entry[key]`, `entry.get`
+        or `key in entry`) also materializes the entry; iterating over the entry, or its `len`,
+        do not, and only include the values added so far.  Validation of the row values is
+        therefore also delayed until the entry is materialized.
+
+        Arguments
+        ---------
+        spec : `utils.ColumnSpec`
+        row : list of str
+            Row already processed with `spec.prepare_row`.
+        source : str
+            Source alias (or comma-separated aliases) for all values in the row.
+
+        """
+        if self._raw_rows is None:
+            self._raw_rows = []
+            with self.catalog.entries_lock:
+                self.catalog._raw_row_entries.add(self[self._KEYS.NAME])
+        self._raw_rows.append((spec, row, source))
+        self._raw_keys = self._raw_keys | spec.entry_keys
+        return
+
+    def materialize(self):
+        """Add all of the rows kept by `add_raw_row` to the entry (if there are any).
+        """
+        rows = self._raw_rows
+        if rows is None:
+            return
+        self._raw_rows = None
+        self._raw_keys = frozenset()
+        for spec, row, source in rows:
+            spec.add_row(self, row, source, prepared=True)
+        return
+
+    def __getitem__(self, key):
+        if key in self._raw_keys:
+            self.materialize()
+        return super().__getitem__(key)
+
+    def get(self, key, default=None):
+        if key in self._raw_keys:
+            self.materialize()
+        return super().get(key, default)
+
+    def __contains__(self, key):
+        if key in self._raw_keys:
+            self.materialize()
+        return super().__contains__(key)
+
     def add_self_source(self):
         return self.add_source(
             bibcode=self.catalog.OSC_BIBCODE,
@@ -69,6 +222,37 @@ class Blackhole(Entry):
         return outdir, filename
 
 
+class BlackholeQuantity(ValidationHook, struct.Quantity):
+    """Quantity of a `Blackhole`, validated following the catalog's validation mode.
+    """
+
+
+class BlackholePhotometry(ValidationHook, struct.Photometry):
+    """Photometry of a `Blackhole`, validated following the catalog's validation mode.
+    """
+
+
+class BlackholeSource(ValidationHook, struct.Source):
+    """Source of a `Blackhole`, validated following the catalog's validation mode.
+    """
+
+
+# Structures constructed by `Blackhole` entries in place of the generic ones (see `validation`)
+STRUCT_CLASSES = {
+    struct.Quantity: BlackholeQuantity,
+    struct.Photometry: BlackholePhotometry,
+    struct.Source: BlackholeSource,
+}
+
+
+class _PhotometryList(list):
+    """List of photometry which is always sorted by `columnar.default_sort_key`.
+    """
+
+    def sort(self, key=None, reverse=False):
+        return super().sort(key=default_sort_key, reverse=reverse)
+
+
 BLACKHOLE = Blackhole._KEYCHAIN
 Blackhole._KEYS = BLACKHOLE
 
@@ -93,3 +277,4 @@ class BH_MASS_METHODS:
     VIR_MGII = "virial (Mg-II)"
     VIR_CIV = "virial (C-IV)"
     VIR = "virial"
+    M_SIGMA = "M-sigma relation"
@@ -2,12 +2,28 @@
 """
 import os
 import re
+import json
+import time
 import shutil
 import glob
+import importlib
+import threading
+from collections import OrderedDict
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
 
 from astrocats.catalog.catalog import Catalog
+from astrocats.catalog.task import Task
 from astrocats.catalog import utils, schema
 from .blackhole import Blackhole, BLACKHOLE
+from .columnar import PhotometryCategories
+from .entry_store import init_entry_store
+from .validation import DeferredValidation
+from .scheduler import TaskGraph, load_task_dependencies
+from .schema_validators import SchemaValidators, SchemaResolutionError, schema_search_paths
+from .utils import StringInterner, RunReport, MemoryProfiler, sync_repos, REPO_ACTION
+from .utils import RemoteInputs, RetryPolicy, CircuitOpenError, ReferenceResolver
+from .utils import find_duplicates, task_progress
 from .production import blackhole_director
 from . import PATH_BH_SCHEMA
 
@@ -40,6 +56,7 @@ class BlackholeCatalog(Catalog):
     RAISE_ERROR_ON_ADDITION_FAILURE = True
 
     _EVENT_HTML_COLUMNS_CUSTOM = {
+        BLACKHOLE.MASS_BEST: ["Best Mass [log(<em>M</em><sub>&#9737;</sub>)] [kind]", 1.05],
         BLACKHOLE.MASS: ["Mass [log(<em>M</em><sub>&#9737;</sub>)] [kind]", 1.1],
         BLACKHOLE.ACTIVITY: ["AGN Activity", 1.2],
         BLACKHOLE.GALAXY_MORPHOLOGY: ["Gal. Type", 102],
@@ -53,6 +70,32 @@ class BlackholeCatalog(Catalog):
 
     STRUCTURES = [Blackhole]
 
+    # Remote URL of each data repository, formatted with the repository name (see `clone_repos`)
+    REPO_URL_TEMPLATE = "https://github.com/astrocatalogs/{}.git"
+    # Object filter used for partial clones (e.g. 'blob:none'), None for complete clones
+    REPO_CLONE_FILTER = None
+    # Number of repositories cloned or updated at the same time
+    REPO_WORKERS = 4
+    # Number of tasks downloading their inputs at the same time (see `prefetch`)
+    PREFETCH_WORKERS = 4
+
+    # Retries of failed downloads (`utils.RetryPolicy` arguments), by default and for given hosts,
+    # and the number of consecutive failures after which a host is skipped (see `utils.retry`)
+    REMOTE_RETRY = dict(attempts=4, backoff=1.0, max_backoff=30.0, connect_timeout=10.0,
+                        read_timeout=60.0, budget=20)
+    REMOTE_RETRY_HOSTS = {}
+    REMOTE_FAILURE_THRESHOLD = 3
+    # Headers sent with each download (see `download_url`)
+    DOWNLOAD_HEADERS = {
+        'User-Agent': ('Mozilla/5.0 (Macintosh; Intel Mac OS X 10_10_1) AppleWebKit/537.36 '
+                       '(KHTML, like Gecko) Chrome/39.0.2171.95 Safari/537.36')
+    }
+
+    # Task currently being run (see `current_task`)
+    _current_task = None
+    # Whether tasks are run concurrently (see `scheduler`)
+    _concurrent_tasks = False
+
 
     class PATHS(Catalog.PATHS):
         PATH_BASE = os.path.abspath(os.path.dirname(__file__))
@@ -61,20 +104,518 @@ class BlackholeCatalog(Catalog):
         """
         """
         log.debug("BlackholeCatalog.__init__()")
+        # Current task of each thread, with its memory-profiling phase, checkpoint and retries of
+        # downloads, and the duration of each task (see `current_task`)
+        self._task_local = threading.local()
+        self.task_durations = OrderedDict()
+        # `depends_on` of each task (see `scheduler`)
+        self._task_depends_on = {}
+        # Serializes changes to `entries` while tasks run concurrently, with the task which each
+        # entry belongs to, and the task each waiting task waits for (see `add_entry`)
+        self.entries_lock = threading.RLock()
+        self._entries_released = threading.Condition(self.entries_lock)
+        self._entry_owners = {}
+        self._entry_waits = {}
+        # Names of entries keeping rows of input data not yet added (see `materialize_entries`)
+        self._raw_row_entries = set()
         # Initialize super `astrocats.catalog.catalog.Catalog` object
         super().__init__(args, log)
 
         self.proto = Blackhole
         self.Director = blackhole_director.Blackhole_Director
+        # Replace the default `OrderedDict` of entries if another backend is requested
+        self.entries = init_entry_store(self)
+        # Shared instances of repeated strings in quantities and photometry (see `Blackhole`)
+        self.interner = StringInterner()
+        # Unique values of photometry fields, shared by the photometry tables of all entries
+        self.photometry_categories = PhotometryCategories()
+        # Source parameters of literature references, shared by all tasks
+        self.references = ReferenceResolver(self.interner)
+        # Report of this run, and memory profiling of each task and phase (`--memory-profile`)
+        self.report = RunReport(os.path.join(self.PATHS.PATH_OUTPUT, 'run-report.json'))
+        self.memory = MemoryProfiler(
+            self, self.report, enabled=getattr(args, 'memory_profile', False),
+            num_top=getattr(args, 'memory_top', None))
+        # Immediate or deferred validation of additions to entries (`--validation`)
+        self.validation = DeferredValidation(self)
+        # Retries and circuit breakers for downloads outside of tasks (each task has its own)
+        self._remote = self._new_remote()
 
         self.prep_schema()
+        # Validators for quantities compiled from the schema, or None if they are unavailable
+        self.schema_validators = self._load_schema_validators()
+        return
+
+    def import_data(self):
+        """Run all import tasks, then report the memory saved by string interning.
+
+        Tasks are run in order of priority by the base `Catalog`, unless any task declares
+        `depends_on`, or `--task-workers` is more than one, in which case they are run by the
+        task graph scheduler (see `scheduler`).  The critical path is reported either way.
+        """
+        workers = getattr(self.args, 'task_workers', None) or 1
+        self._load_task_list_from_file()
+        use_graph = (workers > 1) or any(dd is not None for dd in self._task_depends_on.values())
+        beg = time.monotonic()
+        try:
+            if use_graph:
+                retval = self._import_task_graph(workers)
+            else:
+                retval = super().import_data()
+            self.current_task = None
+        finally:
+            self.validation.end()
+            self.memory.stop_all()
+        self._report_tasks(workers if use_graph else None, time.monotonic() - beg)
+        self.log.info(self.interner.report())
+        return retval
+
+    def load_task_list(self):
+        """Load the tasks, and the graph of dependencies between those which are active.
+        """
+        tasks = super().load_task_list()
+        self.task_graph = TaskGraph(tasks, self._task_depends_on, self.log)
+        return tasks
+
+    def _load_task_list_from_file(self):
+        """Load the tasks from 'input/tasks.json', storing their `depends_on` fields separately.
+        """
+        fname = self.PATHS.TASK_LIST
+        self.log.debug("Loading task-list from '{}'".format(fname))
+        with open(fname, 'r') as inp:
+            data = json.load(inp)
+        self._task_depends_on = load_task_dependencies(data)
+
+        tasks = {}
+        task_names = []
+        for key, val in data.items():
+            tasks[key] = Task(name=key, **val)
+            task_names.append(key)
+        return tasks, task_names
+
+    def _import_task_graph(self, workers):
+        """Run all active tasks with the task graph scheduler, using up to `workers` threads.
+        """
+        self.load_task_list()
+        if self.args.delete_old:
+            self.log.warning("Deleting all old entry files.")
+            self.delete_old_entry_files()
+        if self.args.load_stubs or self.args.update:
+            self.load_stubs()
+
+        if (workers > 1) and not isinstance(self.entries, dict):
+            self.log.warning("Entry store '{}' can only be used by one task at a time, running "
+                             "tasks one after another".format(type(self.entries).__name__))
+            workers = 1
+        self._concurrent_tasks = (workers > 1)
+        if self._concurrent_tasks:
+            self.log.warning("Running up to {} tasks concurrently: tasks adding to the same "
+                             "entries run one after another".format(workers))
+
+        try:
+            with self.memory.phase('tasks'):
+                self.task_graph.run(self._run_task, workers=workers)
+        finally:
+            self._concurrent_tasks = False
+
+        self.journal_entries()
+        return
+
+    def _run_task(self, task):
+        """Run a single task (called by `TaskGraph.run`), then journal its entries.
+        """
+        self.log.warning("Task: '{}'".format(task.name))
+        mod = importlib.import_module('.' + task.module, package='astrocats')
+        try:
+            self.current_task = task
+            getattr(mod, task.function)(self)
+            num_events, num_stubs = self.count()
+            self.log.warning("Task '{}' finished.  Events: {},  Stubs: {}".format(
+                task.name, num_events, num_stubs))
+            self.journal_entries()
+        finally:
+            self._release_entries(task.name)
+            self.current_task = None
+        return
+
+    def _report_tasks(self, workers, duration):
+        """Add the duration of each task and the critical path to the run report.
+        """
+        graph = getattr(self, 'task_graph', None)
+        if graph is None:
+            return
+        path, total = graph.critical_path(self.task_durations)
+        self.log.info("Critical path: {} ({:.1f} s of {:.1f} s)".format(
+            " --> ".join(path), total, duration))
+
+        tasks = OrderedDict()
+        tasks['scheduler'] = 'priority' if workers is None else 'graph'
+        tasks['workers'] = workers or 1
+        tasks['duration'] = duration
+        tasks['durations'] = self.task_durations
+        tasks['depends_on'] = graph.deps
+        tasks['critical_path'] = path
+        tasks['critical_path_duration'] = total
+        self.report.set('tasks', tasks)
+        return
+
+    def prefetch(self):
+        """Download the remote inputs of all active tasks into their caches, concurrently.
+
+        Each task module may define a `prefetch(catalog)` function, which downloads all of its
+        inputs (including e.g. subpages discovered from a main page) following the same cache
+        behavior as the import, and returns the number of inputs and of failed downloads.  Tasks
+        run their `prefetch` functions at the same time (up to `--prefetch-workers`).  A
+        following `import --archived` then loads all inputs from the caches.
+        """
+        tasks = self.load_task_list()
+        workers = getattr(self.args, 'prefetch_workers', None) or self.PREFETCH_WORKERS
+        funcs = OrderedDict()
+        for name, task in tasks.items():
+            if not task.active:
+                continue
+            mod = importlib.import_module('.' + task.module, package='astrocats')
+            func = getattr(mod, 'prefetch', None)
+            if func is None:
+                self.log.debug("Task '{}' has no remote inputs".format(name))
+                continue
+            funcs[name] = (task, func)
+
+        def _prefetch(task, func):
+            beg = time.monotonic()
+            self.current_task = task
+            try:
+                num, failed = func(self)
+            except Exception as err:
+                self.log.error("Prefetch for task '{}' failed: {}".format(task.name, str(err)))
+                num, failed = None, None
+            finally:
+                self.current_task = None
+            return OrderedDict([('inputs', num), ('failed', failed),
+                                ('duration', time.monotonic() - beg)])
+
+        self.log.warning("Prefetching inputs of {} tasks".format(len(funcs)))
+        self._concurrent_tasks = True
+        try:
+            with ThreadPoolExecutor(max_workers=max(min(workers, len(funcs)), 1)) as pool:
+                futures = OrderedDict(
+                    (name, pool.submit(_prefetch, *funcs[name])) for name in funcs)
+                results = OrderedDict((name, fut.result()) for name, fut in futures.items())
+        finally:
+            self._concurrent_tasks = False
+
+        for name, res in results.items():
+            self.log.info("Prefetched task '{}': {} inputs, {} failed ({:.1f} s)".format(
+                name, res['inputs'], res['failed'], res['duration']))
+        self.report.set('prefetch', results)
+
+        failed = [name for name, res in results.items() if res['inputs'] is None or res['failed']]
+        if len(failed):
+            self.log.raise_error("Failed to prefetch inputs for tasks: {}".format(
+                ", ".join(failed)), RuntimeError)
+        return results
+
+    def download_url(self, url, timeout, fail=False, post=None, verify=True):
+        """Download text from the given url, retrying failures (see `utils.retry`).
+
+        Returns None on failure (unless `fail`), including when the host has failed repeatedly
+        during this task, so that `load_url` uses the cached file instead.
+        """
+        try:
+            return self.remote.request(url, post=post, verify=verify, timeout=timeout,
+                                       headers=self.DOWNLOAD_HEADERS)
+        except CircuitOpenError as err:
+            self.log.info(str(err))
+            if fail:
+                raise
+        except Exception as err:
+            self.log.error("Error on url '{}': '{}'.".format(url, str(err)))
+            if fail:
+                raise
+
+        return None
+
+    def add_entry(self, *args, **kwargs):
+        """Find or add an entry; serialized, as tasks may run concurrently (see `scheduler`).
+
+        While tasks run concurrently, each entry belongs to the task which added it, until that
+        task journals it or finishes.  A task adding an entry which belongs to another task waits
+        until it is released, so that tasks sharing entries never modify them at the same time.
+        Tasks waiting for each other's entries raise an error, as they must not run concurrently
+        (their order should be given with `depends_on`).
+        """
+        with self.entries_lock:
+            task = self.current_task if self._concurrent_tasks else None
+            if task is None:
+                return super().add_entry(*args, **kwargs)
+
+            while True:
+                # An entry belonging to another task is not a stub, and is only looked up here
+                name = super().add_entry(*args, **kwargs)
+                owner = self._entry_owners.get(name)
+                if (owner is None) or (owner == task.name):
+                    break
+                self._wait_for_entry(task.name, owner, name)
+
+            self._entry_owners[name] = task.name
+            return name
+
+    def _wait_for_entry(self, task_name, owner, name):
+        """Wait (holding `entries_lock`) until the entries of task `owner` are released.
+        """
+        other = owner
+        while other is not None:
+            if other == task_name:
+                self.log.raise_error(
+                    "Tasks '{}' and '{}' both add to entry '{}' (among others) and cannot run "
+                    "concurrently, declare a `depends_on` between them".format(
+                        task_name, owner, name), RuntimeError)
+            other = self._entry_waits.get(other)
+
+        self.log.info("Task '{}' waiting for entry '{}' of task '{}'".format(
+            task_name, name, owner))
+        self._entry_waits[task_name] = owner
+        try:
+            self._entries_released.wait()
+        finally:
+            del self._entry_waits[task_name]
+        return
+
+    def _release_entries(self, task_name, names=None):
+        """Release the given entries (by default all) of a task, to other waiting tasks.
+        """
+        with self.entries_lock:
+            if names is None:
+                names = [nn for nn, tt in self._entry_owners.items() if tt == task_name]
+            for name in names:
+                if self._entry_owners.get(name) == task_name:
+                    del self._entry_owners[name]
+            self._entries_released.notify_all()
+        return
+
+    def count(self):
+        with self.entries_lock:
+            return super().count()
+
+    def materialize_entries(self, task_name=None):
+        """Add the rows of input data kept by entries (with `--lazy-rows`) to those entries.
+
+        Entries don't include the values of rows kept by `Blackhole.add_raw_row` until they are
+        materialized, so this is done before entries are journaled (and their deferred validation
+        completed), before duplicates are merged, and before each 'meta' task.  With `task_name`,
+        entries belonging to other tasks are skipped (see `add_entry`).
+        """
+        with self.entries_lock:
+            owners = self._entry_owners
+            names = [nn for nn in self._raw_row_entries
+                     if (task_name is None) or (owners.get(nn, task_name) == task_name)]
+            self._raw_row_entries.difference_update(names)
+
+        for name in names:
+            entry = self.entries.get(name)
+            if entry is not None:
+                entry.materialize()
+        return
+
+    @property
+    def checkpoint(self):
+        """`utils.TaskCheckpoint` of the current task, if any, written on each `journal_entries`.
+        """
+        return getattr(self._task_local, 'checkpoint', None)
+
+    @checkpoint.setter
+    def checkpoint(self, checkpoint):
+        self._task_local.checkpoint = checkpoint
+
+    @property
+    def remote(self):
+        """Retries and circuit breakers for downloads (`utils.RemoteInputs`) of the current task.
+        """
+        return getattr(self._task_local, 'remote', None) or self._remote
+
+    def _new_remote(self):
+        return RemoteInputs(
+            self.log, policy=RetryPolicy(**self.REMOTE_RETRY),
+            host_policies={hh: RetryPolicy(**dict(self.REMOTE_RETRY, **kw))
+                           for hh, kw in self.REMOTE_RETRY_HOSTS.items()},
+            threshold=self.REMOTE_FAILURE_THRESHOLD)
+
+    @property
+    def current_task(self):
+        # Each thread has its own current task when tasks run concurrently
+        return getattr(self._task_local, 'task', self._current_task)
+
+    @current_task.setter
+    def current_task(self, task):
+        """Set the current task (of this thread), recording a memory-profiling phase for each.
+
+        Validation deferred during the previous task (see `validation`) is completed first.  Each
+        task has its own retries and circuit breakers for downloads (see `remote`).  The duration
+        of each task is recorded in `task_durations`.
+        """
+        self._current_task = task
+        local = getattr(self, '_task_local', None)
+        if local is None:
+            return
+        prev = getattr(local, 'task', None)
+        if prev is not None:
+            self.task_durations[prev.name] = time.monotonic() - local.started
+        local.task = task
+        local.started = time.monotonic()
+
+        # These don't exist yet if this is set during initialization
+        validation = getattr(self, 'validation', None)
+        memory = getattr(self, 'memory', None)
+        if (validation is None) or (memory is None):
+            return
+
+        local.remote = None if (task is None) else self._new_remote()
+        if (task is not None) and ('meta' in (task.groups or [])):
+            self.materialize_entries()
+        validation.end()
+        memory.stop(getattr(local, 'phase', None))
+        local.phase = None
+        if task is not None:
+            local.phase = memory.start("task:" + task.name)
+            validation.begin(task)
         return
 
+    def journal_entries(self, *args, **kwargs):
+        """Journal entries, then write the checkpoint for the current task (if there is one).
+
+        Kept rows of input data are added to entries, and any deferred validation is completed,
+        before entries are saved.  While tasks run concurrently, entries belonging to other tasks
+        (see `add_entry`) are skipped, and no entries are added by other tasks until this is done.
+        """
+        with self.entries_lock, self.memory.phase('journal_entries'):
+            task = self.current_task if self._concurrent_tasks else None
+            self.materialize_entries(None if (task is None) else task.name)
+            self.validation.flush()
+            checkpoint = self.checkpoint
+            if task is None:
+                retval = super().journal_entries(*args, **kwargs)
+            else:
+                retval = self._journal_task_entries(task.name, *args, **kwargs)
+            if checkpoint is not None:
+                checkpoint.journal()
+            return retval
+
+    def _journal_task_entries(self, task_name, *args, **kwargs):
+        """Journal (with `Catalog.journal_entries`) the entries not belonging to other tasks.
+
+        The journaled entries of this task are released to other tasks.
+        """
+        owners = self._entry_owners
+        names = [nn for nn in list(self.entries.keys()) if owners.get(nn, task_name) == task_name]
+        retval = Catalog.journal_entries(_EntriesSubset(self, names), *args, **kwargs)
+        self._release_entries(task_name, names)
+        return retval
+
+    def merge_duplicates(self):
+        """Merge and remove duplicate entries, i.e. entries sharing any name or alias.
+
+        Instead of comparing every pair of entries, groups of duplicates are found in a single
+        pass over all entries (see `utils.merge.find_duplicates`), and each group is merged once.
+        The number of groups and merged entries are added to the run report.
+        """
+        with self.memory.phase('merge_duplicates'):
+            if len(self.entries) == 0:
+                self.log.error("WARNING: `entries` is empty, loading stubs")
+                if self.args.update:
+                    self.log.warning("No sources changed, entry files unchanged in update.  "
+                                     "Skipping merge.")
+                    return
+                self.load_stubs()
+
+            self.materialize_entries()
+            beg = time.monotonic()
+            groups = find_duplicates(self)
+            self.log.info("Found {} groups of duplicates ({} entries) in {:.2f} s".format(
+                len(groups), sum(len(gg) for gg in groups), time.monotonic() - beg))
+            if self.args.travis:
+                groups = groups[:self.TRAVIS_QUERY_LIMIT]
+
+            num_merged = 0
+            with task_progress(self, total=len(groups), unit='groups') as progress:
+                for group in groups:
+                    num_merged += self._merge_group(group)
+                    progress.update(1)
+
+            merge = OrderedDict()
+            merge['groups'] = len(groups)
+            merge['merged'] = num_merged
+            merge['duration'] = time.monotonic() - beg
+            self.report.set('merge_duplicates', merge)
+        return
+
+    def _merge_group(self, names):
+        """Merge a group of duplicate entries into one, returning the number of entries removed.
+
+        As in `Catalog.merge_duplicates`, each entry is loaded from its file (which is deleted),
+        and they are copied into the entry with the most names starting with one of its
+        `priority_prefixes` (the last in sorted order, if tied).
+        """
+        loaded = OrderedDict()
+        for name in sorted(names):
+            # Entries are merged below, not when loaded (`merge=False`)
+            entry = self.proto.init_from_file(self, name=name, merge=False)
+            if entry is None:
+                self.log.warning("Duplicate '{}' already deleted".format(name))
+                continue
+            loaded[name] = entry
+        if len(loaded) < 2:
+            return 0
+
+        priorities = []
+        for ii, (name, entry) in enumerate(loaded.items()):
+            self._delete_entry_file(entry=entry)
+            self.entries[name] = entry
+            prefixes = entry.priority_prefixes()
+            aliases = set(entry.get_aliases() + entry.extra_aliases())
+            priorities.append((sum(aa.startswith(prefixes) for aa in aliases), ii, name))
+
+        dest = max(priorities)[-1]
+        self.log.warning("Found entries with common aliases ({}), merging into '{}'".format(
+            ", ".join("'{}'".format(nn) for nn in loaded), dest))
+        for name in loaded:
+            if name == dest:
+                continue
+            self.copy_to_entry_in_catalog(name, dest)
+            del self.entries[name]
+
+        self.journal_entries()
+        return len(loaded) - 1
+
+    def save_caches(self, *args, **kwargs):
+        with self.memory.phase('save_caches'):
+            return super().save_caches(*args, **kwargs)
+
+    def find_entry_name_of_alias(self, alias):
+        """Use the alias index of the entry store if available (see `entry_store`).
+        """
+        if not hasattr(self.entries, 'find_name_of_alias'):
+            return super().find_entry_name_of_alias(alias)
+
+        name = self.aliases.get(alias)
+        if (name is not None) and (name in self.entries):
+            return name
+        return self.entries.find_name_of_alias(alias)
+
     def clone_repos(self):
-        # Currently no internal repos to clone
+        """Clone (shallow) or update all input and output repositories, concurrently.
+
+        Repositories which are already current are skipped.  See `utils.repos.sync_repos`.
+        """
         all_repos = self.PATHS.get_repo_input_folders()
         all_repos += self.PATHS.get_repo_output_folders()
-        super()._clone_repos(all_repos)
+        depth = getattr(self.args, 'clone_depth', 1)
+        results = sync_repos(all_repos, self.REPO_URL_TEMPLATE, self.log, depth=depth,
+                             filter_spec=self.REPO_CLONE_FILTER, workers=self.REPO_WORKERS)
+
+        failed = [path for path, res in results.items() if res['action'] == REPO_ACTION.FAILED]
+        if len(failed):
+            self.log.raise_error("Failed to clone/update repositories: {}".format(
+                ", ".join(failed)), RuntimeError)
         return
 
     def clean_entry_name(self, name):
@@ -89,6 +630,17 @@ class BlackholeCatalog(Catalog):
 
         return name
 
+    def _load_schema_validators(self):
+        fname = os.path.join(PATH_BH_SCHEMA, "bh_blackhole.json")
+        cache_dir = os.path.join(self.PATHS.PATH_OUTPUT, 'cache')
+        try:
+            return SchemaValidators(fname, schema_search_paths(), cache_dir=cache_dir, log=self.log)
+        except SchemaResolutionError as err:
+            self.log.warning("Compiled validators unavailable, using generic validation: "
+                             "{}".format(str(err)))
+
+        return None
+
     def prep_schema(self):
 
         # print("\n\nBlackholeCatalog.prep_schema()\n\n")
@@ -97,3 +649,51 @@ class BlackholeCatalog(Catalog):
         files = list(sorted(glob.glob(pattern)))
         schema.main(add_files=files, add_structures=self.STRUCTURES)
         return
+
+
+class _EntriesSubset:
+    """View of a catalog in which `entries` only iterates over the given names.
+
+    Used to run `Catalog` methods (e.g. `journal_entries`) on only some of the entries, without
+    changing the catalog's `entries`, which are used by other tasks at the same time.  All other
+    attributes are those of the catalog.
+    """
+
+    def __init__(self, catalog, names):
+        self._catalog = catalog
+        self.entries = _NamesView(catalog.entries, names)
+        return
+
+    def __getattr__(self, name):
+        return getattr(self._catalog, name)
+
+
+class _NamesView(MutableMapping):
+    """Mapping of the given names to the entries in `entries` (which may be modified).
+    """
+
+    def __init__(self, entries, names):
+        self._entries = entries
+        self._names = OrderedDict.fromkeys(names)
+        return
+
+    def __getitem__(self, name):
+        if name not in self._names:
+            raise KeyError(name)
+        return self._entries[name]
+
+    def __setitem__(self, name, entry):
+        self._names[name] = None
+        self._entries[name] = entry
+        return
+
+    def __delitem__(self, name):
+        del self._names[name]
+        del self._entries[name]
+        return
+
+    def __iter__(self):
+        return iter(list(self._names))
+
+    def __len__(self):
+        return len(self._names)
@@ -0,0 +1,334 @@
+"""Compact, column-oriented storage of photometry for `Blackhole` entries.
+
+Photometry-heavy tasks (e.g. Shen+2008 adds five photometry points for each of ~77k quasars)
+otherwise hold hundreds of thousands of small dictionaries, each repeating the same description,
+unit and band strings.  `PhotometryColumns` instead stores each photometry field as a parallel
+column:
+    -   categorical fields (`CATEGORICAL_KEYS`, e.g. band, units, description, source) are stored as
+        integer codes (`array('l')`) into a shared table of unique values,
+    -   all other fields are stored in plain lists.
+The (ordered) set of keys of each row is also stored as a code, so that rows are reconstructed
+exactly as they were added, and serialize to the same JSON.  The tables of a catalog share one
+`PhotometryCategories` (`BlackholeCatalog.photometry_categories`), so that each unique value is
+only stored once, and is released with the catalog.
+
+`PhotometryColumns` is a mutable sequence of rows, with the same API as the list of dicts it
+replaces; indexing or iterating constructs each row as a `PhotometryRow` (an `OrderedDict`) on
+access.  Rows write through: any modification of a row (e.g. appending sources to a duplicate in
+`add_photometry`) is also written to its position in the table.  A row is only attached to the
+table until rows are next inserted, deleted or reordered, after which modifying it raises an
+error instead of overwriting a different row.  Copies (including `copy.deepcopy` and pickled
+rows) are detached, plain rows.  Tables are copied and pickled as their list of rows (with their
+own categories), as the codes of categorical values are specific to a `PhotometryCategories`.
+
+"""
+from array import array
+from collections import OrderedDict
+from collections.abc import MutableSequence
+
+from astrocats.catalog.struct import PHOTOMETRY
+
+__all__ = ["PhotometryCategories", "PhotometryColumns", "PhotometryRow", "default_sort_key",
+           "json_default"]
+
+
+class _Categories:
+    """Two-way mapping between (hashable) values and integer codes.
+    """
+
+    def __init__(self):
+        self._codes = {}
+        self._values = []
+        return
+
+    def __len__(self):
+        return len(self._values)
+
+    def code(self, value):
+        # Lists (e.g. of bands or sources) are not hashable, key them by their contents
+        key = ('list', tuple(value)) if isinstance(value, list) else value
+        try:
+            return self._codes[key]
+        except KeyError:
+            code = len(self._values)
+            self._codes[key] = code
+            self._values.append(value)
+            return code
+
+    def value(self, code):
+        value = self._values[code]
+        # Return a copy of lists, so that the shared value cannot be modified
+        if isinstance(value, list):
+            value = list(value)
+        return value
+
+
+class PhotometryCategories:
+    """Unique values of categorical columns, and of row layouts, shared by `PhotometryColumns`.
+
+    Attributes
+    ----------
+    values : `_Categories`
+        Values of all categorical columns (`PhotometryColumns.CATEGORICAL_KEYS`).
+    layouts : `_Categories`
+        Ordered keys of rows.
+
+    """
+
+    def __init__(self):
+        self.values = _Categories()
+        self.layouts = _Categories()
+        return
+
+    def __repr__(self):
+        return "PhotometryCategories(values={}, layouts={})".format(
+            len(self.values), len(self.layouts))
+
+
+# Missing values in a column (i.e. the row does not have this key)
+_MISSING = None
+# Code used for missing values in categorical columns
+_MISSING_CODE = -1
+
+
+class PhotometryRow(OrderedDict):
+    """A single row of a `PhotometryColumns` table, writing any modifications through to it.
+
+    Constructed like an `OrderedDict`, a row is detached (like a plain dictionary) until it is
+    attached to a table position by `PhotometryColumns.__getitem__`.
+    """
+
+    # Table, index and table version (see `PhotometryColumns._version`) of an attached row
+    _table = None
+    _index = None
+    _version = None
+
+    @classmethod
+    def _attached(cls, table, index, items):
+        row = cls(items)
+        row._table = table
+        row._index = index
+        row._version = table._version
+        return row
+
+    def __reduce__(self):
+        # Copies and pickles are detached from the table
+        return (self.__class__, (list(self.items()),))
+
+    def __setitem__(self, key, value):
+        super().__setitem__(key, value)
+        self._write()
+        return
+
+    def __delitem__(self, key):
+        super().__delitem__(key)
+        self._write()
+        return
+
+    def _write(self):
+        table = self._table
+        if table is None:
+            return
+        if table._version != self._version:
+            raise RuntimeError("Photometry row is stale: rows of its table have since been "
+                               "inserted, deleted or reordered!")
+        table._set_row(self._index, self)
+        return
+
+    def append_sources_from(self, other):
+        """Merge the sources of `other` into this row (as done for duplicate photometry).
+        """
+        key = PHOTOMETRY.SOURCE
+        sources = self[key].split(',')
+        for ss in other[key].split(','):
+            if ss not in sources:
+                sources.append(ss)
+        self[key] = ",".join(sources)
+        return
+
+
+def _write_through(name):
+    def method(self, *args, **kwargs):
+        retval = getattr(OrderedDict, name)(self, *args, **kwargs)
+        self._write()
+        return retval
+
+    method.__name__ = name
+    return method
+
+
+# `OrderedDict` methods which modify the row without calling `__setitem__` or `__delitem__`
+for _name in ['pop', 'popitem', 'clear', 'update', 'setdefault', 'move_to_end']:
+    setattr(PhotometryRow, _name, _write_through(_name))
+
+
+def default_sort_key(row):
+    """Order of photometry rows used by `Entry.sanitize`: by time, then band, then magnitude.
+
+    Rows without a time come first, and rows without a magnitude after those with one.  Bands
+    given as lists are compared by their comma-joined values.
+    """
+    time = row.get(PHOTOMETRY.TIME)
+    if time is None:
+        time = 0.0
+    elif isinstance(time, (str, float, int)):
+        time = float(time)
+    else:
+        time = min(float(tt) for tt in time)
+    band = row.get(PHOTOMETRY.BAND)
+    if band is None:
+        band = ''
+    elif isinstance(band, list):
+        band = ",".join(str(bb) for bb in band)
+    mag = row.get(PHOTOMETRY.MAGNITUDE)
+    return (time, str(band), mag is None, 0.0 if mag is None else float(mag))
+
+
+class PhotometryColumns(MutableSequence):
+    """Sequence of photometry rows, stored by column.
+
+    Arguments
+    ---------
+    rows : iterable of dict, or None
+        Initial rows.
+    categories : `PhotometryCategories` or None
+        Unique values shared with other tables (e.g. `BlackholeCatalog.photometry_categories`).
+        If None, the table uses its own.
+
+    """
+
+    CATEGORICAL_KEYS = [
+        PHOTOMETRY.BAND, PHOTOMETRY.SOURCE, PHOTOMETRY.DESCRIPTION,
+        PHOTOMETRY.U_LUMINOSITY, PHOTOMETRY.U_TIME, PHOTOMETRY.U_WAVELENGTH, PHOTOMETRY.WAVELENGTH,
+        PHOTOMETRY.HOST, PHOTOMETRY.INCLUDES_HOST, PHOTOMETRY.KCORRECTED,
+        PHOTOMETRY.TELESCOPE, PHOTOMETRY.INSTRUMENT, PHOTOMETRY.SYSTEM,
+    ]
+    _CATEGORICAL = frozenset(CATEGORICAL_KEYS)
+
+    def __init__(self, rows=None, categories=None):
+        if categories is None:
+            categories = PhotometryCategories()
+        self.categories = categories
+        self._length = 0
+        # Incremented whenever rows are inserted, deleted or reordered, see `PhotometryRow`
+        self._version = 0
+        self._layouts = array('l')
+        self._columns = {}
+        if rows is not None:
+            self.extend(rows)
+        return
+
+    def __reduce__(self):
+        return (self.__class__, (self.to_list(),))
+
+    def __repr__(self):
+        return "PhotometryColumns(rows={}, columns={})".format(len(self), len(self._columns))
+
+    def __len__(self):
+        return self._length
+
+    def __getitem__(self, index):
+        if isinstance(index, slice):
+            return [self[ii] for ii in range(*index.indices(self._length))]
+        index = self._check_index(index)
+        return PhotometryRow._attached(self, index, self._row_items(index))
+
+    def __setitem__(self, index, row):
+        self._set_row(self._check_index(index), row)
+        return
+
+    def __delitem__(self, index):
+        index = self._check_index(index)
+        del self._layouts[index]
+        for col in self._columns.values():
+            del col[index]
+        self._length -= 1
+        self._version += 1
+        return
+
+    def __eq__(self, other):
+        if not isinstance(other, (list, PhotometryColumns)):
+            return NotImplemented
+        return self.to_list() == [OrderedDict(rr) for rr in other]
+
+    def insert(self, index, row):
+        index = min(max(index if index >= 0 else self._length + index, 0), self._length)
+        self._layouts.insert(index, self.categories.layouts.code(tuple(row.keys())))
+        for key, col in self._columns.items():
+            col.insert(index, _MISSING_CODE if key in self._CATEGORICAL else _MISSING)
+        self._length += 1
+        self._version += 1
+        for key, val in row.items():
+            self._column(key)[index] = self._encode(key, val)
+        return
+
+    def append(self, row):
+        self.insert(self._length, row)
+        return
+
+    def sort(self, key=None, reverse=False):
+        """Sort rows in place (like `list.sort`), with `key` applied to each row.
+
+        By default rows are sorted by time, band and magnitude (see `default_sort_key`), as
+        dictionaries themselves are not ordered.
+        """
+        if key is None:
+            key = default_sort_key
+        order = sorted(range(self._length), key=lambda ii: key(self[ii]), reverse=reverse)
+        self._version += 1
+        self._layouts = array('l', [self._layouts[ii] for ii in order])
+        for kk, col in self._columns.items():
+            vals = [col[ii] for ii in order]
+            self._columns[kk] = array('l', vals) if isinstance(col, array) else vals
+        return
+
+    def to_list(self):
+        """Return all rows as a list of plain `OrderedDict`s (e.g. for serialization).
+        """
+        return [OrderedDict(self._row_items(ii)) for ii in range(self._length)]
+
+    def _row_items(self, index):
+        items = []
+        for key in self.categories.layouts.value(self._layouts[index]):
+            val = self._columns[key][index]
+            if key in self._CATEGORICAL:
+                val = self.categories.values.value(val)
+            items.append((key, val))
+        return items
+
+    def _set_row(self, index, row):
+        self._layouts[index] = self.categories.layouts.code(tuple(row.keys()))
+        # Clear existing values for this row
+        for key, col in self._columns.items():
+            col[index] = _MISSING_CODE if key in self._CATEGORICAL else _MISSING
+        for key, val in row.items():
+            self._column(key)[index] = self._encode(key, val)
+        return
+
+    def _column(self, key):
+        if key not in self._columns:
+            if key in self._CATEGORICAL:
+                self._columns[key] = array('l', [_MISSING_CODE] * self._length)
+            else:
+                self._columns[key] = [_MISSING] * self._length
+        return self._columns[key]
+
+    def _encode(self, key, val):
+        if key in self._CATEGORICAL:
+            return self.categories.values.code(val)
+        return val
+
+    def _check_index(self, index):
+        if index < 0:
+            index += self._length
+        if not (0 <= index < self._length):
+            raise IndexError("photometry index out of range")
+        return index
+
+
+def json_default(obj):
+    """`default` function for `json.dump(s)` which serializes `PhotometryColumns` as lists.
+    """
+    if isinstance(obj, PhotometryColumns):
+        return obj.to_list()
+    raise TypeError("Object of type '{}' is not JSON serializable".format(type(obj).__name__))
@@ -2,3 +2,21 @@
 """
 # from astropy import constants as const
 # from astropy import units as un
+
+# Speed of light [km/s]
+SPLC_KMS = 299792.458
+# Gravitational constant [pc Msol^-1 (km/s)^2]
+NWTG_PC_MSOL_KMS = 4.300917e-3
+# Eddington luminosity per solar mass (for ionized hydrogen) [erg/s/Msol]
+EDDINGTON_LUM_PER_MSOL = 1.2572e38
+
+
+class COSMOLOGY:
+    """Flat LCDM cosmology used for derived distances.
+    """
+    H0 = 70.0           # [km/s/Mpc]
+    OMEGA_M = 0.3
+    OMEGA_L = 0.7
+    # Maximum redshift, and number of points, of the cached distance interpolation table
+    Z_MAX = 10.0
+    NUM_POINTS = 4096
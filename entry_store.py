@@ -0,0 +1,418 @@
+"""Storage backends for the entries of a `BlackholeCatalog`.
+
+By default `catalog.entries` is an `OrderedDict` holding every `Blackhole` (as a full nested dict)
+until it is journaled.  `SQLiteEntryStore` is a drop-in replacement for that dictionary which keeps
+only a bounded, least-recently-used working set of entries in memory, and stores the rest in an
+on-disk SQLite database.  Tasks and meta-tasks use the same `catalog.entries[name]` interface.
+
+Besides the serialized entry itself, each entry's aliases, quantities, photometry and sources are
+written to separate (indexed) tables, so that lookups by alias and simple filtering of entries
+(`SQLiteEntryStore.select_names`) can be done in SQL without loading every entry.
+
+The store can be used from any thread (e.g. tasks run by the task graph scheduler, see
+`scheduler`): the database connection and the working set are only used while holding the store's
+lock.  This does not make changes to the entries themselves thread-safe, so tasks using this store
+still run one at a time (see `BlackholeCatalog._import_task_graph`).
+
+Entries are written to the database when they are evicted from the working set, but the store
+keeps a weak reference to each evicted entry: while any caller still holds it, accessing the same
+name returns that object (rather than a copy loaded from the database), and `flush` writes it
+again, so that changes made through a held reference are not lost.  Only changes made after an
+entry has been evicted, to an object which is then released (and garbage collected) before the next
+`flush`, can be lost; i.e. access entries through `catalog.entries[name]` where possible.
+
+"""
+import os
+import json
+import functools
+import sqlite3
+import weakref
+import threading
+import tempfile
+from collections import OrderedDict
+from collections.abc import MutableMapping
+
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY, SOURCE
+
+from .columnar import json_default
+
+__all__ = ["ENTRY_STORE", "SQLiteEntryStore", "init_entry_store"]
+
+
+class ENTRY_STORE:
+    MEMORY = "memory"
+    SQLITE = "sqlite"
+
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS entries (
+    idx INTEGER PRIMARY KEY AUTOINCREMENT,
+    name TEXT NOT NULL UNIQUE,
+    stub INTEGER NOT NULL DEFAULT 0,
+    data TEXT
+);
+CREATE TABLE IF NOT EXISTS aliases (
+    alias TEXT NOT NULL,
+    name TEXT NOT NULL
+);
+CREATE TABLE IF NOT EXISTS quantities (
+    name TEXT NOT NULL,
+    key TEXT NOT NULL,
+    value TEXT,
+    value_num REAL,
+    unit TEXT,
+    kind TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS photometry (
+    name TEXT NOT NULL,
+    band TEXT,
+    magnitude REAL,
+    luminosity REAL,
+    time TEXT,
+    source TEXT
+);
+CREATE TABLE IF NOT EXISTS sources (
+    name TEXT NOT NULL,
+    alias TEXT,
+    bibcode TEXT,
+    arxivid TEXT,
+    url TEXT,
+    source_name TEXT
+);
+CREATE INDEX IF NOT EXISTS idx_aliases_alias ON aliases (alias);
+CREATE INDEX IF NOT EXISTS idx_aliases_name ON aliases (name);
+CREATE INDEX IF NOT EXISTS idx_quantities_name ON quantities (name);
+CREATE INDEX IF NOT EXISTS idx_quantities_key ON quantities (key, value_num);
+CREATE INDEX IF NOT EXISTS idx_photometry_name ON photometry (name);
+CREATE INDEX IF NOT EXISTS idx_sources_name ON sources (name);
+CREATE INDEX IF NOT EXISTS idx_sources_bibcode ON sources (bibcode);
+"""
+
+_DETAIL_TABLES = ["aliases", "quantities", "photometry", "sources"]
+
+
+def init_entry_store(catalog):
+    """Construct the entry storage for `catalog` based on its arguments.
+
+    Returns an `OrderedDict` for the default ('memory') store.
+    """
+    args = catalog.args
+    store = getattr(args, 'entry_store', None) or ENTRY_STORE.MEMORY
+    if store == ENTRY_STORE.MEMORY:
+        return OrderedDict()
+    if store == ENTRY_STORE.SQLITE:
+        path = getattr(args, 'entry_store_path', None)
+        cache_size = getattr(args, 'entry_cache_size', None) or SQLiteEntryStore.CACHE_SIZE
+        catalog.log.info("Using SQLite entry store '{}' (cache size {})".format(
+            path or "<temporary>", cache_size))
+        return SQLiteEntryStore(catalog, path=path, cache_size=cache_size)
+
+    raise ValueError("Unrecognized entry store '{}'!".format(store))
+
+
+def _locked(method):
+    """Run a method of `SQLiteEntryStore` while holding the store's lock.
+    """
+    @functools.wraps(method)
+    def wrapper(self, *args, **kwargs):
+        with self._lock:
+            return method(self, *args, **kwargs)
+
+    return wrapper
+
+
+class SQLiteEntryStore(MutableMapping):
+    """Mapping of entry names to entries, backed by an SQLite database.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+        Entries are reconstructed as `catalog.proto` instances.
+    path : str or None
+        Filename of the database.  If None, a temporary file is used and deleted afterwards.
+    cache_size : int
+        Maximum number of entries held in memory.
+
+    """
+
+    CACHE_SIZE = 1000
+
+    def __init__(self, catalog, path=None, cache_size=CACHE_SIZE):
+        self.catalog = catalog
+        self.log = catalog.log
+        self.cache_size = max(int(cache_size), 1)
+        # Guards the connection, `_cache` and `_evicted`, which may be used from several threads
+        self._lock = threading.RLock()
+        self._cache = OrderedDict()
+        # Entries evicted from `_cache` which are still referenced elsewhere (see `_add_to_cache`)
+        self._evicted = weakref.WeakValueDictionary()
+
+        if path is None:
+            fd, path = tempfile.mkstemp(prefix="bh_entries_", suffix=".db")
+            os.close(fd)
+            self._finalizer = weakref.finalize(self, _remove_file, path)
+        else:
+            self._finalizer = None
+
+        self.path = path
+        self._conn = sqlite3.connect(path, check_same_thread=False)
+        self._conn.executescript(_SCHEMA)
+        self._conn.commit()
+        return
+
+    @_locked
+    def __repr__(self):
+        return "SQLiteEntryStore('{}', entries={}, cached={})".format(
+            self.path, len(self), len(self._cache))
+
+    # ==== Mapping interface ====
+
+    @_locked
+    def __getitem__(self, name):
+        if name in self._cache:
+            self._cache.move_to_end(name)
+            return self._cache[name]
+
+        # Return the same object to callers still holding a reference to an evicted entry
+        entry = self._evicted.pop(name, None)
+        if entry is not None:
+            self._add_to_cache(name, entry)
+            return entry
+
+        row = self._conn.execute(
+            "SELECT stub, data FROM entries WHERE name = ?", (name,)).fetchone()
+        if row is None:
+            raise KeyError(name)
+
+        entry = self._load_entry(name, bool(row[0]), row[1])
+        self._add_to_cache(name, entry)
+        return entry
+
+    @_locked
+    def __setitem__(self, name, entry):
+        # Register the name (preserving insertion order), data are written on eviction or flush
+        self._conn.execute("INSERT OR IGNORE INTO entries (name) VALUES (?)", (name,))
+        self._evicted.pop(name, None)
+        if name in self._cache:
+            self._cache[name] = entry
+            self._cache.move_to_end(name)
+        else:
+            self._add_to_cache(name, entry)
+        return
+
+    @_locked
+    def __delitem__(self, name):
+        if name not in self:
+            raise KeyError(name)
+        self._cache.pop(name, None)
+        self._evicted.pop(name, None)
+        self._delete_details(name)
+        self._conn.execute("DELETE FROM entries WHERE name = ?", (name,))
+        return
+
+    @_locked
+    def __contains__(self, name):
+        if name in self._cache:
+            return True
+        row = self._conn.execute("SELECT 1 FROM entries WHERE name = ?", (name,)).fetchone()
+        return row is not None
+
+    @_locked
+    def __iter__(self):
+        # Iterate over a snapshot of the names, so that entries can be modified while iterating
+        names = [row[0] for row in self._conn.execute("SELECT name FROM entries ORDER BY idx")]
+        return iter(names)
+
+    @_locked
+    def __len__(self):
+        return self._conn.execute("SELECT COUNT(*) FROM entries").fetchone()[0]
+
+    @_locked
+    def clear(self):
+        self._cache.clear()
+        self._evicted.clear()
+        for table in ["entries"] + _DETAIL_TABLES:
+            self._conn.execute("DELETE FROM {}".format(table))
+        self._conn.commit()
+        return
+
+    # ==== Queries ====
+
+    @_locked
+    def find_name_of_alias(self, alias):
+        """Return the name of the (first) stored entry with the given alias, or None.
+
+        Only the alias index in the database is searched, i.e. aliases of entries which have not
+        yet been written (see `flush`) are not found.
+        """
+        row = self._conn.execute(
+            "SELECT aliases.name FROM aliases JOIN entries ON aliases.name = entries.name "
+            "WHERE aliases.alias = ? ORDER BY entries.idx LIMIT 1", (alias,)).fetchone()
+        return None if row is None else row[0]
+
+    @_locked
+    def select_names(self, key, min_value=None, max_value=None, kind=None, source_bibcode=None):
+        """Return the names of entries with quantity `key` matching the given conditions.
+
+        Values are compared numerically, e.g.
+        >>> catalog.entries.select_names(BLACKHOLE.MASS, min_value=9.0)
+
+        """
+        self.flush()
+        query = "SELECT DISTINCT quantities.name FROM quantities"
+        conds = ["quantities.key = ?"]
+        params = [key]
+        if min_value is not None:
+            conds.append("quantities.value_num >= ?")
+            params.append(float(min_value))
+        if max_value is not None:
+            conds.append("quantities.value_num <= ?")
+            params.append(float(max_value))
+        if kind is not None:
+            conds.append("quantities.kind = ?")
+            params.append(kind)
+        if source_bibcode is not None:
+            query += (" JOIN sources ON sources.name = quantities.name"
+                      " AND (',' || quantities.source || ',') LIKE ('%,' || sources.alias || ',%')")
+            conds.append("sources.bibcode = ?")
+            params.append(source_bibcode)
+
+        query += " WHERE " + " AND ".join(conds)
+        return [row[0] for row in self._conn.execute(query, params)]
+
+    @_locked
+    def execute(self, query, params=()):
+        """Run an arbitrary (read) query on the database, after writing all cached entries.
+        """
+        self.flush()
+        return self._conn.execute(query, params).fetchall()
+
+    @_locked
+    def resident_entries(self):
+        """Return the entries currently held in memory, as an `OrderedDict` (least recent first).
+        """
+        return OrderedDict(self._cache)
+
+    # ==== Persistence ====
+
+    @_locked
+    def flush(self):
+        """Write all entries in the working set, and evicted entries still referenced elsewhere.
+
+        Entries in the working set remain in memory.
+        """
+        for name, entry in self._cache.items():
+            self._store_entry(name, entry)
+        for name, entry in list(self._evicted.items()):
+            self._store_entry(name, entry)
+        self._conn.commit()
+        return
+
+    @_locked
+    def close(self):
+        """Write all entries, close the database, and remove it if it is temporary.
+        """
+        if self._conn is None:
+            return
+        self.flush()
+        self._cache.clear()
+        self._evicted.clear()
+        self._conn.close()
+        self._conn = None
+        if self._finalizer is not None:
+            self._finalizer()
+        return
+
+    def _add_to_cache(self, name, entry):
+        self._cache[name] = entry
+        while len(self._cache) > self.cache_size:
+            old_name, old_entry = self._cache.popitem(last=False)
+            self._store_entry(old_name, old_entry)
+            self._evicted[old_name] = old_entry
+        return
+
+    def _load_entry(self, name, stub, data):
+        entry = self.catalog.proto(self.catalog, name, stub=stub)
+        if data is not None:
+            data = json.loads(data, object_pairs_hook=OrderedDict)
+            entry._convert_odict_to_classes(
+                data, clean=False, merge=False, pop_schema=False, compare_to_existing=False)
+        return entry
+
+    def _store_entry(self, name, entry):
+        # Add any rows of input data still kept by the entry (see `Blackhole.add_raw_row`)
+        entry.materialize()
+        data = json.dumps(entry, separators=(',', ':'), ensure_ascii=False, default=json_default)
+        self._conn.execute(
+            "UPDATE entries SET stub = ?, data = ? WHERE name = ?",
+            (int(bool(getattr(entry, '_stub', False))), data, name))
+
+        self._delete_details(name)
+        keys = self.catalog.proto._KEYS
+        aliases = set(entry.get_aliases(includename=True))
+        self._conn.executemany(
+            "INSERT INTO aliases (alias, name) VALUES (?, ?)",
+            [(alias, name) for alias in sorted(aliases)])
+
+        quants = []
+        for key, vals in entry.items():
+            if key in [keys.SOURCES, keys.PHOTOMETRY, keys.ALIAS] or not isinstance(vals, list):
+                continue
+            for qq in vals:
+                if not isinstance(qq, dict) or QUANTITY.VALUE not in qq:
+                    continue
+                value = qq[QUANTITY.VALUE]
+                quants.append((name, key, str(value), _to_float(value), qq.get(QUANTITY.U_VALUE),
+                               qq.get(QUANTITY.KIND), qq.get(QUANTITY.SOURCE)))
+        self._conn.executemany(
+            "INSERT INTO quantities (name, key, value, value_num, unit, kind, source) "
+            "VALUES (?, ?, ?, ?, ?, ?, ?)", quants)
+
+        photos = [
+            (name, pp.get(PHOTOMETRY.BAND), _to_float(pp.get(PHOTOMETRY.MAGNITUDE)),
+             _to_float(pp.get(PHOTOMETRY.LUMINOSITY)), _to_str(pp.get(PHOTOMETRY.TIME)),
+             pp.get(PHOTOMETRY.SOURCE))
+            for pp in entry.get(keys.PHOTOMETRY, [])
+        ]
+        self._conn.executemany(
+            "INSERT INTO photometry (name, band, magnitude, luminosity, time, source) "
+            "VALUES (?, ?, ?, ?, ?, ?)", photos)
+
+        sources = [
+            (name, ss.get(SOURCE.ALIAS), ss.get(SOURCE.BIBCODE), ss.get(SOURCE.ARXIVID),
+             ss.get(SOURCE.URL), ss.get(SOURCE.NAME))
+            for ss in entry.get(keys.SOURCES, [])
+        ]
+        self._conn.executemany(
+            "INSERT INTO sources (name, alias, bibcode, arxivid, url, source_name) "
+            "VALUES (?, ?, ?, ?, ?, ?)", sources)
+        return
+
+    def _delete_details(self, name):
+        for table in _DETAIL_TABLES:
+            self._conn.execute("DELETE FROM {} WHERE name = ?".format(table), (name,))
+        return
+
+
+def _to_float(val):
+    if val is None:
+        return None
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
+
+
+def _to_str(val):
+    if val is None:
+        return None
+    if isinstance(val, list):
+        return ",".join(str(vv) for vv in val)
+    return str(val)
+
+
+def _remove_file(path):
+    if os.path.exists(path):
+        os.remove(path)
+    return
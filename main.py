@@ -6,10 +6,10 @@ from datetime import datetime
 def main(args, clargs, log):
     log.debug("blackholes.main.main()")
     from .blackholecatalog import BlackholeCatalog
-    from astrocats.catalog.argshandler import ArgsHandler
+    from .argshandler import BH_ArgsHandler
 
     # Create an `ArgsHandler` instance with the appropriate argparse machinery
-    args_handler = ArgsHandler(log)
+    args_handler = BH_ArgsHandler(log)
     # Parse the arguments to get the configuration settings
     args = args_handler.load_args(args=args, clargs=clargs)
     # Returns 'None' if no subcommand is given
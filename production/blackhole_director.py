@@ -1,34 +1,106 @@
 """Blackhole Catalog: `Director` subclass
 """
+import os
+import weakref
 
 from astrocats.catalog.production import director, html_pro
 from astrocats.catalog.utils import dict_to_pretty_string
 from astrocats.catalog.struct import QUANTITY
 from .. blackhole import BLACKHOLE
+from .. import _PATH_BLACKHOLES
+from .table_pages import TablePageWriter
+from .search_index import SearchIndexWriter
 
 
 class Blackhole_Director(director.Director):
 
-    _SAVE_ENTRY_KEYS = ['distance', 'mass', 'galaxy_bulge_vel_disp', 'galaxy_bulge_mass',
+    _SAVE_ENTRY_KEYS = ['distance', 'mass', 'mass_best', 'galaxy_bulge_vel_disp', 'galaxy_bulge_mass',
                         'agn_activity', 'tasks']
     # _DEL_QUANTITY_KEYS = ['description']
 
+    # Paginated main table for the web front end (see `table_pages`)
+    TABLE_PAGES_PATH = os.path.join(_PATH_BLACKHOLES, "output", "table", "")
+    TABLE_PAGE_SIZE = 500
+    # Search index of names, aliases and positions, in `TABLE_PAGES_PATH` (see `search_index`)
+    SEARCH_INDEX = "search-index.bin"
+
     def __init__(self, *args, **kwargs):
         super().__init__(*args, **kwargs)
         self.HTML_Pro = BH_HTML_Pro
+        self.table_pages = TablePageWriter(
+            self.TABLE_PAGES_PATH, self._table_columns(), page_size=self.TABLE_PAGE_SIZE,
+            kind_keys=BH_HTML_Pro.KIND_KEYS, log=getattr(self, 'log', None))
+        self.search_index = SearchIndexWriter(
+            os.path.join(self.TABLE_PAGES_PATH, self.SEARCH_INDEX), log=getattr(self, 'log', None))
+        # If the outputs are not finished by `direct` (e.g. the run failed), then when the director
+        # is discarded (or at exit) the pages are kept but left marked as incomplete
+        self._outputs_finalizer = weakref.finalize(
+            self, _abandon_outputs, self.table_pages, self.search_index)
         return
 
-    # def update(self, fname, event_name, event_data):
-    #     # print(dict_to_pretty_string(event_data))
-    #     super().update(fname, event_name, event_data)
+    def direct(self, *args, **kwargs):
+        """Run the director over all entries, then finish the table pages and search index.
+
+        The outputs are only completed once all entries have been processed successfully.
+        """
+        retval = super().direct(*args, **kwargs)
+        self.finish_outputs()
+        return retval
+
+    def update(self, fname, event_name, event_data):
+        # print(dict_to_pretty_string(event_data))
+        super().update(fname, event_name, event_data)
+        # Entry files contain a single entry, keyed by its name
+        entry = event_data.get(event_name, event_data)
+        self.table_pages.add(event_name, entry)
+        self.search_index.add(
+            event_name, aliases=[_value(aa) for aa in entry.get(BLACKHOLE.ALIAS, [])],
+            ra=_first_value(entry.get(BLACKHOLE.RA)), dec=_first_value(entry.get(BLACKHOLE.DEC)))
+        return
+
+    def finish_outputs(self):
+        """Write the last page of the table with the completed manifest, and the search index.
+        """
+        self._outputs_finalizer.detach()
+        self.table_pages.close()
+        self.search_index.close()
+        return
+
+    @staticmethod
+    def _table_columns():
+        """Key and label of each table column: the name, then those of `_EVENT_HTML_COLUMNS_CUSTOM`.
+        """
+        from ..blackholecatalog import BlackholeCatalog
+        custom = BlackholeCatalog._EVENT_HTML_COLUMNS_CUSTOM
+        keys = sorted(custom.keys(), key=lambda kk: custom[kk][1])
+        return [(BLACKHOLE.NAME, "Name")] + [(kk, custom[kk][0]) for kk in keys]
+
+
+def _abandon_outputs(table_pages, search_index):
+    """Keep the pages written so far, without completing the manifest or writing the index.
+    """
+    table_pages.abort()
+    search_index.discard()
+    return
+
+
+def _value(quantity):
+    return quantity.get(QUANTITY.VALUE) if isinstance(quantity, dict) else quantity
+
+
+def _first_value(quantities):
+    return _value(quantities[0]) if quantities else None
 
 
 class BH_HTML_Pro(html_pro.HTML_Pro):
 
+    # Keys whose Meta-Data value cells include the 'kind' of the quantity
+    KIND_KEYS = [BLACKHOLE.MASS, BLACKHOLE.MASS_BEST]
+
     def _meta_data_entry_kind(self, key, row):
         """Retrieve an additional 'kind' parameter to add to a Meta-Data value cell.
         """
-        if key == BLACKHOLE.MASS and QUANTITY.KIND in row:
+        if key in self.KIND_KEYS and QUANTITY.KIND in row:
             return row[QUANTITY.KIND]
 
         return
@@ -0,0 +1,371 @@
+"""Compact search index of entry names, aliases and positions.
+
+Written by `Blackhole_Director` alongside the paginated table (see `table_pages`), as the single
+binary file 'output/table/search-index.bin', so that entries can be found by name, alias or
+position without loading the catalog.  The entry ID of each entry is its row number in the table,
+i.e. the entry is in page `entry_id // page_size`.
+
+The file contains (all integers and floats little-endian):
+    -   a header: magic bytes, the number of keys, entries and positions, and section offsets,
+    -   the keys: normalized names and aliases (see `normalize`), sorted, as UTF-8 strings with an
+        array of their offsets, and the entry ID of each key,
+    -   the entry names, as UTF-8 strings with an array of their offsets,
+    -   the positions: RA and Dec [degrees] of each entry (NaN if unknown), and the IDs of the
+        entries with positions sorted by Dec, along with their sorted Dec values.
+
+`SearchIndex` memory-maps the file, and answers lookups by binary search directly on the mapped
+data, so opening the index is immediate regardless of its size, and each lookup only touches a
+few pages of the file.  From the command line:
+
+    python -m astrocats.blackholes.production.search_index NAME [--prefix] [--index FNAME]
+    python -m astrocats.blackholes.production.search_index --cone RA DEC RADIUS
+
+"""
+import os
+import re
+import sys
+import math
+import mmap
+import struct
+import argparse
+
+__all__ = ["SearchIndexWriter", "SearchIndex", "normalize", "parse_coord"]
+
+_MAGIC = b"BHSIDX01"
+# magic, number of keys, entries, positions; offsets of the 9 sections
+_HEADER = struct.Struct("<8sIII9Q")
+_UINT = struct.Struct("<I")
+_DOUBLE = struct.Struct("<d")
+# Default location, as written by `Blackhole_Director` (in its `TABLE_PAGES_PATH`)
+_DEFAULT_FNAME = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))),
+                              "output", "table", "search-index.bin")
+# Characters ignored when comparing names
+_IGNORE_REGEX = re.compile(r"[\s_]+")
+
+
+def normalize(name):
+    """Normalized form of a name or alias, used for comparisons: upper-case, without whitespace.
+    """
+    return _IGNORE_REGEX.sub("", str(name)).upper()
+
+
+def parse_coord(value, hours=False):
+    """Convert a coordinate in decimal degrees or sexagesimal ('dd:mm:ss') to degrees.
+
+    Arguments
+    ---------
+    value : str or float or None
+    hours : bool
+        Whether sexagesimal values are in hours (i.e. right ascension).
+
+    Returns
+    -------
+    deg : float
+        Coordinate in degrees, NaN if it cannot be parsed.
+
+    """
+    if value is None:
+        return math.nan
+    try:
+        return float(value)
+    except (TypeError, ValueError):
+        pass
+
+    parts = re.split(r"[:\s]+", str(value).strip())
+    try:
+        vals = [abs(float(pp)) for pp in parts]
+    except ValueError:
+        return math.nan
+    if not (0 < len(vals) <= 3):
+        return math.nan
+
+    deg = sum(vv / 60.0**ii for ii, vv in enumerate(vals))
+    if parts[0].startswith('-'):
+        deg = -deg
+    if hours:
+        deg *= 15.0
+    return deg
+
+
+class SearchIndexWriter:
+    """Collect the names, aliases and positions of entries, and write the search index.
+
+    Arguments
+    ---------
+    fname : str
+        Filename of the index.
+    log : `logging.Logger` or None
+
+    """
+
+    def __init__(self, fname, log=None):
+        self.fname = fname
+        self.log = log
+        self.closed = False
+        self._keys = []
+        self._names = []
+        self._ra = []
+        self._dec = []
+        return
+
+    def add(self, name, aliases=[], ra=None, dec=None):
+        """Add an entry, returning its entry ID.
+
+        `ra` and `dec` are parsed with `parse_coord` (i.e. RA may be in sexagesimal hours).
+        """
+        if self.closed:
+            raise RuntimeError("Search index '{}' is already closed!".format(self.fname))
+
+        entry_id = len(self._names)
+        self._names.append(name)
+        self._ra.append(parse_coord(ra, hours=True))
+        self._dec.append(parse_coord(dec))
+        for key in set(normalize(nn) for nn in [name] + list(aliases)):
+            if len(key):
+                self._keys.append((key, entry_id))
+        return entry_id
+
+    def close(self):
+        """Write the index, replacing the file only once it is complete.
+        """
+        if self.closed:
+            return
+        self.closed = True
+
+        self._keys.sort()
+        keys = [kk.encode('utf-8') for kk, _ in self._keys]
+        key_ids = [ii for _, ii in self._keys]
+        names = [nn.encode('utf-8') for nn in self._names]
+        positions = sorted((dd, ii) for ii, dd in enumerate(self._dec)
+                           if not (math.isnan(dd) or math.isnan(self._ra[ii])))
+
+        sections = [
+            _offsets(keys), b"".join(keys), _pack("I", key_ids),
+            _offsets(names), b"".join(names),
+            _pack("d", self._ra), _pack("d", self._dec),
+            _pack("d", [dd for dd, _ in positions]), _pack("I", [ii for _, ii in positions]),
+        ]
+        offsets = []
+        loc = _HEADER.size
+        for sec in sections:
+            offsets.append(loc)
+            loc += len(sec)
+
+        path = os.path.dirname(self.fname)
+        if len(path) and not os.path.isdir(path):
+            os.makedirs(path)
+        temp = self.fname + '.tmp'
+        with open(temp, 'wb') as out:
+            out.write(_HEADER.pack(_MAGIC, len(keys), len(names), len(positions), *offsets))
+            for sec in sections:
+                out.write(sec)
+        os.replace(temp, self.fname)
+
+        if self.log is not None:
+            self.log.info("Wrote search index of {} keys for {} entries ({} with positions) to "
+                          "'{}'".format(len(keys), len(names), len(positions), self.fname))
+        return
+
+    def discard(self):
+        """Close without writing the index, e.g. if not all entries were added.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if self.log is not None:
+            self.log.warning("Search index '{}' not written: incomplete".format(self.fname))
+        return
+
+
+class SearchIndex:
+    """Memory-mapped search index, written by `SearchIndexWriter`.
+
+    Arguments
+    ---------
+    fname : str
+        Filename of the index.
+
+    """
+
+    def __init__(self, fname):
+        self.fname = fname
+        with open(fname, 'rb') as inp:
+            self._mm = mmap.mmap(inp.fileno(), 0, access=mmap.ACCESS_READ)
+
+        header = _HEADER.unpack_from(self._mm, 0)
+        if header[0] != _MAGIC:
+            self.close()
+            raise ValueError("'{}' is not a search index!".format(fname))
+        self.num_keys, self.num_entries, self.num_positions = header[1:4]
+        (self._key_offs, self._key_blob, self._key_ids, self._name_offs, self._name_blob,
+         self._ra, self._dec, self._pos_dec, self._pos_ids) = header[4:]
+        return
+
+    def __len__(self):
+        return self.num_entries
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+        return
+
+    def close(self):
+        self._mm.close()
+        return
+
+    def lookup(self, name):
+        """Entry IDs of all entries with the given name or alias (after normalization).
+        """
+        key = normalize(name).encode('utf-8')
+        lo = self._lower_bound(key)
+        ids = []
+        while (lo < self.num_keys) and (self._key(lo) == key):
+            ids.append(_UINT.unpack_from(self._mm, self._key_ids + 4*lo)[0])
+            lo += 1
+        return sorted(set(ids))
+
+    def prefix(self, prefix, limit=100):
+        """Keys beginning with the given prefix (after normalization), and their entry IDs.
+
+        Returns
+        -------
+        matches : list of (str, int)
+            At most `limit` (normalized) keys, in sorted order, and the entry ID of each.
+
+        """
+        key = normalize(prefix).encode('utf-8')
+        lo = self._lower_bound(key)
+        matches = []
+        while (lo < self.num_keys) and (len(matches) < limit):
+            kk = self._key(lo)
+            if not kk.startswith(key):
+                break
+            matches.append((kk.decode('utf-8'),
+                            _UINT.unpack_from(self._mm, self._key_ids + 4*lo)[0]))
+            lo += 1
+        return matches
+
+    def name(self, entry_id):
+        """Name of the given entry.
+        """
+        return _string(self._mm, self._name_offs, self._name_blob, self._check(entry_id))
+
+    def position(self, entry_id):
+        """RA and Dec [degrees] of the given entry (NaN if unknown).
+        """
+        entry_id = self._check(entry_id)
+        return (_DOUBLE.unpack_from(self._mm, self._ra + 8*entry_id)[0],
+                _DOUBLE.unpack_from(self._mm, self._dec + 8*entry_id)[0])
+
+    def cone(self, ra, dec, radius):
+        """Entry IDs of all entries within `radius` of the given RA and Dec [all in degrees].
+
+        Returns
+        -------
+        matches : list of (float, int)
+            Separation [degrees] and entry ID of each match, sorted by separation.
+
+        """
+        # Candidates are in the band of Dec values within the radius
+        lo = self._bisect_dec(dec - radius)
+        hi = self._bisect_dec(dec + radius, right=True)
+        matches = []
+        for ii in range(lo, hi):
+            entry_id = _UINT.unpack_from(self._mm, self._pos_ids + 4*ii)[0]
+            sep = _separation(ra, dec, *self.position(entry_id))
+            if sep <= radius:
+                matches.append((sep, entry_id))
+        return sorted(matches)
+
+    def _check(self, entry_id):
+        if not (0 <= entry_id < self.num_entries):
+            raise IndexError("Entry ID {} out of range ({} entries)".format(
+                entry_id, self.num_entries))
+        return entry_id
+
+    def _key(self, ii):
+        return _string(self._mm, self._key_offs, self._key_blob, ii, decode=False)
+
+    def _lower_bound(self, key):
+        lo, hi = 0, self.num_keys
+        while lo < hi:
+            mid = (lo + hi) // 2
+            if self._key(mid) < key:
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+    def _bisect_dec(self, dec, right=False):
+        lo, hi = 0, self.num_positions
+        while lo < hi:
+            mid = (lo + hi) // 2
+            val = _DOUBLE.unpack_from(self._mm, self._pos_dec + 8*mid)[0]
+            if (val < dec) or (right and val == dec):
+                lo = mid + 1
+            else:
+                hi = mid
+        return lo
+
+
+def _pack(fmt, values):
+    return struct.pack("<{}{}".format(len(values), fmt), *values)
+
+
+def _offsets(strings):
+    """Offsets of each string (and the end of the last) in their concatenation.
+    """
+    offs = [0]
+    for ss in strings:
+        offs.append(offs[-1] + len(ss))
+    return _pack("I", offs)
+
+
+def _string(mm, offs, blob, ii, decode=True):
+    beg, end = struct.unpack_from("<II", mm, offs + 4*ii)
+    ss = mm[blob + beg:blob + end]
+    return ss.decode('utf-8') if decode else ss
+
+
+def _separation(ra1, dec1, ra2, dec2):
+    """Angular separation [degrees] between two positions [degrees] (haversine formula).
+    """
+    ra1, dec1, ra2, dec2 = [math.radians(vv) for vv in [ra1, dec1, ra2, dec2]]
+    hav = (math.sin((dec2 - dec1) / 2)**2 +
+           math.cos(dec1) * math.cos(dec2) * math.sin((ra2 - ra1) / 2)**2)
+    return math.degrees(2 * math.asin(min(math.sqrt(hav), 1.0)))
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Look up entries in the catalog search index.")
+    parser.add_argument('name', nargs='?', default=None, help="Name or alias (or prefix).")
+    parser.add_argument('--prefix', action='store_true', help="Find all keys with this prefix.")
+    parser.add_argument('--cone', nargs=3, type=float, metavar=('RA', 'DEC', 'RADIUS'),
+                        help="Find entries within RADIUS of RA, DEC [all in degrees].")
+    parser.add_argument('--limit', type=int, default=100, help="Maximum number of prefix matches.")
+    parser.add_argument('--index', default=_DEFAULT_FNAME, help="Filename of the search index.")
+    args = parser.parse_args(argv)
+    if (args.name is None) == (args.cone is None):
+        parser.error("Either a `name` or `--cone` is required.")
+
+    with SearchIndex(args.index) as index:
+        if args.cone is not None:
+            for sep, ii in index.cone(*args.cone):
+                print("{}\t{}\t{:.6f}".format(ii, index.name(ii), sep))
+        elif args.prefix:
+            for key, ii in index.prefix(args.name, limit=args.limit):
+                print("{}\t{}\t{}".format(ii, index.name(ii), key))
+        else:
+            ids = index.lookup(args.name)
+            for ii in ids:
+                print("{}\t{}\t{:.6f}\t{:.6f}".format(ii, index.name(ii), *index.position(ii)))
+            if not len(ids):
+                return 1
+
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,191 @@
+"""Paginated catalog table for the web front end.
+
+Instead of a single table of all entries, the main catalog table is written as fixed-size pages,
+each a small JSON file, along with a manifest describing them:
+
+    output/table/manifest.json
+    output/table/page-00000.json
+    output/table/page-00001.json
+    ...
+
+The manifest lists the columns (key and label), the page size, the total number of rows, and for
+each page its filename, number of rows, and the names of its first and last entries; clients load
+the manifest, and then fetch only the pages they display.  Each page contains a 'rows' list, with
+one list of cells per entry in the order of the manifest 'columns'.
+
+Rows are added one entry at a time (see `Blackhole_Director.update`), and each page is written as
+soon as it is full, so only a single page is held in memory regardless of the size of the catalog.
+The manifest is re-written after each page (marked incomplete until the table is closed), and
+every file is replaced only once it is completely written.  A table which is abandoned before it
+is closed (see `TablePageWriter.abort`) keeps its manifest marked incomplete.
+
+"""
+import os
+import re
+import glob
+import json
+import time
+from collections import OrderedDict
+
+from astrocats.catalog.struct import QUANTITY
+
+__all__ = ["TablePageWriter"]
+
+_PAGE_FNAME = "page-{:05d}.json"
+_PAGE_REGEX = re.compile(r"page-([0-9]+)\.json$")
+_MANIFEST_FNAME = "manifest.json"
+
+
+class TablePageWriter:
+    """Write table rows to fixed-size JSON pages, and a manifest of those pages.
+
+    Arguments
+    ---------
+    path : str
+        Directory in which pages and the manifest are written.
+    columns : list of (str, str)
+        Key and label of each column.  The first column must be the entry name.
+    page_size : int
+        Number of rows in each page (except possibly the last).
+    kind_keys : list of str
+        Columns whose cells also include the quantity 'kind' (when present), as `[value, kind]`.
+    log : `logging.Logger` or None
+
+    """
+
+    _VERSION = 1
+
+    def __init__(self, path, columns, page_size=500, kind_keys=[], log=None):
+        if page_size < 1:
+            raise ValueError("`page_size` must be positive, not {}!".format(page_size))
+
+        self.path = path
+        self.columns = [tuple(cc) for cc in columns]
+        self.page_size = page_size
+        self.kind_keys = set(kind_keys)
+        self.log = log
+
+        self.num_rows = 0
+        self.closed = False
+        # Description of each page written so far, and the rows of the current (unwritten) page
+        self._pages = []
+        self._rows = []
+        self._keys = [cc[0] for cc in self.columns]
+        return
+
+    def add(self, name, entry):
+        """Add a row for the given entry (dict of quantity lists), writing the page once full.
+        """
+        if self.closed:
+            raise RuntimeError("Table in '{}' is already closed!".format(self.path))
+
+        row = [name]
+        for key in self._keys[1:]:
+            row.append(_cell(entry.get(key), key in self.kind_keys))
+        self._rows.append(row)
+        if len(self._rows) >= self.page_size:
+            self._write_page()
+        return
+
+    def close(self):
+        """Write the final (partial) page, the completed manifest, and remove any stale pages.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if len(self._rows):
+            self._write_page(complete=True)
+        else:
+            self._write_manifest(complete=True)
+
+        # Remove pages left from a previous (larger) table
+        for fname in glob.glob(os.path.join(self.path, "page-*.json")):
+            match = _PAGE_REGEX.search(fname)
+            if (match is not None) and (int(match.group(1)) >= len(self._pages)):
+                os.remove(fname)
+
+        if self.log is not None:
+            self.log.info("Wrote {} table rows in {} pages to '{}'".format(
+                self.num_rows, len(self._pages), self.path))
+        return
+
+    def abort(self):
+        """Write the rows added so far, with the manifest still marked as incomplete.
+
+        Used when the table could not be finished (e.g. the run failed): pages from a previous
+        table are not removed, as this one may have fewer pages only because it is incomplete.
+        """
+        if self.closed:
+            return
+        self.closed = True
+        if len(self._rows):
+            self._write_page(complete=False)
+        if self.log is not None:
+            self.log.warning("Table in '{}' is incomplete: {} rows in {} pages".format(
+                self.path, self.num_rows, len(self._pages)))
+        return
+
+    def _write_page(self, complete=False):
+        index = len(self._pages)
+        fname = _PAGE_FNAME.format(index)
+        page = OrderedDict()
+        page['page'] = index
+        page['start'] = self.num_rows
+        page['rows'] = self._rows
+        _write_json(os.path.join(self.path, fname), page)
+
+        self._pages.append(OrderedDict([
+            ('file', fname), ('rows', len(self._rows)),
+            ('first', self._rows[0][0]), ('last', self._rows[-1][0])
+        ]))
+        self.num_rows += len(self._rows)
+        self._rows = []
+        self._write_manifest(complete=complete)
+        return
+
+    def _write_manifest(self, complete):
+        manifest = OrderedDict()
+        manifest['version'] = self._VERSION
+        manifest['generated'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        manifest['complete'] = complete
+        manifest['columns'] = [OrderedDict([('key', kk), ('label', ll)]) for kk, ll in self.columns]
+        manifest['page_size'] = self.page_size
+        manifest['num_rows'] = self.num_rows
+        manifest['num_pages'] = len(self._pages)
+        manifest['pages'] = self._pages
+        _write_json(os.path.join(self.path, _MANIFEST_FNAME), manifest, indent=1)
+        return
+
+
+def _cell(values, with_kind):
+    """Table cell for a list of quantities: the value of the first, optionally with its kind.
+    """
+    if not values:
+        return None
+    # Single (non-list) values
+    if not isinstance(values, list):
+        values = [values]
+    first = values[0]
+    if not isinstance(first, dict):
+        return first
+
+    value = first.get(QUANTITY.VALUE)
+    kind = first.get(QUANTITY.KIND) if with_kind else None
+    if kind is not None:
+        return [value, kind]
+    return value
+
+
+def _write_json(fname, data, indent=None):
+    """Write JSON to a temporary file, and then replace the target file.
+    """
+    path = os.path.dirname(fname)
+    if not os.path.isdir(path):
+        os.makedirs(path)
+
+    separators = (',', ':') if indent is None else None
+    temp = fname + '.tmp'
+    with open(temp, 'w') as out:
+        json.dump(data, out, indent=indent, separators=separators)
+    os.replace(temp, fname)
+    return
@@ -0,0 +1,223 @@
+"""Dependency graph of import tasks, and a scheduler running them concurrently.
+
+Tasks in 'input/tasks.json' may list the tasks they require with an optional `depends_on` field,
+e.g. `"depends_on": ["merge_duplicates"]`.  Tasks without one keep the ordering given by their
+`priority`: they depend on all (active) tasks of the preceding priority value, in the order used
+by `Catalog.load_task_list` (positive priorities ascending, then negative ones ascending).  Without
+any `depends_on` fields the graph is therefore the usual serial chain of priority groups.
+
+`TaskGraph.run` starts each task as soon as all of its dependencies have finished, running up to
+`workers` tasks at the same time (in threads), preferring tasks in priority order.  With a single
+worker, tasks run one at a time in a valid order, which is the priority order unless `depends_on`
+fields say otherwise.
+
+Tasks running at the same time share the catalog's entries: each entry belongs to the task which
+added it until that task journals it or finishes, and other tasks adding the same entry wait until
+then (see `BlackholeCatalog.add_entry`), so tasks which share entries effectively run one after
+another.  Each task has its own checkpoint, download retries, validation and memory phase.
+
+For each run the critical path, i.e. the chain of dependent tasks with the largest total
+duration (which bounds the duration of the run no matter how many workers are used), is
+determined by `TaskGraph.critical_path` and added to the run report (see `BlackholeCatalog`).
+
+"""
+import time
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor, FIRST_COMPLETED, wait
+
+__all__ = ["TaskGraph", "load_task_dependencies"]
+
+
+def load_task_dependencies(data):
+    """Remove the `depends_on` fields from the tasks data (loaded from 'tasks.json').
+
+    `Task` objects only accept known parameters, so dependencies are stored separately.
+
+    Returns
+    -------
+    depends_on : dict
+        For each task name, the list of names of the tasks it depends on (or None if not given).
+
+    """
+    depends_on = {}
+    for name, vals in data.items():
+        deps = vals.pop('depends_on', None)
+        if isinstance(deps, str):
+            deps = [deps]
+        depends_on[name] = deps
+    return depends_on
+
+
+class TaskGraph:
+    """Dependencies between the active tasks.
+
+    Arguments
+    ---------
+    tasks : `OrderedDict` of `Task`
+        All tasks, in priority order (as returned by `Catalog.load_task_list`).  Only active tasks
+        are included in the graph.
+    depends_on : dict
+        For each task name, the names of the tasks it depends on, or None to use its priority.
+    log : `logging.Logger`
+
+    """
+
+    def __init__(self, tasks, depends_on, log):
+        self.log = log
+        self.tasks = OrderedDict((nn, tt) for nn, tt in tasks.items() if tt.active)
+        self.deps = OrderedDict()
+        # Dependencies from the priority ordering alone
+        self._priority_deps = {}
+
+        prev_group = []
+        group = []
+        priority = None
+        for name, task in self.tasks.items():
+            if task.priority != priority:
+                prev_group, group = (group if len(group) else prev_group), []
+                priority = task.priority
+            group.append(name)
+
+            self._priority_deps[name] = list(prev_group)
+            deps = depends_on.get(name)
+            if deps is None:
+                self.deps[name] = list(prev_group)
+                continue
+
+            for dd in deps:
+                if dd not in tasks:
+                    raise ValueError("Task '{}' depends on unknown task '{}'!".format(name, dd))
+            # Dependencies on inactive tasks are already satisfied
+            self.deps[name] = [dd for dd in deps if dd in self.tasks]
+
+        self._check_cycles()
+        return
+
+    @property
+    def explicit(self):
+        """Whether the graph differs from the serial priority ordering.
+        """
+        return any(self.deps[nn] != self._priority_deps[nn] for nn in self.tasks)
+
+    def run(self, run_task, workers=1):
+        """Run all tasks, each once its dependencies have finished.
+
+        Arguments
+        ---------
+        run_task : callable
+            Called with each `Task`.
+        workers : int
+            Maximum number of tasks run at the same time.
+
+        Returns
+        -------
+        durations : `OrderedDict`
+            Duration [seconds] of each task, in the order they finished.
+
+        If a task fails, no further tasks are started, and the error is raised once the running
+        tasks have finished.
+
+        """
+        workers = max(workers, 1)
+        remaining = OrderedDict((nn, set(dd)) for nn, dd in self.deps.items())
+        durations = OrderedDict()
+        running = {}
+        error = None
+        lock = threading.Lock()
+
+        def _timed(task):
+            beg = time.monotonic()
+            run_task(task)
+            with lock:
+                durations[task.name] = time.monotonic() - beg
+            return
+
+        with ThreadPoolExecutor(max_workers=workers) as pool:
+            while (error is None) and (len(remaining) or len(running)):
+                ready = [nn for nn, dd in remaining.items() if not len(dd)]
+                for name in ready[:workers - len(running)]:
+                    del remaining[name]
+                    self.log.debug("Starting task '{}' ({} running)".format(name, len(running)))
+                    running[pool.submit(_timed, self.tasks[name])] = name
+
+                if not len(running):
+                    # Not reachable for an acyclic graph
+                    raise RuntimeError("No runnable tasks: {}".format(list(remaining.keys())))
+
+                done, _ = wait(list(running.keys()), return_when=FIRST_COMPLETED)
+                for fut in done:
+                    name = running.pop(fut)
+                    if fut.exception() is not None:
+                        error = error or fut.exception()
+                        self.log.error("Task '{}' failed: {}".format(name, fut.exception()))
+                        continue
+                    for dd in remaining.values():
+                        dd.discard(name)
+
+            # Let running tasks finish before raising
+            for fut in running:
+                if fut.exception() is not None:
+                    self.log.error("Task '{}' failed: {}".format(running[fut], fut.exception()))
+
+        if error is not None:
+            raise error
+        return durations
+
+    def critical_path(self, durations):
+        """Chain of dependent tasks with the largest total duration.
+
+        Arguments
+        ---------
+        durations : dict
+            Duration of each task; tasks which were not run count as zero.
+
+        Returns
+        -------
+        path : list of str
+            Names of the tasks along the critical path, in order.
+        total : float
+            Total duration of the critical path.
+
+        """
+        # Longest path ending at each task, visiting tasks in dependency order
+        finish = {}
+        prev = {}
+        for name in self._topological_order():
+            best = None
+            for dd in self.deps[name]:
+                if (best is None) or (finish[dd] > finish[best]):
+                    best = dd
+            prev[name] = best
+            finish[name] = durations.get(name, 0.0) + (finish[best] if best else 0.0)
+
+        if not len(finish):
+            return [], 0.0
+
+        name = max(finish, key=lambda nn: finish[nn])
+        total = finish[name]
+        path = []
+        while name is not None:
+            path.append(name)
+            name = prev[name]
+        return path[::-1], total
+
+    def _topological_order(self):
+        order = []
+        done = set()
+        remaining = list(self.tasks.keys())
+        while len(remaining):
+            ready = [nn for nn in remaining if all(dd in done for dd in self.deps[nn])]
+            if not len(ready):
+                return None
+            for nn in ready:
+                order.append(nn)
+                done.add(nn)
+                remaining.remove(nn)
+        return order
+
+    def _check_cycles(self):
+        if self._topological_order() is None:
+            raise ValueError("Task dependencies contain a cycle: {}".format(
+                {nn: dd for nn, dd in self.deps.items() if len(dd)}))
+        return
@@ -0,0 +1,517 @@
+"""Fast validators for entry quantities, generated from the blackhole schema.
+
+Generic JSON-schema validation (`jsonschema`, via `pyastroschema`) of every quantity is one of the
+most expensive parts of `add_quantity`.  Instead, the schema in 'schema/bh_blackhole.json' is:
+    1)  resolved locally: all '$ref's are inlined, with references to other files (e.g. the
+        absolute 'file:/Users/.../quantity.json') looked up by file name in local schema
+        directories (this package, `pyastroschema` and `astrocats`),
+    2)  compiled into the source code of one specialized Python function for each property (e.g.
+        'mass', 'fwhm_hbeta'), containing only the checks required by that property's schema,
+    3)  cached on disk ('output/cache/schema-validators_<hash>.py', keyed by the resolved schema),
+        so that the code is only regenerated when the schema changes.
+
+The generated functions follow the semantics of the `pyastroschema` validator (JSON-schema draft 4,
+the 'numeric' and 'astrotime' formats, and setting `default` values of properties).  Keywords which
+are not supported by the compiler are checked with `jsonschema` instead, for that part of the
+schema only.  If the schema cannot be resolved locally, no validators are available and quantities
+are validated generically, as before.
+
+"""
+import os
+import re
+import json
+import glob
+import hashlib
+import importlib.util
+
+__all__ = ["SchemaValidators", "SchemaResolutionError", "resolve_schema", "generate_source",
+           "schema_search_paths"]
+
+# Increment when the generated code changes, to invalidate cached validators
+_GENERATOR_VERSION = 1
+
+# Keywords which do not affect validation
+_ANNOTATIONS = set(['id', '$schema', 'title', 'description', 'definitions', 'default',
+                    '$comment', 'examples', 'unique', 'distinguishing', 'comparable', 'alias'])
+# Keywords which are compiled
+_COMPILED = set(['type', 'format', 'enum', 'properties', 'required', 'additionalProperties',
+                 'items', 'minItems', 'maxItems', 'anyOf', 'allOf', 'oneOf', 'not',
+                 'minimum', 'maximum', 'pattern', 'minLength', 'maxLength'])
+
+# Python expressions checking JSON-schema (draft 4) types, of the variable `data`
+_TYPE_CHECKS = {
+    'string': "isinstance(data, str)",
+    'number': "(isinstance(data, (int, float)) and not isinstance(data, bool))",
+    'integer': "(_is_integer(data))",
+    'boolean': "isinstance(data, bool)",
+    'array': "isinstance(data, list)",
+    'object': "isinstance(data, dict)",
+    'null': "(data is None)",
+}
+
+
+class SchemaResolutionError(Exception):
+    pass
+
+
+class SchemaValidators:
+    """Compiled validators for each property of an entry schema.
+
+    Arguments
+    ---------
+    schema_fname : str
+        Entry schema, e.g. 'schema/bh_blackhole.json'.
+    search_paths : list of str
+        Directories in which files referenced by the schema are looked for.
+    cache_dir : str or None
+        Directory in which the generated code is cached.  If None, it is not saved.
+    log : `logging.Logger` or None
+
+    """
+
+    def __init__(self, schema_fname, search_paths, cache_dir=None, log=None):
+        self.log = log
+        schema = resolve_schema(schema_fname, search_paths)
+        properties = schema.get('properties', {})
+
+        key = json.dumps([_GENERATOR_VERSION, properties], sort_keys=True)
+        key = hashlib.sha1(key.encode('utf-8')).hexdigest()[:12]
+        module_name = "schema_validators_{}".format(key)
+
+        fname = None
+        if cache_dir is not None:
+            fname = os.path.join(cache_dir, "schema-validators_{}.py".format(key))
+
+        if (fname is None) or not os.path.exists(fname):
+            source = generate_source(properties)
+            if fname is not None:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                temp = fname + '.tmp'
+                with open(temp, 'w') as out:
+                    out.write(source)
+                os.replace(temp, fname)
+                self._debug("Saved schema validators to '{}'".format(fname))
+
+        if fname is None:
+            module = _module_from_source(module_name, source)
+        else:
+            # Load as a module, so that the compiled bytecode is also cached
+            spec = importlib.util.spec_from_file_location(module_name, fname)
+            module = importlib.util.module_from_spec(spec)
+            spec.loader.exec_module(module)
+            self._debug("Loaded schema validators from '{}'".format(fname))
+
+        module._init_fallbacks(_jsonschema_validator)
+        self._validators = module.VALIDATORS
+        return
+
+    def __contains__(self, key):
+        return key in self._validators
+
+    def __len__(self):
+        return len(self._validators)
+
+    def get(self, key, default=None):
+        """Return the validator for the given property (`func(data)`, raising `ValidationError`).
+        """
+        return self._validators.get(key, default)
+
+    def validate(self, key, data):
+        """Validate `data` as a value of the property `key`, raising `ValidationError` if invalid.
+        """
+        self._validators[key](data)
+        return
+
+    def _debug(self, msg):
+        if self.log is not None:
+            self.log.debug(msg)
+        return
+
+
+def resolve_schema(fname, search_paths):
+    """Load the given schema with all '$ref's replaced by the (local) schemas they refer to.
+    """
+    loaded = {}
+
+    def load(path):
+        if path not in loaded:
+            with open(path, 'r') as inp:
+                loaded[path] = json.load(inp)
+        return loaded[path]
+
+    def find(ref):
+        # Look for the referenced file by name, in the same directory first
+        name = os.path.basename(re.sub(r'^file:(//)?', '', ref))
+        for path in [os.path.dirname(fname)] + list(search_paths):
+            cand = os.path.join(path, name)
+            if os.path.isfile(cand):
+                return cand
+        raise SchemaResolutionError("Cannot find referenced schema '{}' locally!".format(ref))
+
+    def resolve(node, doc, stack):
+        if isinstance(node, list):
+            return [resolve(nn, doc, stack) for nn in node]
+        if not isinstance(node, dict):
+            return node
+
+        ref = node.get('$ref')
+        if ref is None:
+            return {kk: (vv if kk == 'definitions' else resolve(vv, doc, stack))
+                    for kk, vv in node.items()}
+
+        file_part, _, pointer = ref.partition('#')
+        target_doc = doc if (len(file_part) == 0) else find(file_part)
+        ref_key = (target_doc, pointer)
+        if ref_key in stack:
+            raise SchemaResolutionError("Recursive reference '{}' is not supported!".format(ref))
+
+        target = load(target_doc)
+        for part in [pp for pp in pointer.split('/') if len(pp)]:
+            part = part.replace('~1', '/').replace('~0', '~')
+            try:
+                target = target[int(part) if isinstance(target, list) else part]
+            except (KeyError, IndexError, ValueError):
+                raise SchemaResolutionError("Cannot resolve reference '{}'!".format(ref))
+
+        return resolve(target, target_doc, stack | set([ref_key]))
+
+    fname = os.path.abspath(fname)
+    return resolve(load(fname), fname, frozenset())
+
+
+def generate_source(properties):
+    """Generate the source code of a module with a validator function for each property.
+    """
+    gen = _CodeGenerator()
+    names = {}
+    for key, schema in properties.items():
+        names[key] = gen.function(schema)
+
+    lines = [
+        '"""Validators generated from the blackhole schema by `schema_validators`, do not edit.',
+        '"""',
+        'import re as _re',
+        '',
+        'from jsonschema import ValidationError',
+        '',
+        '# Marker for missing properties',
+        '_MISSING = object()',
+        '',
+        '',
+        'def _is_integer(data):',
+        '    if isinstance(data, bool):',
+        '        return False',
+        '    return isinstance(data, int) or (isinstance(data, float) and data.is_integer())',
+        '',
+        '',
+        'def _is_numeric(data):',
+        '    if isinstance(data, (list, dict)) or (isinstance(data, str) and " " in data):',
+        '        return False',
+        '    try:',
+        '        float(data)',
+        '    except (TypeError, ValueError):',
+        '        return False',
+        '    return True',
+        '',
+        '',
+        'def _is_astrotime(data):',
+        '    if isinstance(data, (list, dict)):',
+        '        return False',
+        '    return _is_numeric(data) or (isinstance(data, str) and ("-" in data or "/" in data))',
+        '',
+        '',
+        '# Schemas checked with `jsonschema`, see `_init_fallbacks`',
+        '_FALLBACK_SCHEMAS = {!r}'.format(gen.fallbacks),
+        '_FALLBACKS = []',
+        '',
+        '',
+        'def _init_fallbacks(construct):',
+        '    _FALLBACKS[:] = [construct(ss) for ss in _FALLBACK_SCHEMAS]',
+        '    return',
+        '',
+        '',
+        'def _fallback(num, data):',
+        '    err = next(iter(_FALLBACKS[num].iter_errors(data)), None)',
+        '    return None if (err is None) else err.message',
+        '',
+        '',
+        'def _wrap(check):',
+        '    def validate(data):',
+        '        msg = check(data)',
+        '        if msg is not None:',
+        '            raise ValidationError(msg)',
+        '        return',
+        '    return validate',
+        '',
+    ]
+    for ii, pattern in enumerate(gen.patterns):
+        lines.append('_PATTERN_{} = _re.compile({!r})'.format(ii, pattern))
+    lines.extend(gen.lines)
+    lines.extend(['', '', 'VALIDATORS = {'])
+    for key, name in names.items():
+        lines.append('    {!r}: _wrap({}),'.format(key, name))
+    lines.append('}')
+    return "\n".join(lines) + "\n"
+
+
+class _CodeGenerator:
+    """Generate check functions (returning an error message, or None) for (sub)schemas.
+
+    Simple subschemas (without any nested schemas) are checked inline, others by calling the
+    function generated for them.
+    """
+
+    # Keywords containing nested schemas
+    _NESTED = set(['properties', 'additionalProperties', 'items', 'anyOf', 'allOf', 'oneOf', 'not'])
+
+    def __init__(self):
+        self.lines = []
+        self.fallbacks = []
+        self.patterns = []
+        # Functions already generated for identical schemas
+        self._names = {}
+        self._num_vars = 0
+        return
+
+    def function(self, schema):
+        """Generate the function checking `schema` (if needed), and return its name.
+        """
+        key = json.dumps(schema, sort_keys=True)
+        if key in self._names:
+            return self._names[key]
+
+        name = "_check_{}".format(len(self._names))
+        self._names[key] = name
+        # Generate the body first, so that any nested functions are defined before this one
+        body = self._body(schema, 'data')
+        self.lines.extend(['', '', 'def {}(data):'.format(name)])
+        self.lines.extend(_indent(body, 1))
+        self.lines.append('    return None')
+        return name
+
+    def _check(self, schema, var):
+        """Code checking the variable `var` against `schema`, returning any error message.
+        """
+        if isinstance(schema, dict) and not (self._NESTED & set(schema.keys())):
+            return self._body(schema, var)
+        return ['msg = {}({})'.format(self.function(schema), var),
+                'if msg is not None:',
+                '    return msg']
+
+    def _new_var(self):
+        self._num_vars += 1
+        return "v{}".format(self._num_vars)
+
+    def _body(self, schema, var):
+        if not isinstance(schema, dict):
+            raise SchemaResolutionError("Unsupported schema '{}'!".format(schema))
+
+        body = []
+        other = set(schema.keys()) - _ANNOTATIONS - _COMPILED
+        if len(other):
+            # Check this whole (sub)schema with `jsonschema`
+            num = len(self.fallbacks)
+            self.fallbacks.append(schema)
+            body.append('msg = _fallback({}, {})'.format(num, var))
+            body.append('if msg is not None:')
+            body.append('    return msg')
+            return body
+
+        types = schema.get('type')
+        if types is not None:
+            types = [types] if isinstance(types, str) else list(types)
+            body.append('if not ({}):'.format(_type_check(types, var)))
+            names = ", ".join(repr(tt) for tt in types)
+            body.append('    ' + _err("{data} is not of type " + names, var))
+
+        fmt = schema.get('format')
+        if fmt in ['numeric', 'astrotime']:
+            body.append('if not _is_{}({}):'.format(fmt, var))
+            body.append('    ' + _err("{data} is not a " + repr(fmt), var))
+
+        if 'enum' in schema:
+            body.append('if {} not in {!r}:'.format(var, schema['enum']))
+            body.append('    ' + _err("{data} is not one of " + repr(schema['enum']), var))
+
+        body.extend(self._guard(self._object(schema, var), types, 'object', var))
+        body.extend(self._guard(self._array(schema, var), types, 'array', var))
+        body.extend(self._guard(self._number(schema, var), types, 'number', var))
+        body.extend(self._guard(self._string(schema, var), types, 'string', var))
+
+        for sub in schema.get('allOf', []):
+            body.extend(self._check(sub, var))
+
+        if 'anyOf' in schema:
+            fails = ["{}({}) is not None".format(self.function(sub), var)
+                     for sub in schema['anyOf']]
+            body.append('if {}:'.format(" and ".join(fails)))
+            body.append('    ' + _err("{data} is not valid under any of the given schemas", var))
+
+        if 'oneOf' in schema:
+            valid = ["({}({}) is None)".format(self.function(sub), var) for sub in schema['oneOf']]
+            body.append('if ({}) != 1:'.format(" + ".join(valid)))
+            body.append('    ' + _err(
+                "{data} is not valid under exactly one of the given schemas", var))
+
+        if 'not' in schema:
+            body.append('if {}({}) is None:'.format(self.function(schema['not']), var))
+            body.append('    ' + _err("{data} is not allowed", var))
+
+        return body
+
+    def _guard(self, body, types, kind, var):
+        """Apply type-specific checks only to values of that type (unless it's the only type).
+        """
+        if not len(body):
+            return body
+        if types == [kind]:
+            return body
+        check = _type_check([kind], var) if (kind != 'number') else _type_check(
+            ['number', 'integer'], var)
+        return ['if {}:'.format(check)] + _indent(body, 1)
+
+    def _object(self, schema, var):
+        props = schema.get('properties', {})
+        required = schema.get('required', [])
+        additional = schema.get('additionalProperties', True)
+        body = []
+        for key, sub in props.items():
+            if isinstance(sub, dict) and ('default' in sub):
+                body.append('{}.setdefault({!r}, {!r})'.format(var, key, sub['default']))
+        for key in required:
+            if key not in props:
+                body.append('if {!r} not in {}:'.format(key, var))
+                body.append('    ' + _err(repr(key) + " is a required property", var))
+        for key, sub in props.items():
+            val = self._new_var()
+            body.append('{} = {}.get({!r}, _MISSING)'.format(val, var, key))
+            check = self._check(sub, val)
+            if key in required:
+                body.append('if {} is _MISSING:'.format(val))
+                body.append('    ' + _err(repr(key) + " is a required property", var))
+                body.extend(check)
+            elif len(check):
+                body.append('if {} is not _MISSING:'.format(val))
+                body.extend(_indent(check, 1))
+        if additional is False:
+            body.append('extra = set({}) - {!r}'.format(var, set(props.keys())))
+            body.append('if len(extra):')
+            body.append('    return "Additional properties are not allowed ({})".format('
+                        '", ".join(sorted(extra)))')
+        elif isinstance(additional, dict):
+            key, val = self._new_var(), self._new_var()
+            body.append('for {}, {} in {}.items():'.format(key, val, var))
+            body.append('    if {} not in {!r}:'.format(key, set(props.keys())))
+            body.extend(_indent(self._check(additional, val), 2))
+        return body
+
+    def _array(self, schema, var):
+        items = schema.get('items')
+        if (items is not None) and not isinstance(items, dict):
+            raise SchemaResolutionError("Only a single `items` schema is supported!")
+
+        body = []
+        if 'minItems' in schema:
+            body.append('if len({}) < {}:'.format(var, schema['minItems']))
+            body.append('    ' + _err("{data} is too short", var))
+        if 'maxItems' in schema:
+            body.append('if len({}) > {}:'.format(var, schema['maxItems']))
+            body.append('    ' + _err("{data} is too long", var))
+        if items is not None:
+            item = self._new_var()
+            body.append('for {} in {}:'.format(item, var))
+            body.extend(_indent(self._check(items, item), 1))
+        return body
+
+    def _number(self, schema, var):
+        body = []
+        if 'minimum' in schema:
+            body.append('if {} < {!r}:'.format(var, schema['minimum']))
+            body.append('    ' + _err("{data} is less than the minimum of " +
+                                     repr(schema['minimum']), var))
+        if 'maximum' in schema:
+            body.append('if {} > {!r}:'.format(var, schema['maximum']))
+            body.append('    ' + _err("{data} is greater than the maximum of " +
+                                     repr(schema['maximum']), var))
+        return body
+
+    def _string(self, schema, var):
+        body = []
+        if 'minLength' in schema:
+            body.append('if len({}) < {}:'.format(var, schema['minLength']))
+            body.append('    ' + _err("{data} is too short", var))
+        if 'maxLength' in schema:
+            body.append('if len({}) > {}:'.format(var, schema['maxLength']))
+            body.append('    ' + _err("{data} is too long", var))
+        if 'pattern' in schema:
+            num = len(self.patterns)
+            self.patterns.append(schema['pattern'])
+            body.append('if _PATTERN_{}.search({}) is None:'.format(num, var))
+            body.append('    ' + _err("{data} does not match " + repr(schema['pattern']), var))
+        return body
+
+
+def _type_check(types, var):
+    """Python expression checking whether `var` has one of the given JSON-schema (draft 4) types.
+    """
+    classes = []
+    for tt, cc in [('string', 'str'), ('array', 'list'), ('object', 'dict'),
+                   ('boolean', 'bool'), ('null', 'type(None)')]:
+        if tt in types:
+            classes.append(cc)
+    numbers = ('number' in types)
+    if numbers:
+        classes.extend(['int', 'float'])
+    if not len(classes):
+        return "_is_integer({})".format(var) if ('integer' in types) else "False"
+
+    check = "isinstance({}, ({},))".format(var, ", ".join(classes))
+    # `bool` is a subclass of `int`, but JSON booleans are not numbers
+    if numbers and ('boolean' not in types):
+        check = "({} and {} is not True and {} is not False)".format(check, var, var)
+    if ('integer' in types) and not numbers:
+        check = "({} or _is_integer({}))".format(check, var)
+    return check
+
+
+def _indent(lines, num):
+    return ['    ' * num + ll for ll in lines]
+
+
+def _err(text, var='data'):
+    """Code returning the error message `text`, with '{data}' replaced by the `repr` of `var`.
+    """
+    template = text.replace('{', '{{').replace('}', '}}').replace('{{data}}', '{!r}')
+    if template == text:
+        return 'return {!r}'.format(text)
+    return 'return {!r}.format({})'.format(template, var)
+
+
+def _jsonschema_validator(schema):
+    """Construct a `jsonschema` validator equivalent to the `pyastroschema` one.
+    """
+    from pyastroschema import validation
+    return validation.PAS_Validator(schema)
+
+
+def _module_from_source(name, source):
+    spec = importlib.util.spec_from_loader(name, loader=None)
+    module = importlib.util.module_from_spec(spec)
+    exec(compile(source, name, 'exec'), module.__dict__)
+    return module
+
+
+def schema_search_paths():
+    """Local directories containing schema files which may be referenced by the blackhole schema.
+    """
+    import astrocats
+    import pyastroschema
+    from astrocats.blackholes import PATH_BH_SCHEMA
+
+    paths = [PATH_BH_SCHEMA]
+    paths.append(os.path.join(os.path.dirname(pyastroschema.__file__), 'schema'))
+    path_ac = getattr(astrocats, '_PATH_SCHEMA', None)
+    if path_ac is not None:
+        paths.extend([path_ac] + glob.glob(os.path.join(path_ac, '*', '')))
+    return [pp for pp in paths if os.path.isdir(pp)]
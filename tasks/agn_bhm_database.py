@@ -3,22 +3,24 @@
 http://www.astro.gsu.edu/AGNmass/
 See: http://adsabs.harvard.edu/abs/2015PASP..127...67B
 
-Loads a bunch of AGN entries from URLs for each one.  Each entry (URL) is cached to a local txt
-file in 'blackholes/input/external/'.
+Loads a bunch of AGN entries from URLs for each one.  The subpage for each entry (URL) is cached
+in a single zip archive ('SUBPAGE_ARCHIVE') in 'blackholes/input/external/', indexed by URL.
+Previously cached individual txt files are still read (and moved into the archive) if present.
 
-In normal mode, AGN entries are loaded from URLs, saved to cached files (`catalog.load_url`).
-In archive mode, the cached files are loaded.
+In normal mode, AGN entries are loaded from URLs, saved to cached files.  The subpages for all
+entries are downloaded concurrently (`utils.fetch_to_cache`), and each entry is processed as soon
+as its subpage arrives.  In archive mode, the cached files are loaded.  All pages can be
+downloaded in advance with the 'prefetch' subcommand (see `prefetch`).
 
 """
 import re
 from bs4 import BeautifulSoup
 import numpy as np
 
-from astrocats.catalog import utils
-from astrocats.catalog.struct import PHOTOMETRY, QUANTITY, SOURCE
-from astrocats.catalog.struct import Source
+from astrocats.catalog.struct import PHOTOMETRY, QUANTITY
 
 from astrocats.blackholes.blackhole import BLACKHOLE, BH_MASS_METHODS
+from astrocats.blackholes.utils import RowSampler, fetch_to_cache, task_progress
 
 SOURCE_BIBCODE = "2015PASP..127...67B"
 SOURCE_NAME = "Bentz & Katz 2015"
@@ -26,6 +28,9 @@ SOURCE_URL = "http://adsabs.harvard.edu/abs/2015PASP..127...67B"
 DATA_URL = "http://www.astro.gsu.edu/AGNmass/"
 DATA_SUBPAGE_URL = "http://www.astro.gsu.edu/AGNmass/details.php?varname={}"
 
+# All subpages are cached in this (single) archive, see `utils.PageArchive`
+SUBPAGE_ARCHIVE = SOURCE_BIBCODE + "_subpages.zip"
+
 DESC_AGN_LUM = "Spectroscopic, monochromatic luminosities at 5100 angstrom."
 
 
@@ -36,7 +41,6 @@ def do_agn_bhm_database(catalog):
     """
     log = catalog.log
     log.debug("do_agn_bhm_database()")
-    task_str = catalog.get_current_task_str()
     # Load data from URL or cached copy of it
     cached_path = SOURCE_BIBCODE + '.txt'
     html = catalog.load_url(DATA_URL, cached_path, fail=True)
@@ -55,44 +59,100 @@ def do_agn_bhm_database(catalog):
         catalog.log.error(err_msg)
         return False
 
-    soup = BeautifulSoup(html, 'html5lib')
+    table_rows = _table_rows(html)
+    sampler = RowSampler(catalog, total=len(table_rows))
 
-    # The whole table is nested in a `<table class="hovertable">`
-    full_table = soup.find('table', attrs={'class': 'hovertable'})
-    # Each line in the file is separated with `'tr'`
-    div_lines = full_table.find_all('tr')
+    # Go through each element of the tables, collecting the rows (and subpages) to load
+    rows = {}
+    subpages = []
+    for varname, line in table_rows:
+        if not sampler.keep(varname):
+            continue
 
-    # Go through each element of the tables
+        cells = _split_data_line(line)
+        if not len(cells):
+            continue
+
+        # Create the entry now, so that the cache filename uses the final entry name
+        name = catalog.add_entry(cells[0])
+        data_url = DATA_SUBPAGE_URL.format(varname)
+        rows[data_url] = (line, varname)
+        subpages.append((data_url, _subpage_cache_filename(name)))
+
+    # Download (or load cached) subpages concurrently, processing each one as it completes
     entries = 0
-    for div in utils.pbar(div_lines, task_str):
-        # Get the `varname` -- ID number for each row
-        #    The first element of the `contents` contains an href with the 'varname'
-        cell_text = str(div.contents[0])
-        groups = re.search('varname=([0-9]*)', cell_text)
-        # If no match is found, this is one of the header lines (not an entry line, skip)
-        if groups is not None:
-            varname = groups.groups()[0]
+    results = fetch_to_cache(catalog, subpages, archive=SUBPAGE_ARCHIVE)
+    with task_progress(catalog, total=len(subpages), unit='entries') as progress:
+        for result in progress.iter(results):
+            line, varname = rows[result.url]
             try:
-                name = _add_entry_for_data_line(catalog, div.text, varname, mass_scale_factor)
+                name = _add_entry_for_data_line(
+                    catalog, line, varname, mass_scale_factor, subpage_html=result.text)
             except Exception:
                 log.error("Failed `_add_entry_for_data_line()`")
-                log.error("`div.text`: '{}'".format(div.text))
+                log.error("`div.text`: '{}'".format(line))
                 log.error("`varname`: '{}'".format(varname))
                 raise
 
-
             if name is not None:
                 entries += 1
 
-                if catalog.args.travis and (entries > catalog.TRAVIS_QUERY_LIMIT):
-                    log.warning("Exiting on travis limit")
-                    break
+    if sampler.active:
+        log.warning(sampler.summary())
 
     return True
 
 
-def _add_entry_for_data_line(catalog, line, varname, mass_scale_factor):
+def prefetch(catalog):
+    """Download the main table and the subpages of all entries into the cache.
+
+    Used by `BlackholeCatalog.prefetch`; returns the number of inputs, and of failed downloads.
+    """
+    html = catalog.load_url(DATA_URL, SOURCE_BIBCODE + '.txt', fail=True)
+    subpages = []
+    for varname, line in _table_rows(html):
+        cells = _split_data_line(line)
+        if not len(cells):
+            continue
+        # The name given to a new entry by `catalog.add_entry`
+        name = catalog.clean_entry_name(cells[0])
+        subpages.append((DATA_SUBPAGE_URL.format(varname), _subpage_cache_filename(name)))
+
+    failed = 0
+    for result in fetch_to_cache(catalog, subpages, archive=SUBPAGE_ARCHIVE):
+        if result.text is None:
+            failed += 1
+
+    return 1 + len(subpages), failed
+
+
+def _table_rows(html):
+    """The `varname` (ID number used for the subpage URL) and text of each row of the main table.
     """
+    soup = BeautifulSoup(html, 'html5lib')
+
+    # The whole table is nested in a `<table class="hovertable">`
+    full_table = soup.find('table', attrs={'class': 'hovertable'})
+    # Each line in the file is separated with `'tr'`
+    rows = []
+    for div in full_table.find_all('tr'):
+        # Get the `varname` -- ID number for each row
+        #    The first element of the `contents` contains an href with the 'varname'
+        cell_text = str(div.contents[0])
+        groups = re.search('varname=([0-9]*)', cell_text)
+        # If no match is found, this is one of the header lines (not an entry line, skip)
+        if groups is None:
+            continue
+        rows.append((groups.groups()[0], div.text))
+
+    return rows
+
+
+def _add_entry_for_data_line(catalog, line, varname, mass_scale_factor, subpage_html=None):
+    """
+
+    If `subpage_html` is given, it is used as the (already loaded) contents of this entry's
+    subpage, otherwise the subpage is loaded with `catalog.load_url`.
 
     Columns:
     -------
@@ -110,8 +170,7 @@ def _add_entry_for_data_line(catalog, line, varname, mass_scale_factor):
 
     """
     log = catalog.log
-    cells = [ll.strip() for ll in line.split('  ') if len(ll.strip())]
-    # print(cells, varname)
+    cells = _split_data_line(line)
     if not len(cells):
         return None
 
@@ -135,20 +194,17 @@ def _add_entry_for_data_line(catalog, line, varname, mass_scale_factor):
     # Get data from blackhole-specific subpage
     # ----------------------------------------
     all_sources = [source]
-    source_names, source_urls, source_codes = _load_blackhole_subpage_data(
-        catalog, name, varname, source)
+    source_names, source_urls = _load_blackhole_subpage_data(
+        catalog, name, varname, source, html=subpage_html)
     # Warn on failure, but assume the entry is still okay.
     if not len(source_names):
         _warn(catalog, "Failed to load subpage for varname '{}'.".format(varname), line, name)
     # Add additional sources from sub-page
     else:
-        for sn, su, sb in zip(source_names, source_urls, source_codes):
-            src_kwargs = {SOURCE.NAME: sn, SOURCE.URL: su}
-            if sb is not None:
-                src_kwargs[SOURCE.BIBCODE] = sb
-            src = catalog.entries[name].add_source(**src_kwargs)
+        for sn, su in zip(source_names, source_urls):
+            src = catalog.references.add_source(catalog.entries[name], url=su, name=sn)
             if src is None:
-                log.error("`src_kwargs`: '{}'".format(src_kwargs))
+                log.error("Source: '{}' ({})".format(sn, su))
                 err = "Failed to add source!"
                 log.raise_error(err)
             all_sources.append(src)
@@ -215,21 +271,35 @@ def _add_entry_for_data_line(catalog, line, varname, mass_scale_factor):
     return name
 
 
-def _load_blackhole_subpage_data(catalog, name, varname, source):
+def _split_data_line(line):
+    """Split the text of a row of the main table into its (non-empty) cells.
+    """
+    return [ll.strip() for ll in line.split('  ') if len(ll.strip())]
+
+
+def _subpage_cache_filename(name):
+    """Filename (relative to the task repository) of the cached subpage for entry `name`.
+    """
+    return "{:s}_{:s}.txt".format(SOURCE_BIBCODE, name)
+
+
+def _load_blackhole_subpage_data(catalog, name, varname, source, html=None):
     """Load data from this entry's dedicated subpage.
 
+    If `html` is None, the subpage is loaded using `catalog.load_url`.
+
     Returns
     -------
     source_names : list of str
     source_urls : list of str
-    source_codes : list of (str or 'None')
     """
     # Construct URL and load HTML data
-    data_url = DATA_SUBPAGE_URL.format(varname)
-    cached_path = "{:s}_{:s}.txt".format(SOURCE_BIBCODE, name)
-    html = catalog.load_url(data_url, cached_path, fail=True)
     if html is None:
-        return [], [], []
+        data_url = DATA_SUBPAGE_URL.format(varname)
+        cached_path = _subpage_cache_filename(name)
+        html = catalog.load_url(data_url, cached_path, fail=True)
+    if html is None:
+        return [], []
 
     # Extract the 'activity' of the BH
     # --------------------------------
@@ -246,18 +316,16 @@ def _load_blackhole_subpage_data(catalog, name, varname, source):
     full_table = soup.find('table', attrs={'class': 'body'})
     source_names = []
     source_urls = []
-    source_codes = []
     # Go through each line of table
     for table_line in full_table.find_all('tr'):
         childs = list(table_line.children)
         # Valid, normal lines have 11 cells in them (i.e. besides header and filler)
         if len(childs) == 11:
             for ii in [3, 8]:
-                src_name, src_url, src_code = _source_url_name_from_cell(childs[ii])
+                src_name, src_url = _source_url_name_from_cell(childs[ii])
                 if src_name is not None and src_url is not None:
                     source_names.append(src_name)
                     source_urls.append(src_url)
-                    source_codes.append(src_code)
             # Get AGN Luminosity
             lum_cell = childs[9].text.strip().split('+/-')
             # Blank lines have ellipses, valid lines have '+/-' uncertainty
@@ -265,13 +333,11 @@ def _load_blackhole_subpage_data(catalog, name, varname, source):
                 lum_cell = [re.sub(r'[ ()]', r'', lc) for lc in lum_cell]
                 val, err = lum_cell
                 # The '10'th cell has the luminosity citation
-                src_name, src_url, src_code = _source_url_name_from_cell(childs[10])
+                src_name, src_url = _source_url_name_from_cell(childs[10])
                 if src_name is not None and src_url is not None:
                     # Add source for luminosity
-                    src_kwargs = {SOURCE.NAME: src_name, SOURCE.URL: src_url}
-                    if src_code is not None:
-                        src_kwargs[SOURCE.BIBCODE] = src_code
-                    lum_src = catalog.entries[name].add_source(**src_kwargs)
+                    lum_src = catalog.references.add_source(
+                        catalog.entries[name], url=src_url, name=src_name)
                     # List source as both primary and secondary sources
                     lum_src = ",".join([source, lum_src])
                     photo_kwargs = {
@@ -289,21 +355,20 @@ def _load_blackhole_subpage_data(catalog, name, varname, source):
     # Cut down to unique sources
     source_urls, inds = np.unique(source_urls, return_index=True)
     source_names = [source_names[ii] for ii in inds]
-    source_codes = [source_codes[ii] for ii in inds]
 
-    return source_names, source_urls, source_codes
+    return source_names, source_urls
 
 
 def _source_url_name_from_cell(cell):
     """Given a table cell (`bs4.element.NavigableString`) try to get citation name and url.
 
-    Returns 'None' values if either is missing or empty.
+    Returns 'None' values if either is missing or empty.  The bibcode of the citation is
+    determined from the URL when the source is added (see `utils.ReferenceResolver`).
 
     Returns
     -------
     name : str
     url : str
-    bibcode : str
 
     """
     # soup = BeautifulSoup(html, 'html5lib')
@@ -312,14 +377,12 @@ def _source_url_name_from_cell(cell):
         name = source_cell.text.strip()
         url = source_cell['href'].strip()
     except AttributeError:
-        return None, None, None
+        return None, None
 
     if not len(name) or not len(url):
-        return None, None, None
-
-    bibcode = Source.bibcode_from_url(url)
+        return None, None
 
-    return name, url, bibcode
+    return name, url
 
 
 def _warn(catalog, msg, line=None, name=None):
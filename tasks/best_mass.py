@@ -0,0 +1,164 @@
+"""Choose a single, preferred black hole mass for each entry.
+
+Entries can have many masses (`BLACKHOLE.MASS`) from different methods (`QUANTITY.KIND`, one of
+the `BH_MASS_METHODS`) e.g. Shen+2008 adds H-Beta, Mg-II, C-IV and a combined virial mass for each
+quasar.  This meta task selects one of them for each entry, and stores it as a derived quantity
+(`BLACKHOLE.MASS_BEST`, with `QUANTITY.DERIVED` set) so that it can be used directly (e.g. in the
+HTML table) instead of being re-derived by each consumer.
+
+Masses are ranked by the method hierarchy given in 'input/best_mass.json' (a list of
+`BH_MASS_METHODS` attribute names, from most to least preferred); masses with any other method are
+ranked last.  Between masses of the same rank, the one with the smallest uncertainty is chosen,
+and masses without uncertainties are only chosen if no others are available.  Remaining ties are
+broken by the order in which masses were added.
+
+Entries are loaded in chunks, and the selection for all masses in each chunk is done at once using
+`numpy.lexsort`.
+
+"""
+import os
+import json
+
+import numpy as np
+
+from astrocats.catalog.struct import QUANTITY
+from astrocats.blackholes.blackhole import BLACKHOLE, BH_MASS_METHODS
+from astrocats.blackholes.utils import iter_entry_chunks
+
+HIERARCHY_FILENAME = "best_mass.json"
+# Number of entries to load (and process together) at a time
+CHUNK_SIZE = 1000
+
+
+def do_best_mass(catalog):
+    """Set the preferred mass (`BLACKHOLE.MASS_BEST`) of all entries.
+    """
+    log = catalog.log
+    log.debug("best_mass.do_best_mass()")
+    hierarchy = load_mass_hierarchy(catalog)
+    log.info("Mass hierarchy: {}".format(hierarchy))
+
+    num = 0
+    tot = 0
+    for chunk in iter_entry_chunks(catalog, CHUNK_SIZE):
+        num += _set_best_masses(catalog, chunk, hierarchy)
+        tot += len(chunk)
+
+    log.info("Set preferred masses for {} of {} entries".format(num, tot))
+    return
+
+
+def load_mass_hierarchy(catalog):
+    """Load the ordered list of mass methods (`BH_MASS_METHODS` values), most preferred first.
+    """
+    fname = os.path.join(catalog.PATHS.PATH_INPUT, HIERARCHY_FILENAME)
+    with open(fname, 'r') as inp:
+        names = json.load(inp)['hierarchy']
+
+    hierarchy = []
+    for nn in names:
+        if not hasattr(BH_MASS_METHODS, nn):
+            catalog.log.raise_error(
+                "Unknown mass method '{}' in '{}'!".format(nn, fname), ValueError)
+        hierarchy.append(getattr(BH_MASS_METHODS, nn))
+
+    return hierarchy
+
+
+def select_best(entry_index, ranks, errors):
+    """Choose the best element for each entry, by rank, then error, then order.
+
+    Arguments
+    ---------
+    entry_index : (N,) array_like of int
+        Entry to which each element belongs.
+    ranks : (N,) array_like of int
+        Rank of the method of each element (lower is better).
+    errors : (N,) array_like of float
+        Uncertainty of each element (lower is better), `np.inf` if there is none.
+
+    Returns
+    -------
+    entries : (M,) ndarray of int
+        The unique entries.
+    best : (M,) ndarray of int
+        Index of the chosen element for each of `entries`.
+
+    """
+    entry_index = np.asarray(entry_index)
+    order = np.arange(entry_index.size)
+    # `np.lexsort` uses the *last* key as the primary one
+    idx = np.lexsort((order, errors, ranks, entry_index))
+    entries, first = np.unique(entry_index[idx], return_index=True)
+    return entries, idx[first]
+
+
+def _set_best_masses(catalog, names, hierarchy):
+    """Set the preferred mass for each of the given (loaded) entries.
+
+    Returns the number of entries for which a mass was set.
+    """
+    ranks = {kk: ii for ii, kk in enumerate(hierarchy)}
+    num_ranks = len(hierarchy)
+
+    # Collect all masses of all entries into flat arrays
+    entry_index = []
+    mass_ranks = []
+    mass_errors = []
+    masses = []
+    for ii, name in enumerate(names):
+        entry = catalog.entries[name]
+        # Remove any previously derived value, it is recomputed here
+        entry.pop(BLACKHOLE.MASS_BEST, None)
+        for mm in entry.get(BLACKHOLE.MASS, []):
+            if _to_float(mm.get(QUANTITY.VALUE)) is None:
+                continue
+            kind = mm.get(QUANTITY.KIND)
+            if isinstance(kind, list):
+                kind = kind[0] if len(kind) else None
+            entry_index.append(ii)
+            mass_ranks.append(ranks.get(kind, num_ranks))
+            mass_errors.append(_mass_error(mm))
+            masses.append(mm)
+
+    if not len(masses):
+        return 0
+
+    entries, best = select_best(entry_index, mass_ranks, mass_errors)
+
+    for ii, bb in zip(entries, best):
+        mm = masses[bb]
+        quant_kwargs = {QUANTITY.DERIVED: True}
+        for key in [QUANTITY.U_VALUE, QUANTITY.KIND, QUANTITY.E_VALUE,
+                    QUANTITY.E_LOWER_VALUE, QUANTITY.E_UPPER_VALUE]:
+            if key in mm:
+                quant_kwargs[key] = mm[key]
+        quant_kwargs[QUANTITY.DESCRIPTION] = (
+            "Preferred BH mass, chosen by method (see 'input/{}') and uncertainty.".format(
+                HIERARCHY_FILENAME))
+        catalog.entries[names[ii]].add_quantity(
+            BLACKHOLE.MASS_BEST, mm[QUANTITY.VALUE], mm[QUANTITY.SOURCE], **quant_kwargs)
+
+    return len(entries)
+
+
+def _mass_error(quant):
+    """Return the (average) uncertainty of the given quantity, or `np.inf` if there is none.
+    """
+    err = _to_float(quant.get(QUANTITY.E_VALUE))
+    if err is not None:
+        return abs(err)
+
+    errs = [_to_float(quant.get(kk)) for kk in [QUANTITY.E_LOWER_VALUE, QUANTITY.E_UPPER_VALUE]]
+    errs = [abs(ee) for ee in errs if ee is not None]
+    if len(errs):
+        return np.mean(errs)
+
+    return np.inf
+
+
+def _to_float(val):
+    try:
+        return float(val)
+    except (TypeError, ValueError):
+        return None
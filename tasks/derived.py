@@ -0,0 +1,164 @@
+"""Compute derived quantities for all entries.
+
+This meta task runs after all data have been imported (and after the preferred masses are chosen
+by the `best_mass` task), and adds:
+
+    `BLACKHOLE.DISTANCE`         : luminosity distance [Mpc] from the redshift, for entries with no
+                                   measured distance.
+    `BLACKHOLE.EDDINGTON_RATIO`  : log(L_bol / L_Edd), from the bolometric luminosity (photometry
+                                   with band 'bolometric') and the preferred mass.
+    `BLACKHOLE.RAD_INFLUENCE`    : radius of the sphere of influence, r = G M / sigma^2 [pc], from
+                                   the preferred mass and the host velocity dispersion.
+
+Each derived quantity has `QUANTITY.DERIVED` set, a description of how it was calculated, and the
+sources of all of the values used to calculate it.  Distances use the cosmology in
+`constants.COSMOLOGY`, and are interpolated from a cached table (`utils.CosmoDistances`).
+
+Entries are loaded in chunks, and the values for all entries in each chunk are calculated at once.
+
+"""
+import os
+
+import numpy as np
+
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
+from astrocats.blackholes.blackhole import BLACKHOLE
+from astrocats.blackholes.constants import (
+    COSMOLOGY, NWTG_PC_MSOL_KMS, EDDINGTON_LUM_PER_MSOL)
+from astrocats.blackholes.utils import CosmoDistances, iter_entry_chunks, first_float
+
+# Number of entries to load (and process together) at a time
+CHUNK_SIZE = 1000
+
+DESC_DIST = ("Luminosity distance derived from the redshift, using a flat LCDM cosmology with "
+             "H0 = {}, Omega_M = {}, Omega_L = {}.").format(
+                 COSMOLOGY.H0, COSMOLOGY.OMEGA_M, COSMOLOGY.OMEGA_L)
+DESC_EDD = ("Eddington ratio log(L_bol / L_Edd), derived from the bolometric luminosity and the "
+            "preferred BH mass, with L_Edd = {:.4e} erg/s (M/Msol).").format(EDDINGTON_LUM_PER_MSOL)
+DESC_RINF = ("Radius of the BH sphere of influence, r = G M / sigma^2, derived from the "
+             "preferred BH mass and the host galaxy velocity dispersion.")
+
+
+def do_derived(catalog):
+    """Add derived quantities to all entries.
+    """
+    log = catalog.log
+    log.debug("derived.do_derived()")
+
+    cache_dir = os.path.join(catalog.PATHS.PATH_OUTPUT, 'cache')
+    cosmo = CosmoDistances(cache_dir=cache_dir, log=log)
+
+    counts = np.zeros(3, dtype=int)
+    for chunk in iter_entry_chunks(catalog, CHUNK_SIZE):
+        counts += _add_derived(catalog, chunk, cosmo)
+
+    log.info("Derived distances: {}, Eddington ratios: {}, spheres of influence: {}".format(
+        *counts))
+    return
+
+
+def _add_derived(catalog, names, cosmo):
+    """Calculate and add derived quantities for the given (loaded) entries.
+
+    Returns the number of each (distance, Eddington ratio, sphere of influence) added.
+    """
+    num = len(names)
+    redz = [None] * num
+    mass = [None] * num
+    lbol = [None] * num
+    sigma = [None] * num
+    # Source aliases for each of the above values
+    srcs = [dict() for ii in range(num)]
+
+    # Collect input values
+    # --------------------
+    for ii, name in enumerate(names):
+        entry = catalog.entries[name]
+        for key in [BLACKHOLE.DISTANCE, BLACKHOLE.EDDINGTON_RATIO, BLACKHOLE.RAD_INFLUENCE]:
+            _remove_derived(entry, key)
+
+        # Only derive distances for entries without a measured distance
+        if BLACKHOLE.DISTANCE not in entry:
+            redz[ii], qq = first_float(entry.get(BLACKHOLE.REDSHIFT, []), QUANTITY.VALUE)
+            if qq is not None:
+                srcs[ii]['z'] = qq[QUANTITY.SOURCE]
+
+        mass[ii], qq = first_float(entry.get(BLACKHOLE.MASS_BEST, []), QUANTITY.VALUE)
+        if qq is not None:
+            srcs[ii]['mass'] = qq[QUANTITY.SOURCE]
+
+        bol = [pp for pp in entry.get(BLACKHOLE.PHOTOMETRY, [])
+               if pp.get(PHOTOMETRY.BAND) == 'bolometric']
+        lbol[ii], pp = first_float(bol, PHOTOMETRY.LUMINOSITY)
+        if pp is not None:
+            srcs[ii]['lbol'] = pp[PHOTOMETRY.SOURCE]
+
+        for key in [BLACKHOLE.GALAXY_VEL_DISP, BLACKHOLE.GALAXY_VEL_DISP_BULGE]:
+            sigma[ii], qq = first_float(entry.get(key, []), QUANTITY.VALUE)
+            if qq is not None:
+                srcs[ii]['sigma'] = qq[QUANTITY.SOURCE]
+                break
+
+    # Missing values (None) become NaN
+    redz, mass, lbol, sigma = [np.array(vv, dtype=float) for vv in [redz, mass, lbol, sigma]]
+
+    # Calculate derived values
+    # ------------------------
+    with np.errstate(invalid='ignore', divide='ignore'):
+        sel_dist = np.isfinite(redz) & (redz > 0.0) & (redz <= COSMOLOGY.Z_MAX)
+        dist = np.full(num, np.nan)
+        dist[sel_dist] = cosmo.dist_lum(redz[sel_dist])
+
+        # Masses and luminosities are in log10
+        edd = lbol - (mass + np.log10(EDDINGTON_LUM_PER_MSOL))
+        rinf = NWTG_PC_MSOL_KMS * np.power(10.0, mass) / sigma**2
+
+    # Store derived values
+    # --------------------
+    counts = np.zeros(3, dtype=int)
+    for ii, name in enumerate(names):
+        entry = catalog.entries[name]
+        if np.isfinite(dist[ii]):
+            _add_quantity(entry, BLACKHOLE.DISTANCE, "{:.4f}".format(dist[ii]), 'Mpc',
+                          DESC_DIST, srcs[ii], ['z'], kind='luminosity')
+            counts[0] += 1
+        if np.isfinite(edd[ii]):
+            _add_quantity(entry, BLACKHOLE.EDDINGTON_RATIO, "{:.4f}".format(edd[ii]),
+                          'log(L/L_Edd)', DESC_EDD, srcs[ii], ['lbol', 'mass'])
+            counts[1] += 1
+        if np.isfinite(rinf[ii]) and (rinf[ii] > 0.0):
+            _add_quantity(entry, BLACKHOLE.RAD_INFLUENCE, "{:.4e}".format(rinf[ii]), 'pc',
+                          DESC_RINF, srcs[ii], ['mass', 'sigma'])
+            counts[2] += 1
+
+    return counts
+
+
+def _add_quantity(entry, key, value, unit, desc, srcs, use, kind=None):
+    """Add a derived quantity, with the (unique) sources of all of the values in `use`.
+    """
+    aliases = []
+    for uu in use:
+        for ss in str(srcs[uu]).split(','):
+            ss = ss.strip()
+            if len(ss) and ss not in aliases:
+                aliases.append(ss)
+
+    quant_kwargs = {QUANTITY.U_VALUE: unit, QUANTITY.DESCRIPTION: desc, QUANTITY.DERIVED: True}
+    if kind is not None:
+        quant_kwargs[QUANTITY.KIND] = kind
+    entry.add_quantity(key, value, ",".join(aliases), **quant_kwargs)
+    return
+
+
+def _remove_derived(entry, key):
+    """Remove previously derived values of `key` (they are recomputed here).
+    """
+    if key not in entry:
+        return
+    keep = [qq for qq in entry[key] if not qq.get(QUANTITY.DERIVED, False)]
+    if len(keep):
+        entry[key] = keep
+    else:
+        del entry[key]
+    return
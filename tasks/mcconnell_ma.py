@@ -9,13 +9,13 @@ Data exists in a single online table.  That data is cached locally in
 """
 import re
 import bs4
-import tqdm
 import sys
 
 from astrocats.catalog import utils
-from astrocats.catalog.struct import SOURCE, QUANTITY, PHOTOMETRY
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
 
 from astrocats.blackholes.blackhole import BLACKHOLE, GALAXY_MORPHS, BH_MASS_METHODS
+from astrocats.blackholes.utils import RowSampler, task_progress
 
 SOURCE_BIBCODE = "2013ApJ...764..184M"
 SOURCE_NAME = "McConnell & Ma 2013"
@@ -74,9 +74,15 @@ def do_mcconnell_ma(catalog):
     return
 
 
+def prefetch(catalog):
+    """Download the data table into the cache (see `BlackholeCatalog.prefetch`).
+    """
+    catalog.load_url(DATA_URL, SOURCE_BIBCODE + '.txt', fail=True)
+    return 1, 0
+
+
 def parse_old_webpage(catalog, data):
     log = catalog.log
-    task_str = catalog.get_current_task_str()
     task_name = catalog.current_task.name
 
     soup = bs4.BeautifulSoup(data, 'html5lib')
@@ -96,7 +102,9 @@ def parse_old_webpage(catalog, data):
     table_entries = 0
     added = 0
 
-    with tqdm.tqdm(desc=task_str, total=EXPECTED_ENTRIES, dynamic_ncols=True) as pbar:
+    sampler = RowSampler(catalog, total=EXPECTED_ENTRIES)
+
+    with task_progress(catalog, total=EXPECTED_ENTRIES) as progress:
 
         while num < num_div_lines:
             div = div_lines[num]
@@ -104,22 +112,25 @@ def parse_old_webpage(catalog, data):
             # Find each row of the table (starts with class='psdg-left')
             if ('class' in div.attrs) and ('psdg-left' in div['class']):
                 table_entries += 1
+                # Skip the whole row if it is not part of the sample
+                if not sampler.keep(div.text.strip()):
+                    num += interval
+                    progress.update()
+                    continue
+
                 bh_name = _add_entry_for_data_lines(catalog, div_lines[num:num+interval])
                 if bh_name is not None:
                     log.debug("{}: added '{}'".format(task_name, bh_name))
                     num += interval-1
-                    pbar.update(1)
+                    progress.update()
                     added += 1
 
-                    if catalog.args.travis and (added > catalog.TRAVIS_QUERY_LIMIT):
-                        log.warning("Exiting on travis limit")
-                        break
-
             num += 1
-            # pbar.update(1)
 
     log.info("Added {} ({} table) entries".format(added, table_entries))
-    if added != EXPECTED_ENTRIES:
+    if sampler.active:
+        log.warning(sampler.summary())
+    elif added != EXPECTED_ENTRIES:
         log.warning("Found {} entries, expected {}!".format(added, EXPECTED_ENTRIES))
     return
 
@@ -226,25 +237,8 @@ def _add_entry_for_data_lines(catalog, lines):
     use_sources = []
     if len(urls):
         for uu, nn in zip(urls, names):
-            src_kw = {SOURCE.URL: uu, SOURCE.NAME: nn}
-            # Try to get a bibcode from the URL
-            bib, arx = _parse_bibcode_arxiv(uu)
-            if bib is not None:
-                src_kw[SOURCE.BIBCODE] = bib
-            if arx is not None:
-                src_kw[SOURCE.ARXIVID] = arx
-            '''
-            try:
-                bibcode = uu.split('/abs/')[1]
-                spl = bibcode.split('.')
-                if (len(spl) == 2) and (len(spl[0]) == 4):
-                    src_kw[SOURCE.ARXIVID] = bibcode
-                else:
-                    src_kw[SOURCE.BIBCODE] = bibcode
-            except:
-                pass
-            '''
-            new_src = catalog.entries[name].add_source(**src_kw)
+            # Bibcode or arXiv ID are determined from the URL
+            new_src = catalog.references.add_source(catalog.entries[name], url=uu, name=nn)
             use_sources.append(new_src)
     if len(use_sources) == 0:
         use_sources.append(source)
@@ -273,7 +267,7 @@ def _add_entry_for_data_lines(catalog, lines):
         [BLACKHOLE.DISTANCE, 12, 'Mpc'],
     ]
     for key, num, unit in cell_data:
-        val, err, src_kw = _get_value_and_error(lines[num])
+        val, err, src_kw = _get_value_and_error(catalog, lines[num])
         if val is not None:
             # Convert to log(Msol)
             if key == BLACKHOLE.GALAXY_MASS_BULGE:
@@ -309,7 +303,7 @@ def _add_entry_for_data_lines(catalog, lines):
             catalog.entries[name].add_quantity(key, val, new_src, **quant_kwargs)
 
     # Galaxy morphology
-    val, err, src_kw = _get_value_and_error(lines[13])
+    val, err, src_kw = _get_value_and_error(catalog, lines[13])
     if src_kw is not None:
         catalog.log.error_raise("ERROR")
     if val is None:
@@ -323,7 +317,7 @@ def _add_entry_for_data_lines(catalog, lines):
     catalog.entries[name].add_quantity(BLACKHOLE.GALAXY_MORPHOLOGY, morph, source, **quant_kwargs)
 
     # [3] Bulge Luminosity v-band
-    val, err, src_kw = _get_value_and_error(lines[3], cast=float)
+    val, err, src_kw = _get_value_and_error(catalog, lines[3], cast=float)
     if src_kw is not None:
         catalog.log.error_raise("ERROR")
     if val is not None:
@@ -338,7 +332,7 @@ def _add_entry_for_data_lines(catalog, lines):
         catalog.entries[name].add_photometry(**photo_kwargs)
 
     # [4] Bulge Magnitude v-band
-    val, err, src_kw = _get_value_and_error(lines[4], cast=float)
+    val, err, src_kw = _get_value_and_error(catalog, lines[4], cast=float)
     if src_kw is not None:
         catalog.log.error_raise("ERROR")
     if val is not None:
@@ -353,7 +347,7 @@ def _add_entry_for_data_lines(catalog, lines):
         catalog.entries[name].add_photometry(**photo_kwargs)
 
     # [5] Bulge Luminosity 3.6 micron
-    val, err, src_kw = _get_value_and_error(lines[5], cast=float)
+    val, err, src_kw = _get_value_and_error(catalog, lines[5], cast=float)
     if src_kw is not None:
         catalog.log.error_raise("ERROR")
     if val is not None:
@@ -368,7 +362,7 @@ def _add_entry_for_data_lines(catalog, lines):
         catalog.entries[name].add_photometry(**photo_kwargs)
 
     # [6] Bulge Magnitude 3.6 micron
-    val, err, src_kw = _get_value_and_error(lines[6], cast=float)
+    val, err, src_kw = _get_value_and_error(catalog, lines[6], cast=float)
     if src_kw is not None:
         catalog.log.error_raise("ERROR")
     if val is not None:
@@ -385,7 +379,7 @@ def _add_entry_for_data_lines(catalog, lines):
     return name
 
 
-def _get_value_and_error(line_tag, cast=None):
+def _get_value_and_error(catalog, line_tag, cast=None):
     """From a line of the BH table, extract the value given and an error and/or reference if given.
 
     Returns
@@ -429,80 +423,11 @@ def _get_value_and_error(line_tag, cast=None):
 
         url = child.attrs['href']
         name = child.attrs['title'].split('Reference: ')[-1]
-        src_kw = {SOURCE.URL: url, SOURCE.NAME: name}
-        # Try to get a bibcode from the URL
-        bib, arx = _parse_bibcode_arxiv(url)
-        if bib is not None:
-            src_kw[SOURCE.BIBCODE] = bib
-        if arx is not None:
-            src_kw[SOURCE.ARXIVID] = arx
-        '''
-        try:
-            bibcode = url.split('/abs/')[1]
-            src_kw[SOURCE.BIBCODE] = bibcode
-        except:
-            pass
-        '''
+        # Bibcode or arXiv ID are determined from the URL
+        src_kw = catalog.references.source_kwargs(url=url, name=name)
     return val, err, src_kw
 
 
-def _add_quantity_from_line(catalog, name, key, src, line, unit=None, desc=None):
-    """Given an input `line`, try to parse a value and error and store to the appropriate entry.
-
-    Arguments
-    ---------
-    catalog
-    name : str
-        Name of the entry to which to add quantity
-    key : str
-        Name of the quantity itself that is being stored
-    src : str
-        The source alias that this data comes from
-    line : `bs4.element.NavigableString` object
-        From which data is parsed
-    unit : str
-        Unit of measurement for this quantity
-    desc : str
-        Description of this quantity
-
-    """
-    # If the line contains a URL for an additional source, extract that
-    # -----------------------------------------------------------------
-    refs = [rr['href'] for rr in line.contents if isinstance(rr, bs4.element.Tag)]
-    # If references are found, add them to this paper
-    use_sources = [src]
-    if len(refs):
-        for rr in refs:
-            print("{} - {}: found url '{}'.".format(name, key, rr))
-            new_src = catalog.entries[name].add_source(url=rr)
-            use_sources.append(new_src)
-    # Multiple sources should be comma-delimited string of integers e.g. '1, 3, 4'
-    use_sources = ",".join(str(src) for src in use_sources)
-
-    # Try to get a value and an error from the input line's text
-    # ----------------------------------------------------------
-    val, err = _get_value_and_error(line.text)
-    # If a value is given, add it
-    if val is not None:
-        kwargs = {}
-        # Include units of measure
-        if unit is not None:
-            kwargs[QUANTITY.U_VALUE] = unit
-        # Include an error (uncertainty) if one was found
-        if err is not None:
-            if desc is not None:
-                desc += " with one-sigma error."
-            kwargs[QUANTITY.ERROR] = err
-        # Include a description if one is given
-        if desc is not None:
-            kwargs[QUANTITY.DESCRIPTION] = desc
-
-        # Add quantity with source
-        catalog.entries[name].add_quantity(key, val, use_sources, **kwargs)
-
-    return
-
-
 def _parse_morphology(val):
     vals = [vv.strip(' ()') for vv in val.split()]
     # Entires may be things like "E/S0", record both
@@ -521,18 +446,3 @@ def _parse_method(val):
     method = ", ".join(method)
     return method
 
-
-def _parse_bibcode_arxiv(url):
-    bib = None
-    arx = None
-    try:
-        bibcode = url.split('/abs/')[1]
-        spl = bibcode.split('.')
-        if (len(spl) == 2) and (len(spl[0]) == 4):
-            arx = bibcode
-        else:
-            bib = utils.decode_url(bibcode)
-    except:
-        pass
-
-    return bib, arx
@@ -58,12 +58,11 @@ Notes:
 
 """
 import os
-import csv
-import tqdm
 
-from astrocats.catalog import utils
-from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
+from astrocats.catalog.struct import PHOTOMETRY
 from astrocats.blackholes.blackhole import BLACKHOLE, BH_MASS_METHODS
+from astrocats.blackholes.utils import Column, ColumnSpec, COLUMN_TARGET, RowSampler
+from astrocats.blackholes.utils import TaskCheckpoint, task_progress, iter_delimited_rows
 
 SOURCE_BIBCODE = "2008ApJ...680..169S"
 SOURCE_NAME = "Shen+2008"
@@ -74,6 +73,71 @@ EXPECTED_TOTAL = 77429
 # Note that the VizieR table has 3 additional columns at the end relative to Table 1 descriptions
 NUM_COLUMNS = 30
 JOURNAL_INTERNAL = 1000
+# Values of '9999' indicate that a quantity was not measurable (see note (4) above)
+MISSING_VALUE = '9999'
+
+
+def _build_column_spec():
+    """Construct the `ColumnSpec` describing all columns of each data line (besides the name).
+
+    See `_add_entry_for_data_line` for the list of columns.
+    """
+    # All photometry is recorded at the time of the spectroscopic observation, column [9]
+    photo = dict(target=COLUMN_TARGET.PHOTOMETRY, refs={PHOTOMETRY.TIME: 9})
+    photo_extra = {PHOTOMETRY.HOST: False, PHOTOMETRY.U_TIME: 'MJD'}
+
+    columns = [
+        # [1/2] RA/DEC
+        Column(1, BLACKHOLE.RA),
+        Column(2, BLACKHOLE.DEC),
+        # [3] Redshift
+        Column(3, BLACKHOLE.REDSHIFT),
+        # [5] i-band Absolute magnitude (z=2)
+        Column(5, PHOTOMETRY.MAGNITUDE, unit='Absolute Magnitude',
+               desc='PSF i-band absolute magnitude, K-corrected to z=2',
+               extra=dict(photo_extra, **{PHOTOMETRY.BAND: 'i', PHOTOMETRY.INCLUDES_HOST: True,
+                                          PHOTOMETRY.KCORRECTED: True}),
+               **photo),
+        # [6] Luminosity Bolometric
+        Column(6, PHOTOMETRY.LUMINOSITY, unit='log (L/[erg/s])',
+               desc='Using bolometric corrections in Richards+2006b',
+               extra=dict(photo_extra, **{PHOTOMETRY.BAND: 'bolometric',
+                                          PHOTOMETRY.INCLUDES_HOST: True}),
+               **photo),
+    ]
+
+    # [14-22] FWHM, Mass, and Monochromatic Luminosities by line
+    line_names = ["H-Beta", "Mg-II", "C-IV"]
+    line_waves = ["5100", "3000", "1350"]
+    line_vars = ["HBETA", "MGII", "CIV"]
+    for ii, (nn, ww, vv) in enumerate(zip(line_names, line_waves, line_vars)):
+        line_name = "{} ({} A)".format(nn, ww)
+
+        # FWHM for this line
+        desc = "Full-width at Half-Maximum of {}".format(line_name)
+        columns.append(Column(14 + ii*3, getattr(BLACKHOLE, "FWHM_" + vv), unit='km/s', desc=desc))
+
+        # Luminosity from this line
+        desc = 'Monochromatic luminosity for {} (lambda*L_lambda)'.format(line_name)
+        extra = dict(photo_extra, **{PHOTOMETRY.WAVELENGTH: ww, PHOTOMETRY.U_WAVELENGTH: 'Angstrom'})
+        columns.append(Column(15 + ii*3, PHOTOMETRY.LUMINOSITY, unit='log (L/[erg/s])', desc=desc,
+                              extra=extra, **photo))
+
+        # Mass from this Line
+        desc = "Virial mass estimated using {}".format(line_name)
+        columns.append(Column(16 + ii*3, BLACKHOLE.MASS, unit='log(M/Msol)', desc=desc,
+                              kind=getattr(BH_MASS_METHODS, "VIR_" + vv)))
+
+    # [23] Mass from optimal line (based on redshift)
+    desc = ("Virial BH-Mass Using H-Beta for z < 0.7; "
+            "Mg-ii for 0.7 < z < 1.9; and C-iv for z > 1.9")
+    columns.append(Column(23, BLACKHOLE.MASS, unit='log(M/Msol)', desc=desc,
+                          kind=BH_MASS_METHODS.VIR))
+
+    return ColumnSpec(columns, num_columns=NUM_COLUMNS, missing=MISSING_VALUE)
+
+
+COLUMN_SPEC = _build_column_spec()
 
 
 '''
@@ -127,56 +191,99 @@ def do_shen_2008(catalog):
     """
     log = catalog.log
     log.debug("shen_2008.do_shen_2008()")
-    task_str = catalog.get_current_task_str()
     task_name = catalog.current_task.name
     task_dir = catalog.get_current_task_repo()
 
-    # Go through each element of the tables
-    num = 0
-    line_num = 0
-    count = 0
-
     data_fname = os.path.join(task_dir, DATA_FILENAME)
     log.info("Input filename '{}'".format(data_fname))
     if not os.path.exists(data_fname):
         log.raise_error("File not found '{}'".format(data_fname), IOError)
 
-    with tqdm.tqdm(desc=task_str, total=EXPECTED_TOTAL, dynamic_ncols=True) as pbar:
-
-        with open(data_fname, 'r') as data:
-            spamreader = csv.reader(data, delimiter='|')
-            for row in spamreader:
-                line_num += 1
-                if len(row) == 0 or row[0].startswith('#'):
-                    continue
-                else:
-                    count += 1
-                    if count < 4:
-                        continue
-
-                bh_name = _add_entry_for_data_line(catalog, row)
-                if bh_name is not None:
-                    log.debug("{}: added '{}'".format(task_name, bh_name))
-                    num += 1
-
-                    if (JOURNAL_INTERNAL is not None) and (num % JOURNAL_INTERNAL == 0):
-                        catalog.journal_entries()
-
-                    if catalog.args.travis and (num > catalog.TRAVIS_QUERY_LIMIT):
-                        log.warning("Exiting on travis limit")
-                        break
+    sampler = RowSampler(catalog, total=EXPECTED_TOTAL)
+    checkpoint = TaskCheckpoint(catalog, data_fname)
+    if checkpoint.complete:
+        log.warning("Task already completed according to checkpoint, skipping.")
+        checkpoint.finish()
+        return
 
-                pbar.update(1)
+    # Go through each element of the tables
+    num = 0
+    line_num = 0
+    count = 0
+    offset = 0
+    if checkpoint.resumed:
+        offset = checkpoint.offset
+        line_num = checkpoint.row
+        num = checkpoint.state['num']
+        count = checkpoint.state['count']
+        sampler.set_state(checkpoint.state['sampler'])
+
+    # Rows are split and stripped in worker processes, and returned in order with the file
+    # offset of the end of each line (for checkpoints)
+    rows = iter_delimited_rows(data_fname, delimiter='|', start=offset, func=_prepare_row,
+                               processes=getattr(catalog.args, 'parse_processes', None))
+    # Keep each row in its entry, until the entry is journaled (`--lazy-rows`)
+    lazy = getattr(catalog.args, 'lazy_rows', False)
+    line_base = line_num
+    progress = task_progress(catalog, total=EXPECTED_TOTAL, initial=max(count - 3, 0))
+    with progress:
+        for offset, rel_line, row in rows:
+            line_num = line_base + rel_line
+            count += 1
+            if count < 4:
+                continue
+
+            progress.update()
+            if not sampler.keep(row[0], stratum=_sample_stratum(row)):
+                continue
+
+            bh_name = _add_entry_for_data_line(catalog, row, lazy=lazy)
+            if bh_name is not None:
+                log.debug("{}: added '{}'".format(task_name, bh_name))
+                num += 1
+
+                if (JOURNAL_INTERNAL is not None) and (num % JOURNAL_INTERNAL == 0):
+                    checkpoint.update(offset=offset, row=line_num, num=num, count=count,
+                                      sampler=sampler.get_state())
+                    catalog.journal_entries()
+
+    checkpoint.update(offset=offset, row=line_num, num=num, count=count,
+                      sampler=sampler.get_state())
+    checkpoint.finish()
 
     log.info("Added {} entries".format(num))
-    if (num != EXPECTED_TOTAL) and (not catalog.args.travis):
+    if sampler.active:
+        log.warning(sampler.summary())
+    elif (num != EXPECTED_TOTAL):
         log.warning("Number of entries added {} does not match expectation {}!".format(
             num, EXPECTED_TOTAL))
 
     return
 
 
-def _add_entry_for_data_line(catalog, line):
+def _prepare_row(row):
+    """Strip all values of a data row (run in the `iter_delimited_rows` worker processes).
+    """
+    return COLUMN_SPEC.prepare_row(row)
+
+
+def _sample_stratum(row):
+    """Group rows by the line used for the virial mass, based on redshift (see note [*2] above).
+    """
+    try:
+        redz = float(row[3])
+    except (ValueError, IndexError):
+        return None
+
+    if redz < 0.7:
+        return "HBETA"
+    elif redz < 1.9:
+        return "MGII"
+
+    return "CIV"
+
+
+def _add_entry_for_data_line(catalog, line, lazy=False):
     """
 
     Sample Entries:
@@ -219,16 +326,17 @@ def _add_entry_for_data_line(catalog, line):
     [ ] 25  S  N	 (F8.3)  Mean spectrum signal-to-noise ratio
     [ ] 26  Sloan    (a5)    SDSS details from most recent SDSS data release
 
+    Values of `line` have already been stripped (see `_prepare_row`).  With `lazy`, the row is
+    kept in the entry, and its values are only added once the entry is journaled.
+
     """
     log = catalog.log
     # log.debug("shen_2008._add_entry_for_data_line()")
-    if len(line) != NUM_COLUMNS:
+    if not COLUMN_SPEC.check_row(line):
         log.warning("length of line: '{}', expected {}!  '{}'".format(
             len(line), NUM_COLUMNS, line))
         return None
 
-    line = [ll.strip() for ll in line]
-
     # [0] SDSS Galaxy/BH Name
     # -----------------------
     data_name = "SDSS" + line[0]
@@ -239,122 +347,7 @@ def _add_entry_for_data_line(catalog, line):
     if source is None:
         log.raise_error("Failed to add source!")
 
-    task_name = catalog.current_task.name
-    # catalog.entries[name].add_listed(BLACKHOLE.TASKS, task_name)
-
-    # [1/2] RA/DEC
-    catalog.entries[name].add_quantity(BLACKHOLE.RA, line[1], source)
-    catalog.entries[name].add_quantity(BLACKHOLE.DEC, line[2], source)
-
-    # [3] Redshift
-    catalog.entries[name].add_quantity(BLACKHOLE.REDSHIFT, line[3], source)
-
-    # [4] i-band apparent magnitude
-    # photo_kwargs = {
-    #     PHOTOMETRY.MAGNITUDE: line[4],
-    #     PHOTOMETRY.SOURCE: source,
-    #     PHOTOMETRY.HOST: False,
-    #     PHOTOMETRY.U_LUMINOSITY: 'apparent Magnitude',
-    #     PHOTOMETRY.DESCRIPTION: 'PSF i-band apparent magnitude',
-    #     PHOTOMETRY.BAND: 'i',
-    #     PHOTOMETRY.INCLUDES_HOST: True,
-    # }
-    # catalog.entries[name].add_photometry(**photo_kwargs)
-
-    # [9] Observation date
-    # convert from MJD to string YYYY/MM/DD
-    # obs_date = ap.time.Time(int(line[9]), format='mjd').datetime.strftime('%Y/%m/%d')
-    # obs_date = float(line[9])
-    obs_date = line[9]
-
-    # [5] i-band Absolute magnitude (z=2)
-    if len(line[5]):
-        photo_kwargs = {
-            PHOTOMETRY.MAGNITUDE: line[5],
-            PHOTOMETRY.SOURCE: source,
-            PHOTOMETRY.HOST: False,
-            PHOTOMETRY.U_LUMINOSITY: 'Absolute Magnitude',
-            PHOTOMETRY.DESCRIPTION: 'PSF i-band absolute magnitude, K-corrected to z=2',
-            PHOTOMETRY.BAND: 'i',
-            PHOTOMETRY.INCLUDES_HOST: True,
-            PHOTOMETRY.KCORRECTED: True,
-            PHOTOMETRY.TIME: obs_date,
-            PHOTOMETRY.U_TIME: 'MJD',
-        }
-        catalog.entries[name].add_photometry(**photo_kwargs)
-        # err = "Adding photometry failed for '{}'\n:{}".format(name, photo_kwargs)
-        # log.raise_error(err)
-
-    # [6] Luminosity Bolometric
-    if len(line[6]):
-        photo_kwargs = {
-            PHOTOMETRY.LUMINOSITY: line[6],
-            PHOTOMETRY.SOURCE: source,
-            PHOTOMETRY.HOST: False,
-            PHOTOMETRY.U_LUMINOSITY: 'log (L/[erg/s])',
-            PHOTOMETRY.DESCRIPTION: 'Using bolometric corrections in Richards+2006b',
-            PHOTOMETRY.BAND: 'bolometric',
-            PHOTOMETRY.INCLUDES_HOST: True,
-            PHOTOMETRY.TIME: obs_date,
-            PHOTOMETRY.U_TIME: 'MJD',
-        }
-        catalog.entries[name].add_photometry(**photo_kwargs)
-        # err = "Adding photometry failed for '{}'\n:{}".format(name, photo_kwargs)
-        # log.raise_error(err)
-
-    # [14-22] FWHM, Mass, and Monochromatic Luminosities by line
-    line_names = ["H-Beta", "Mg-II", "C-IV"]
-    line_waves = ["5100", "3000", "1350"]
-    line_vars = ["HBETA", "MGII", "CIV"]
-    for ii, (nn, ww, vv) in enumerate(zip(line_names, line_waves, line_vars)):
-        line_name = "{} ({} A)".format(nn, ww)
-
-        # FWHM for this line
-        col = 14 + ii*3
-        if len(line[col]):
-            var = getattr(BLACKHOLE, "FWHM_" + vv)
-            desc = "Full-width at Half-Maximum of {}".format(line_name)
-            quant_kwargs = {QUANTITY.U_VALUE: 'km/s', QUANTITY.DESCRIPTION: desc}
-            catalog.entries[name].add_quantity(var, line[col], source, **quant_kwargs)
-
-        # Luminosity from this line
-        col = 15 + ii*3
-        if len(line[col]):
-            desc = 'Monochromatic luminosity for {} (lambda*L_lambda)'.format(line_name)
-            photo_kwargs = {
-                PHOTOMETRY.LUMINOSITY: line[col],
-                PHOTOMETRY.SOURCE: source,
-                PHOTOMETRY.HOST: False,
-                PHOTOMETRY.U_LUMINOSITY: 'log (L/[erg/s])',
-                PHOTOMETRY.DESCRIPTION: desc,
-                PHOTOMETRY.WAVELENGTH: ww,
-                PHOTOMETRY.U_WAVELENGTH: 'Angstrom',
-                PHOTOMETRY.TIME: obs_date,
-                PHOTOMETRY.U_TIME: 'MJD',
-            }
-            catalog.entries[name].add_photometry(**photo_kwargs)
-            # err = "Adding photometry failed for '{}' ({}) \n:{}".format(name, nn, photo_kwargs)
-            # log.raise_error(err)
-
-        # Mass from this Line
-        col = 16 + ii*3
-        if len(line[col]):
-            var = BLACKHOLE.MASS
-            mass_method = getattr(BH_MASS_METHODS, "VIR_" + vv)
-            desc = "Virial mass estimated using {}".format(line_name)
-            quant_kwargs = {QUANTITY.U_VALUE: 'log(M/Msol)',
-                            QUANTITY.DESCRIPTION: desc,
-                            QUANTITY.KIND: mass_method}
-            catalog.entries[name].add_quantity(var, line[col], source, **quant_kwargs)
-
-    # [23] Mass from optimal line (based on redshift)
-    val = line[23]
-    if len(val):
-        desc = ("Virial BH-Mass Using H-Beta for z < 0.7; "
-                "Mg-ii for 0.7 < z < 1.9; and C-iv for z > 1.9")
-        quant_kwargs = {QUANTITY.U_VALUE: 'log(M/Msol)',
-                        QUANTITY.DESCRIPTION: desc,
-                        QUANTITY.KIND: BH_MASS_METHODS.VIR}
-        catalog.entries[name].add_quantity(BLACKHOLE.MASS, val, source, **quant_kwargs)
+    # [1-23] All other quantities and photometry (see `_build_column_spec`)
+    COLUMN_SPEC.add_row(catalog.entries[name], line, source, prepared=True, lazy=lazy)
 
     return name
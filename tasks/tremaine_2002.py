@@ -6,13 +6,14 @@ Table 1, manually copied to file 'blackholes/input/internal/tremaine+2002.txt'.
 """
 import os
 import csv
-import tqdm
 
 from astrocats.catalog import utils
 # from astrocats.catalog.quantity import QUANTITY
 # from astrocats.catalog.photometry import PHOTOMETRY
 from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
 from astrocats.blackholes.blackhole import BLACKHOLE, GALAXY_MORPHS, BH_MASS_METHODS
+from astrocats.blackholes.utils import Column, ColumnSpec, COLUMN_TARGET, RowSampler
+from astrocats.blackholes.utils import task_progress
 
 SOURCE_BIBCODE = "2002ApJ...574..740T"
 SOURCE_NAME = "Tremaine+2002"
@@ -20,6 +21,7 @@ SOURCE_URL = "http://adsabs.harvard.edu/abs/2002ApJ...574..740T"
 MORPH_DESC = ("Galaxy morphologies are one of:"
               "{'SBbc', 'E5', 'E4', 'Sbc', 'E3', 'Sb', 'E1', 'S0', 'E2', 'E0', 'SB0'}.")
 DATA_FILENAME = "tremaine+2002.txt"
+EXPECTED_TOTAL = 31
 
 METHOD_DICT = {
     "s": BH_MASS_METHODS.DYN_STARS,
@@ -39,82 +41,32 @@ FULL_METHOD_DICT = {
     '3I': "(3I) axisymmetric dynamical models, including three integrals of motion",
 }
 
-REFS_NAMES = {
-    '1': "Chakrabarty & Saha 2001",
-    '2': "Verolme et al. 2002",
-    '3': "Tremaine 1995",
-    '4': "Kormendy & Bender 1999",
-    '5': "Bacon et al. 2001",
-    '6': "Gebhardt et al. 2002",
-    '7': "Pinkney et al. 2003",
-    '8': "Bower et al. 2001",
-    '9': "Greenhill & Gwinn 1997",
-    '10': "Sarzi et al. 2001",
-    '11': "Kormendy et al. 1996a",
-    '12': "Barth et al. 2001b",
-    '13': "Kormendy et al. 1998",
-    '14': "Gebhardt et al. 2000b",
-    '15': "Herrnstein et al. 1999",
-    '16': "Ferrarese, Ford, & Jaffe 1996",
-    '17': "Cretton & van den Bosch 1999",
-    '18': "Harms et al. 1994",
-    '19': "Macchetto et al. 1997",
-    '20': "M. E. Kaiser et al. 2002, in preparation",
-    '21': "Ferrarese & Ford 1999",
-    '22': "van der Marel & van den Bosch 1998",
-    '23': "Cappellari et al. 2002"
-}
-
-REFS_BIBS = {
-    '1': "2001AJ....122..232C",
-    '2': "2002MNRAS.335..517V",
-    '3': "1995AJ....110..628T",
-    '4': "1999ApJ...522..772K",
-    '5': "2001A%26A...371..409B",
-    '6': "2003ApJ...583...92G",
-    '7': "2003ApJ...596..903P",
-    '8': "2001ApJ...550...75B",
-    '9': "1997Ap%26SS.248..261G",
-    '10': "2001ApJ...550...65S",
-    '11': "1996ApJ...459L..57K",
-    '12': "2001ApJ...555..685B",
-    '13': "1998AJ....115.1823K",
-    '14': "2000AJ....119.1157G",
-    '15': "1999Natur.400..539H",
-    '16': "1996ApJ...470..444F",
-    '17': "1999ApJ...514..704C",
-    '18': "1994ApJ...435L..35H",
-    '19': "1997ApJ...489..579M",
-    '20': None,
-    '21': "1999ApJ...515..583F",
-    '22': "1998AJ....116.2220V",
-    '23': "2002ApJ...578..7872"
-}
-
-REFS_URLS = {
-    '1': "http://adsabs.harvard.edu/abs/2001AJ....122..232C",
-    '2': "http://adsabs.harvard.edu/abs/2002MNRAS.335..517V",
-    '3': "http://adsabs.harvard.edu/abs/1995AJ....110..628T",
-    '4': "http://adsabs.harvard.edu/abs/1999ApJ...522..772K",
-    '5': "http://adsabs.harvard.edu/abs/2001A%26A...371..409B",
-    '6': "http://adsabs.harvard.edu/abs/2003ApJ...583...92G",
-    '7': "http://adsabs.harvard.edu/abs/2003ApJ...596..903P",
-    '8': "http://adsabs.harvard.edu/abs/2001ApJ...550...75B",
-    '9': "http://adsabs.harvard.edu/abs/1997Ap%26SS.248..261G",
-    '10': "http://adsabs.harvard.edu/abs/2001ApJ...550...65S",
-    '11': "http://adsabs.harvard.edu/abs/1996ApJ...459L..57K",
-    '12': "http://adsabs.harvard.edu/abs/2001ApJ...555..685B",
-    '13': "http://adsabs.harvard.edu/abs/1998AJ....115.1823K",
-    '14': "http://adsabs.harvard.edu/abs/2000AJ....119.1157G",
-    '15': "http://adsabs.harvard.edu/abs/1999Natur.400..539H",
-    '16': "http://adsabs.harvard.edu/abs/1996ApJ...470..444F",
-    '17': "http://adsabs.harvard.edu/abs/1999ApJ...514..704C",
-    '18': "http://adsabs.harvard.edu/abs/1994ApJ...435L..35H",
-    '19': "http://adsabs.harvard.edu/abs/1997ApJ...489..579M",
-    '20': None,
-    '21': "http://adsabs.harvard.edu/abs/1999ApJ...515..583F",
-    '22': "http://adsabs.harvard.edu/abs/1998AJ....116.2220V",
-    '23': "http://adsabs.harvard.edu/abs/2002ApJ...578..787C"
+# Name and URL of each mass determination reference (bibcodes are taken from the URLs)
+REFS = {
+    '1': ("Chakrabarty & Saha 2001", "http://adsabs.harvard.edu/abs/2001AJ....122..232C"),
+    '2': ("Verolme et al. 2002", "http://adsabs.harvard.edu/abs/2002MNRAS.335..517V"),
+    '3': ("Tremaine 1995", "http://adsabs.harvard.edu/abs/1995AJ....110..628T"),
+    '4': ("Kormendy & Bender 1999", "http://adsabs.harvard.edu/abs/1999ApJ...522..772K"),
+    '5': ("Bacon et al. 2001", "http://adsabs.harvard.edu/abs/2001A%26A...371..409B"),
+    '6': ("Gebhardt et al. 2002", "http://adsabs.harvard.edu/abs/2003ApJ...583...92G"),
+    '7': ("Pinkney et al. 2003", "http://adsabs.harvard.edu/abs/2003ApJ...596..903P"),
+    '8': ("Bower et al. 2001", "http://adsabs.harvard.edu/abs/2001ApJ...550...75B"),
+    '9': ("Greenhill & Gwinn 1997", "http://adsabs.harvard.edu/abs/1997Ap%26SS.248..261G"),
+    '10': ("Sarzi et al. 2001", "http://adsabs.harvard.edu/abs/2001ApJ...550...65S"),
+    '11': ("Kormendy et al. 1996a", "http://adsabs.harvard.edu/abs/1996ApJ...459L..57K"),
+    '12': ("Barth et al. 2001b", "http://adsabs.harvard.edu/abs/2001ApJ...555..685B"),
+    '13': ("Kormendy et al. 1998", "http://adsabs.harvard.edu/abs/1998AJ....115.1823K"),
+    '14': ("Gebhardt et al. 2000b", "http://adsabs.harvard.edu/abs/2000AJ....119.1157G"),
+    '15': ("Herrnstein et al. 1999", "http://adsabs.harvard.edu/abs/1999Natur.400..539H"),
+    '16': ("Ferrarese, Ford, & Jaffe 1996", "http://adsabs.harvard.edu/abs/1996ApJ...470..444F"),
+    '17': ("Cretton & van den Bosch 1999", "http://adsabs.harvard.edu/abs/1999ApJ...514..704C"),
+    '18': ("Harms et al. 1994", "http://adsabs.harvard.edu/abs/1994ApJ...435L..35H"),
+    '19': ("Macchetto et al. 1997", "http://adsabs.harvard.edu/abs/1997ApJ...489..579M"),
+    '20': ("M. E. Kaiser et al. 2002, in preparation", None),
+    '21': ("Ferrarese & Ford 1999", "http://adsabs.harvard.edu/abs/1999ApJ...515..583F"),
+    '22': ("van der Marel & van den Bosch 1998",
+           "http://adsabs.harvard.edu/abs/1998AJ....116.2220V"),
+    '23': ("Cappellari et al. 2002", "http://adsabs.harvard.edu/abs/2002ApJ...578..787C")
 }
 
 
@@ -124,13 +76,25 @@ TONRY_ETAL_2001 = {
     "url": "http://adsabs.harvard.edu/abs/2001ApJ...546..681T",
 }
 
+COLUMN_SPEC = ColumnSpec([
+    # [2] B-Band Magnitude
+    Column(2, PHOTOMETRY.MAGNITUDE, target=COLUMN_TARGET.PHOTOMETRY, unit='Magnitude',
+           desc='B-Band Magnitude ("Galaxy hot component")',
+           extra={PHOTOMETRY.HOST: True, PHOTOMETRY.BAND: 'B'}),
+    # [5] Velocity Dispersion
+    Column(5, BLACKHOLE.GALAXY_VEL_DISP, unit='km/s',
+           desc="RMS dispersion within a slit aperture of length 2 r_e"),
+    # [6] Distance
+    #    This is the source used for distances (when possible)
+    Column(6, BLACKHOLE.DISTANCE, unit='Mpc', source=TONRY_ETAL_2001),
+], num_columns=9)
+
 
 def do_tremaine_2002(catalog):
     """
     """
     log = catalog.log
     log.debug("tremaine_2002.do_tremaine_2002()")
-    task_str = catalog.get_current_task_str()
     task_name = catalog.current_task.name
     task_dir = catalog.get_current_task_repo()
 
@@ -142,7 +106,9 @@ def do_tremaine_2002(catalog):
     if not os.path.exists(data_fname):
         utils.log_raise(log, "File not found '{}'".format(data_fname), IOError)
 
-    with tqdm.tqdm(desc=task_str, total=31, dynamic_ncols=True) as pbar:
+    sampler = RowSampler(catalog, total=EXPECTED_TOTAL)
+
+    with task_progress(catalog, total=EXPECTED_TOTAL) as progress:
 
         with open(data_fname, 'r') as data:
             spamreader = csv.reader(data, delimiter=' ')
@@ -150,18 +116,18 @@ def do_tremaine_2002(catalog):
                 if len(row) <= 1 or row[0].startswith('#'):
                     continue
 
+                progress.update()
+                if not sampler.keep(row[0]):
+                    continue
+
                 bh_name = _add_entry_for_data_line(catalog, row)
                 if bh_name is not None:
                     log.debug("{}: added '{}'".format(task_name, bh_name))
                     num += 1
 
-                    if catalog.args.travis and (num > catalog.TRAVIS_QUERY_LIMIT):
-                        log.warning("Exiting on travis limit")
-                        break
-
-                pbar.update(1)
-
     log.info("Added {} entries".format(num))
+    if sampler.active:
+        log.warning(sampler.summary())
     return
 
 
@@ -187,7 +153,7 @@ def _add_entry_for_data_line(catalog, line):
     """
     log = catalog.log
     log.debug("tremaine_2002._add_entry_for_data_line()")
-    if len(line) != 9:
+    if not COLUMN_SPEC.check_row(line):
         log.warning("length of line: '{}', expected 9!  '{}'".format(len(line), line))
         return None
 
@@ -221,31 +187,19 @@ def _add_entry_for_data_line(catalog, line):
     morph = _parse_morphology(line[1].strip())
     catalog.entries[name].add_quantity(BLACKHOLE.GALAXY_MORPHOLOGY, morph, source)
 
-    # [2] B-Band Magnitude
-    # --------------------
-    magn_b = line[2].strip()
-    photo_kwargs = {
-        PHOTOMETRY.MAGNITUDE: magn_b, PHOTOMETRY.SOURCE: source, PHOTOMETRY.HOST: True,
-        PHOTOMETRY.U_LUMINOSITY: 'Magnitude',
-        PHOTOMETRY.DESCRIPTION: 'B-Band Magnitude ("Galaxy hot component")',
-        PHOTOMETRY.BAND: 'B'
-    }
-    catalog.entries[name].add_photometry(**photo_kwargs)
+    # [2] B-Band Magnitude, [5] Velocity Dispersion, [6] Distance
+    # -----------------------------------------------------------
+    COLUMN_SPEC.add_row(catalog.entries[name], line, source)
 
     # [8] Mass Determination References
     # ---------------------------------
     refs = _parse_refs(line[8])
     # If references are found, add them to this paper
     use_sources = [source]
-    for rr in refs:
-        ref_name, ref_bib, ref_url = rr
-        bib_kw = {'name': ref_name}
-        if ref_bib is not None:
-            bib_kw['bibcode'] = ref_bib
-            bib_kw['url'] = ref_url
-        new_src = catalog.entries[name].add_source(**bib_kw)
+    for ref_name, ref_url in refs:
+        new_src = catalog.references.add_source(catalog.entries[name], url=ref_url, name=ref_name)
         if new_src is None:
-            log.raise_error("Adding src from '{}' failed!".format(bib_kw))
+            log.raise_error("Adding src from '{}' ({}) failed!".format(ref_name, ref_url))
         use_sources.append(new_src)
     # Multiple sources should be comma-delimited string of integers e.g. '1, 3, 4'
     use_sources = ",".join(str(src) for src in use_sources)
@@ -262,23 +216,6 @@ def _add_entry_for_data_line(catalog, line):
                     QUANTITY.KIND: mass_method}
     catalog.entries[name].add_quantity(BLACKHOLE.MASS, bhm, use_sources, **quant_kwargs)
 
-    # [5] Velocity Dispersion
-    # -----------------------
-    sigma_1 = line[5].strip()
-    sigma_desc = "RMS dispersion within a slit aperture of length 2 r_e"
-    quant_kwargs = {QUANTITY.U_VALUE: 'km/s', QUANTITY.DESCRIPTION: sigma_desc}
-    catalog.entries[name].add_quantity(
-        BLACKHOLE.GALAXY_VEL_DISP, sigma_1, source, **quant_kwargs)
-
-    # [6] Distance
-    # ------------
-    dist = line[6].strip()
-    #    This is the source used for distances (when possible)
-    dist_src = catalog.entries[name].add_source(**TONRY_ETAL_2001)
-    quant_kwargs = {QUANTITY.U_VALUE: 'Mpc'}
-    catalog.entries[name].add_quantity(
-        BLACKHOLE.DISTANCE, dist, dist_src, **quant_kwargs)
-
     # [7] Mass-to-Light Ratio
     # -----------------------
     ratio_band = _parse_mass_to_light(line[6].strip())
@@ -338,18 +275,9 @@ def _get_mass_value_and_error(raw):
 
 
 def _parse_refs(val):
-
-    def _get_refs_from_dict(val):
-        name = REFS_NAMES[val]
-        bib = REFS_BIBS[val]
-        if bib is not None:
-            bib = utils.decode_url(bib)
-        url = REFS_URLS[val]
-        return name, bib, url
-
-    vals = [vv.strip() for vv in val.split(',')]
-    refs = [_get_refs_from_dict(vv) for vv in vals]
-    return refs
+    """Name and URL of each of the (comma-separated) references in `val`.
+    """
+    return [REFS[vv.strip()] for vv in val.split(',')]
 
 
 def _parse_mass_to_light(val):
@@ -0,0 +1,146 @@
+"""Shared fixtures: a local HTTP server standing in for remote data sources, and a catalog.
+"""
+import os
+import sys
+import types
+import time
+import logging
+import threading
+import collections
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import pytest
+
+
+class StandInServer:
+    """Local HTTP server whose responses are chosen by path prefix, counting requests per path.
+
+    Each route is a function of the (1-based) number of requests made so far to the exact path,
+    returning `(status, headers, body)`, e.g.
+
+    >>> server.route('/flaky', lambda num: (503, {}, '') if num <= 2 else (200, {}, 'ok'))
+
+    Paths without a route return '200 OK' with the path as the body.  Routes may also sleep to
+    simulate a slow host (see `slow`).
+    """
+
+    def __init__(self):
+        self.routes = []
+        self.hits = collections.Counter()
+        self._lock = threading.Lock()
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def log_message(self, *args):
+                return
+
+            def do_GET(self):
+                server._respond(self)
+                return
+
+            def do_POST(self):
+                server._respond(self)
+                return
+
+        self._httpd = ThreadingHTTPServer(('127.0.0.1', 0), Handler)
+        self._httpd.daemon_threads = True
+        self._thread = threading.Thread(target=self._httpd.serve_forever, daemon=True)
+        self._thread.start()
+        self.url = "http://127.0.0.1:{}".format(self._httpd.server_port)
+        return
+
+    def route(self, prefix, func):
+        self.routes.insert(0, (prefix, func))
+        return
+
+    @staticmethod
+    def slow(delay, status=200, body='slow'):
+        """Route which responds only after `delay` seconds.
+        """
+        def func(num):
+            time.sleep(delay)
+            return status, {}, body
+        return func
+
+    def count(self, prefix=''):
+        """Total number of requests to paths starting with `prefix`.
+        """
+        with self._lock:
+            return sum(vv for kk, vv in self.hits.items() if kk.startswith(prefix))
+
+    def close(self):
+        self._httpd.shutdown()
+        self._httpd.server_close()
+        return
+
+    def _respond(self, handler):
+        path = handler.path
+        with self._lock:
+            self.hits[path] += 1
+            num = self.hits[path]
+
+        status, headers, body = 200, {}, path
+        for prefix, func in self.routes:
+            if path.startswith(prefix):
+                status, headers, body = func(num)
+                break
+
+        body = body.encode('utf-8')
+        try:
+            handler.send_response(status)
+            for key, val in headers.items():
+                handler.send_header(key, val)
+            handler.send_header('Content-Length', str(len(body)))
+            handler.end_headers()
+            handler.wfile.write(body)
+        except (BrokenPipeError, ConnectionResetError):
+            # The client gave up, e.g. after a read timeout
+            pass
+        return
+
+
+@pytest.fixture
+def server():
+    srv = StandInServer()
+    yield srv
+    srv.close()
+
+
+@pytest.fixture(params=['aiohttp', 'threads'])
+def backend(request, monkeypatch):
+    """Run each test with `aiohttp` (if installed), and with requests in worker threads.
+    """
+    if request.param == 'aiohttp':
+        pytest.importorskip('aiohttp')
+    else:
+        monkeypatch.setitem(sys.modules, 'aiohttp', None)
+    return request.param
+
+
+@pytest.fixture
+def log():
+    return logging.getLogger("astrocats.blackholes.tests")
+
+
+@pytest.fixture
+def catalog(tmp_path, monkeypatch):
+    """`BlackholeCatalog` (with the default arguments) writing its output to a temporary directory.
+
+    Further arguments can be set on `catalog.args` by each test.
+    """
+    from astrocats.catalog.utils import logger
+    from astrocats.blackholes import blackholecatalog
+
+    class PATHS(blackholecatalog.BlackholeCatalog.PATHS):
+        __module__ = blackholecatalog.__name__
+
+        def __init__(self, catalog):
+            super().__init__(catalog)
+            self.PATH_OUTPUT = os.path.join(str(tmp_path), '')
+            for path in self.get_repo_output_folders():
+                os.makedirs(path, exist_ok=True)
+
+    monkeypatch.setattr(blackholecatalog.BlackholeCatalog, 'PATHS', PATHS)
+    args = types.SimpleNamespace(base_path='', private=False, travis=False, write_entries=True)
+    log = logger.get_logger(stream_level=logging.WARNING)
+    return blackholecatalog.BlackholeCatalog(args, log)
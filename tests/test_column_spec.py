@@ -0,0 +1,288 @@
+"""Tests of `utils.column_spec`: declarative loading of table columns into entries.
+
+The column specifications of the tasks are compared with the quantities added by the hand-written
+code which they replaced (copied below as `_shen_2008_baseline` and `_tremaine_2002_baseline`).
+"""
+import pytest
+
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
+from astrocats.blackholes.blackhole import BLACKHOLE, BH_MASS_METHODS
+from astrocats.blackholes.utils import Column, ColumnSpec, COLUMN_TARGET
+from astrocats.blackholes.tasks import shen_2008, tremaine_2002
+
+SHEN_ROWS = [
+    ("000132.83+145608.0|000.386795|+14.935573| 0.3989| 18.898| -23.131| 45.356|  751|  303| "
+     "52251|0|1|1|0|   4026|    2.450|  8.119|   4699|    2.671|  8.114|       |         |       |"
+     "8.119|       |  10.293|Sloan|DR5|Simbad|NED"),
+    ("000135.51-004206.7|000.397978|-00.701886| 3.5779| 19.183| -27.951| 47.015| 1489|  104| "
+     "52991|0|0|0|1|       |         |       |       |         |       |   6207|  271.312|  9.536|"
+     "9.536|       |   3.937|Sloan|DR5|Simbad|NED"),
+]
+
+TREMAINE_ROWS = [
+    "MilkyWay SBbc 17.65 1.8e6(1.5,2.2) s,p 103 0.008 1.0,K 1",
+    "N4258 SBbc 17.19 3.9e7(3.8,4.0) m 130 7.2 - 15",
+]
+
+
+class RecordingEntry:
+    """Stand-in for a `Blackhole` entry, recording each value added to it.
+    """
+
+    def __init__(self):
+        self.calls = []
+        self.sources = []
+
+    def add_quantity(self, quantity, value, source, **kwargs):
+        self.calls.append(('quantity', quantity, value, source, kwargs))
+
+    def add_photometry(self, **kwargs):
+        self.calls.append(('photometry', kwargs))
+
+    def add_alias(self, alias, source):
+        self.calls.append(('alias', alias, source))
+
+    def add_source(self, **kwargs):
+        if kwargs not in self.sources:
+            self.sources.append(kwargs)
+        return str(self.sources.index(kwargs) + 2)
+
+    def add_raw_row(self, spec, row, source):
+        self.calls.append(('raw', row, source))
+
+
+def _shen_2008_baseline(entry, line, source):
+    """Values added by the original (hand-written) `shen_2008._add_entry_for_data_line`.
+    """
+    line = [ll.strip() for ll in line]
+
+    entry.add_quantity(BLACKHOLE.RA, line[1], source)
+    entry.add_quantity(BLACKHOLE.DEC, line[2], source)
+    entry.add_quantity(BLACKHOLE.REDSHIFT, line[3], source)
+
+    obs_date = line[9]
+    if len(line[5]):
+        photo_kwargs = {
+            PHOTOMETRY.MAGNITUDE: line[5],
+            PHOTOMETRY.SOURCE: source,
+            PHOTOMETRY.HOST: False,
+            PHOTOMETRY.U_LUMINOSITY: 'Absolute Magnitude',
+            PHOTOMETRY.DESCRIPTION: 'PSF i-band absolute magnitude, K-corrected to z=2',
+            PHOTOMETRY.BAND: 'i',
+            PHOTOMETRY.INCLUDES_HOST: True,
+            PHOTOMETRY.KCORRECTED: True,
+            PHOTOMETRY.TIME: obs_date,
+            PHOTOMETRY.U_TIME: 'MJD',
+        }
+        entry.add_photometry(**photo_kwargs)
+
+    if len(line[6]):
+        photo_kwargs = {
+            PHOTOMETRY.LUMINOSITY: line[6],
+            PHOTOMETRY.SOURCE: source,
+            PHOTOMETRY.HOST: False,
+            PHOTOMETRY.U_LUMINOSITY: 'log (L/[erg/s])',
+            PHOTOMETRY.DESCRIPTION: 'Using bolometric corrections in Richards+2006b',
+            PHOTOMETRY.BAND: 'bolometric',
+            PHOTOMETRY.INCLUDES_HOST: True,
+            PHOTOMETRY.TIME: obs_date,
+            PHOTOMETRY.U_TIME: 'MJD',
+        }
+        entry.add_photometry(**photo_kwargs)
+
+    line_names = ["H-Beta", "Mg-II", "C-IV"]
+    line_waves = ["5100", "3000", "1350"]
+    line_vars = ["HBETA", "MGII", "CIV"]
+    for ii, (nn, ww, vv) in enumerate(zip(line_names, line_waves, line_vars)):
+        line_name = "{} ({} A)".format(nn, ww)
+
+        col = 14 + ii*3
+        if len(line[col]):
+            var = getattr(BLACKHOLE, "FWHM_" + vv)
+            desc = "Full-width at Half-Maximum of {}".format(line_name)
+            quant_kwargs = {QUANTITY.U_VALUE: 'km/s', QUANTITY.DESCRIPTION: desc}
+            entry.add_quantity(var, line[col], source, **quant_kwargs)
+
+        col = 15 + ii*3
+        if len(line[col]):
+            desc = 'Monochromatic luminosity for {} (lambda*L_lambda)'.format(line_name)
+            photo_kwargs = {
+                PHOTOMETRY.LUMINOSITY: line[col],
+                PHOTOMETRY.SOURCE: source,
+                PHOTOMETRY.HOST: False,
+                PHOTOMETRY.U_LUMINOSITY: 'log (L/[erg/s])',
+                PHOTOMETRY.DESCRIPTION: desc,
+                PHOTOMETRY.WAVELENGTH: ww,
+                PHOTOMETRY.U_WAVELENGTH: 'Angstrom',
+                PHOTOMETRY.TIME: obs_date,
+                PHOTOMETRY.U_TIME: 'MJD',
+            }
+            entry.add_photometry(**photo_kwargs)
+
+        col = 16 + ii*3
+        if len(line[col]):
+            mass_method = getattr(BH_MASS_METHODS, "VIR_" + vv)
+            desc = "Virial mass estimated using {}".format(line_name)
+            quant_kwargs = {QUANTITY.U_VALUE: 'log(M/Msol)',
+                            QUANTITY.DESCRIPTION: desc,
+                            QUANTITY.KIND: mass_method}
+            entry.add_quantity(BLACKHOLE.MASS, line[col], source, **quant_kwargs)
+
+    val = line[23]
+    if len(val):
+        desc = ("Virial BH-Mass Using H-Beta for z < 0.7; "
+                "Mg-ii for 0.7 < z < 1.9; and C-iv for z > 1.9")
+        quant_kwargs = {QUANTITY.U_VALUE: 'log(M/Msol)',
+                        QUANTITY.DESCRIPTION: desc,
+                        QUANTITY.KIND: BH_MASS_METHODS.VIR}
+        entry.add_quantity(BLACKHOLE.MASS, val, source, **quant_kwargs)
+    return
+
+
+def _tremaine_2002_baseline(entry, line, source):
+    """Values of columns [2], [5] and [6] added by the original `tremaine_2002` code.
+    """
+    magn_b = line[2].strip()
+    photo_kwargs = {
+        PHOTOMETRY.MAGNITUDE: magn_b, PHOTOMETRY.SOURCE: source, PHOTOMETRY.HOST: True,
+        PHOTOMETRY.U_LUMINOSITY: 'Magnitude',
+        PHOTOMETRY.DESCRIPTION: 'B-Band Magnitude ("Galaxy hot component")',
+        PHOTOMETRY.BAND: 'B'
+    }
+    entry.add_photometry(**photo_kwargs)
+
+    sigma_1 = line[5].strip()
+    sigma_desc = "RMS dispersion within a slit aperture of length 2 r_e"
+    quant_kwargs = {QUANTITY.U_VALUE: 'km/s', QUANTITY.DESCRIPTION: sigma_desc}
+    entry.add_quantity(BLACKHOLE.GALAXY_VEL_DISP, sigma_1, source, **quant_kwargs)
+
+    dist = line[6].strip()
+    dist_src = entry.add_source(**tremaine_2002.TONRY_ETAL_2001)
+    quant_kwargs = {QUANTITY.U_VALUE: 'Mpc'}
+    entry.add_quantity(BLACKHOLE.DISTANCE, dist, dist_src, **quant_kwargs)
+    return
+
+
+def _added(func, *args):
+    entry = RecordingEntry()
+    func(entry, *args)
+    return entry
+
+
+@pytest.mark.parametrize("row", SHEN_ROWS)
+def test_shen_2008_matches_baseline(row):
+    row = row.split('|')
+    assert shen_2008.COLUMN_SPEC.check_row(row)
+
+    expect = _added(_shen_2008_baseline, row, '1')
+    spec = _added(shen_2008.COLUMN_SPEC.add_row, row, '1')
+    assert spec.calls == expect.calls
+    assert len(spec.calls) == shen_2008.COLUMN_SPEC.add_row(RecordingEntry(), row, '1')
+
+
+def test_shen_2008_missing_values():
+    # Unlike the original code, unmeasured values ('9999', see note (4)) are skipped
+    row = SHEN_ROWS[0].split('|')
+    missing = [15, 16, 23]
+    for col in missing:
+        row[col] = '   9999'
+
+    expect = _added(_shen_2008_baseline, row, '1')
+    spec = _added(shen_2008.COLUMN_SPEC.add_row, row, '1')
+    skipped = [cc for cc in expect.calls if '9999' in (cc[2:3] + tuple(cc[-1].values()))]
+    assert len(skipped) == len(missing)
+    assert spec.calls == [cc for cc in expect.calls if cc not in skipped]
+
+
+@pytest.mark.parametrize("row", TREMAINE_ROWS)
+def test_tremaine_2002_matches_baseline(row):
+    row = row.split(' ')
+    assert tremaine_2002.COLUMN_SPEC.check_row(row)
+
+    expect = _added(_tremaine_2002_baseline, row, '1')
+    spec = _added(tremaine_2002.COLUMN_SPEC.add_row, row, '1')
+    assert spec.calls == expect.calls
+    assert spec.sources == expect.sources == [tremaine_2002.TONRY_ETAL_2001]
+
+
+def test_tremaine_2002_empty_values():
+    # Unlike the original code, empty values are skipped (including their source)
+    row = TREMAINE_ROWS[0].split(' ')
+    row[6] = ''
+
+    expect = _added(_tremaine_2002_baseline, row, '1')
+    spec = _added(tremaine_2002.COLUMN_SPEC.add_row, row, '1')
+    assert spec.calls == expect.calls[:-1]
+    assert spec.sources == []
+
+
+def test_add_row():
+    spec = ColumnSpec([
+        Column(0, target=COLUMN_TARGET.ALIAS),
+        Column(1, BLACKHOLE.REDSHIFT, cast=lambda vv: vv.lstrip('+')),
+        Column(2, BLACKHOLE.MASS, unit='log(M/Msol)', kind=BH_MASS_METHODS.VIR, missing='-'),
+        Column(3, PHOTOMETRY.LUMINOSITY, target=COLUMN_TARGET.PHOTOMETRY,
+               refs={PHOTOMETRY.TIME: 4}, extra={PHOTOMETRY.BAND: 'bolometric'}),
+        Column(5, BLACKHOLE.DISTANCE, source=dict(name='Distances')),
+    ], num_columns=6, missing='9999')
+
+    assert not spec.check_row(['a'] * 5)
+    entry = RecordingEntry()
+    num = spec.add_row(entry, [' Alias ', ' +0.1', '-', '45.0', '9999', '20'], '1')
+    assert num == 4
+    assert entry.calls == [
+        ('alias', 'Alias', '1'),
+        ('quantity', BLACKHOLE.REDSHIFT, '0.1', '1', {}),
+        # The missing reference [4] is skipped
+        ('photometry', {PHOTOMETRY.BAND: 'bolometric', PHOTOMETRY.LUMINOSITY: '45.0',
+                        PHOTOMETRY.SOURCE: '1'}),
+        ('quantity', BLACKHOLE.DISTANCE, '20', '2', {}),
+    ]
+    assert entry.sources == [dict(name='Distances')]
+
+    # Rows are only kept by the entry if all values can be added later (i.e. without aliases)
+    entry = RecordingEntry()
+    assert spec.add_row(entry, ['A', '0.1', '8.0', '45.0', '52000', '20'], '1', lazy=True) == 5
+    assert all(cc[0] != 'raw' for cc in entry.calls)
+
+    spec = ColumnSpec([Column(0, BLACKHOLE.REDSHIFT)])
+    entry = RecordingEntry()
+    assert spec.add_row(entry, [' 0.1 '], '1', lazy=True) is None
+    assert entry.calls == [('raw', ['0.1'], '1')]
+
+
+def _shen_2008_entry(catalog, row, lazy):
+    entry = catalog.proto(catalog, "sdss000132")
+    src = entry.add_source(bibcode=shen_2008.SOURCE_BIBCODE)
+    entry.add_alias("sdss000132", src)
+    row = shen_2008.COLUMN_SPEC.prepare_row(row.split('|'))
+    shen_2008.COLUMN_SPEC.add_row(entry, row, src, prepared=True, lazy=lazy)
+    return entry
+
+
+def test_lazy_rows(catalog):
+    entry = _shen_2008_entry(catalog, SHEN_ROWS[0], lazy=True)
+    assert entry._raw_rows is not None
+    # Keys the kept row does not change are used without adding the row ...
+    assert entry[BLACKHOLE.NAME] == "sdss000132"
+    assert entry.get(BLACKHOLE.ALIAS) is not None
+    assert entry._raw_rows is not None
+    # ... while any key it does change adds the row first
+    assert BLACKHOLE.MASS in entry
+    assert entry._raw_rows is None
+    assert len(entry[BLACKHOLE.MASS]) == 3
+
+    for access in [lambda ee: ee[BLACKHOLE.REDSHIFT], lambda ee: ee.get(BLACKHOLE.PHOTOMETRY)]:
+        entry = _shen_2008_entry(catalog, SHEN_ROWS[0], lazy=True)
+        assert access(entry) and (entry._raw_rows is None)
+
+
+def test_lazy_rows_saved(catalog):
+    # Entries keeping rows are saved identically to those which added them immediately
+    saved = []
+    for lazy in [False, True]:
+        entry = _shen_2008_entry(catalog, SHEN_ROWS[0], lazy=lazy)
+        assert (entry._raw_rows is not None) == lazy
+        with open(entry.save(), 'r') as inp:
+            saved.append(inp.read())
+    assert saved[0] == saved[1]
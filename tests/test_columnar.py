@@ -0,0 +1,141 @@
+"""Tests of `columnar.PhotometryColumns`: photometry of entries stored by column.
+"""
+import json
+import copy
+from collections import OrderedDict
+
+import pytest
+
+from astrocats.catalog.struct import Entry, PHOTOMETRY
+from astrocats.blackholes.columnar import (
+    PhotometryCategories, PhotometryColumns, default_sort_key)
+
+ROWS = [
+    OrderedDict([(PHOTOMETRY.TIME, '52000'), (PHOTOMETRY.BAND, 'i'),
+                 (PHOTOMETRY.MAGNITUDE, '18.9'), (PHOTOMETRY.SOURCE, '1')]),
+    OrderedDict([(PHOTOMETRY.LUMINOSITY, '45.3'), (PHOTOMETRY.BAND, 'bolometric'),
+                 (PHOTOMETRY.SOURCE, '1'), (PHOTOMETRY.TIME, '51000')]),
+    OrderedDict([(PHOTOMETRY.BAND, 'B'), (PHOTOMETRY.MAGNITUDE, '12.1'),
+                 (PHOTOMETRY.SOURCE, '2'), (PHOTOMETRY.HOST, True)]),
+]
+
+# Photometry added to entries, as keyword arguments of `add_photometry`
+PHOTOMETRY_KWARGS = [
+    {PHOTOMETRY.MAGNITUDE: '18.898', PHOTOMETRY.BAND: 'i', PHOTOMETRY.TIME: '52251',
+     PHOTOMETRY.U_TIME: 'MJD', PHOTOMETRY.HOST: False, PHOTOMETRY.INCLUDES_HOST: True,
+     PHOTOMETRY.DESCRIPTION: 'PSF i-band absolute magnitude'},
+    {PHOTOMETRY.LUMINOSITY: '45.356', PHOTOMETRY.BAND: 'bolometric', PHOTOMETRY.TIME: '52251',
+     PHOTOMETRY.U_TIME: 'MJD', PHOTOMETRY.U_LUMINOSITY: 'log (L/[erg/s])'},
+    {PHOTOMETRY.MAGNITUDE: '12.1', PHOTOMETRY.BAND: 'B', PHOTOMETRY.HOST: True},
+    {PHOTOMETRY.LUMINOSITY: '44.1', PHOTOMETRY.BAND: 'B', PHOTOMETRY.HOST: True},
+]
+
+
+def test_rows_round_trip():
+    table = PhotometryColumns(ROWS)
+    assert len(table) == len(ROWS)
+    assert table == ROWS
+    # Rows keep their own order of keys
+    assert [list(rr.keys()) for rr in table] == [list(rr.keys()) for rr in ROWS]
+    assert json.dumps(table.to_list()) == json.dumps(ROWS)
+
+    table.insert(1, ROWS[2])
+    del table[0]
+    assert table == [ROWS[2], ROWS[1], ROWS[2]]
+    assert table[-1] == ROWS[2]
+    with pytest.raises(IndexError):
+        table[3]
+
+
+def test_rows_write_through():
+    table = PhotometryColumns(ROWS)
+    row = table[0]
+    row.append_sources_from({PHOTOMETRY.SOURCE: '1,3'})
+    row[PHOTOMETRY.BAND] = 'r'
+    assert table[0][PHOTOMETRY.SOURCE] == '1,3'
+    assert table[0][PHOTOMETRY.BAND] == 'r'
+
+    # Copies are detached from the table
+    other = copy.deepcopy(table[1])
+    other[PHOTOMETRY.BAND] = 'V'
+    assert table[1][PHOTOMETRY.BAND] == 'bolometric'
+
+    # Rows can no longer be modified once rows of the table are reordered
+    table.sort()
+    with pytest.raises(RuntimeError):
+        row[PHOTOMETRY.BAND] = 'g'
+
+
+def test_default_sort_key():
+    rows = [
+        {PHOTOMETRY.BAND: 'B', PHOTOMETRY.LUMINOSITY: '44.1'},
+        {PHOTOMETRY.BAND: 'B', PHOTOMETRY.MAGNITUDE: '12.1'},
+        {PHOTOMETRY.TIME: '52000', PHOTOMETRY.BAND: ['g', 'r'], PHOTOMETRY.MAGNITUDE: '18.0'},
+        {PHOTOMETRY.TIME: '52000', PHOTOMETRY.BAND: 'g', PHOTOMETRY.MAGNITUDE: 18.5},
+        {PHOTOMETRY.TIME: ['52000', '51000'], PHOTOMETRY.LUMINOSITY: '45.0'},
+        {PHOTOMETRY.LUMINOSITY: '45.0'},
+    ]
+    # Rows with and without magnitudes, or with bands given as lists, can be compared
+    order = sorted(range(len(rows)), key=lambda ii: default_sort_key(rows[ii]))
+    assert order == [5, 1, 0, 4, 3, 2]
+
+    table = PhotometryColumns(rows)
+    table.sort()
+    assert table == [rows[ii] for ii in order]
+
+
+def test_categories():
+    table = PhotometryColumns(ROWS)
+    other = PhotometryColumns(ROWS)
+    # Tables without given categories do not share values
+    assert table.categories is not other.categories
+    assert len(table.categories.values) == len(other.categories.values)
+
+    shared = PhotometryCategories()
+    first = PhotometryColumns(ROWS, categories=shared)
+    num = len(shared.values), len(shared.layouts)
+    second = PhotometryColumns(ROWS[::-1], categories=shared)
+    assert (len(shared.values), len(shared.layouts)) == num
+    assert second == ROWS[::-1]
+    assert first == ROWS
+
+    # Copies have their own categories
+    assert copy.deepcopy(first) == ROWS
+    assert copy.deepcopy(first).categories is not shared
+
+
+def _add_photometry(entry, columnar=True):
+    src = entry.add_source(bibcode="2008ApJ...680..169S")
+    entry.add_quantity(entry._KEYS.ALIAS, entry[entry._KEYS.NAME], src)
+    for kwargs in PHOTOMETRY_KWARGS:
+        kwargs = dict(kwargs, **{PHOTOMETRY.SOURCE: src})
+        if columnar:
+            entry.add_photometry(**kwargs)
+        else:
+            Entry.add_photometry(entry, **kwargs)
+    return entry
+
+
+@pytest.mark.parametrize("final", [False, True])
+def test_save(catalog, final):
+    # Photometry of entries is stored in tables of the catalog
+    entry = _add_photometry(catalog.proto(catalog, "a"))
+    phot = entry[entry._KEYS.PHOTOMETRY]
+    assert isinstance(phot, PhotometryColumns)
+    assert phot.categories is catalog.photometry_categories
+
+    # Entries are saved as if their photometry had been stored in a list
+    expect = _add_photometry(catalog.proto(catalog, "b"), columnar=False)
+    assert isinstance(expect[expect._KEYS.PHOTOMETRY], list)
+    with open(entry.save(final=final), 'r') as inp:
+        saved = json.load(inp, object_pairs_hook=OrderedDict)
+    with open(expect.save(final=final), 'r') as inp:
+        expect = json.load(inp, object_pairs_hook=OrderedDict)
+    assert json.dumps(saved['a'][entry._KEYS.PHOTOMETRY]) == json.dumps(
+        expect['b'][entry._KEYS.PHOTOMETRY])
+
+    # The entry still stores (the sanitized) photometry in a table
+    phot = entry[entry._KEYS.PHOTOMETRY]
+    assert isinstance(phot, PhotometryColumns)
+    assert phot.categories is catalog.photometry_categories
+    assert phot == saved['a'][entry._KEYS.PHOTOMETRY]
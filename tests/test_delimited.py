@@ -0,0 +1,95 @@
+"""Tests of `utils.delimited`: chunked, multi-process reading of delimited tables.
+"""
+import pytest
+
+from astrocats.blackholes.utils import iter_delimited_rows, split_chunks
+
+NUM_ROWS = 500
+
+
+def _strip_row(row):
+    """Strip all values, and skip rows marked 'skip' (run in the worker processes).
+    """
+    row = [vv.strip() for vv in row]
+    if row[1] == 'skip':
+        return None
+    return row
+
+
+def _write_table(path, trailing_newline=True):
+    lines = ["# name | value | note"]
+    for ii in range(NUM_ROWS):
+        if ii % 97 == 0:
+            lines.append("")
+        note = 'skip' if (ii % 50 == 7) else "note {}".format("x" * (ii % 13))
+        lines.append("SDSS{:04d} | {} | {}".format(ii, note, ii * 0.5))
+    text = "\n".join(lines) + ("\n" if trailing_newline else "")
+    fname = str(path / "table.dat")
+    with open(fname, 'w') as out:
+        out.write(text)
+    return fname
+
+
+def _read(fname, **kwargs):
+    kwargs.setdefault('delimiter', '|')
+    return list(iter_delimited_rows(fname, **kwargs))
+
+
+@pytest.mark.parametrize("trailing_newline", [True, False])
+@pytest.mark.parametrize("func", [None, _strip_row])
+def test_parallel_matches_serial(tmp_path, trailing_newline, func):
+    fname = _write_table(tmp_path, trailing_newline=trailing_newline)
+    serial = _read(fname, func=func, processes=1)
+    # Small chunks, so that many lines cross the chunk boundaries
+    parallel = _read(fname, func=func, processes=3, chunk_bytes=100)
+    assert parallel == serial
+
+    names = ["SDSS{:04d}".format(ii) for ii in range(NUM_ROWS)]
+    if func is not None:
+        names = [nn for ii, nn in enumerate(names) if ii % 50 != 7]
+    assert [row[0].strip() for off, num, row in serial] == names
+
+    # The last row ends at the end of the file, with or without a newline
+    with open(fname, 'rb') as inp:
+        size = len(inp.read())
+    assert serial[-1][0] == size
+    assert serial[-1][2][-1].strip() == str((NUM_ROWS - 1) * 0.5)
+
+
+def test_chunks_end_on_lines(tmp_path):
+    fname = _write_table(tmp_path, trailing_newline=False)
+    with open(fname, 'rb') as inp:
+        data = inp.read()
+
+    for chunk_bytes in [1, 7, 100, len(data) - 1, len(data), 10 * len(data)]:
+        chunks = split_chunks(fname, chunk_bytes=chunk_bytes)
+        assert chunks[0][0] == 0 and chunks[-1][1] == len(data)
+        assert all(aa[1] == bb[0] for aa, bb in zip(chunks[:-1], chunks[1:]))
+        # Every chunk (but the last) ends at the end of a line
+        assert all(data[end - 1:end] == b"\n" for beg, end in chunks[:-1])
+
+
+def test_offsets_and_resume(tmp_path):
+    fname = _write_table(tmp_path)
+    with open(fname, 'rb') as inp:
+        lines = inp.read().splitlines(keepends=True)
+
+    rows = _read(fname, processes=2, chunk_bytes=64)
+    for off, num, row in rows:
+        # Line numbers count all lines (including comments and empty lines)
+        assert sum(len(ll) for ll in lines[:num]) == off
+        assert lines[num - 1].decode().split('|')[0] == row[0]
+
+    # Resuming from the offset of a row yields the following rows, numbering lines from there
+    half = len(rows) // 2
+    offset, line_num = rows[half][:2]
+    rest = _read(fname, start=offset, processes=2, chunk_bytes=64)
+    assert [(off, num + line_num, row) for off, num, row in rest] == rows[half + 1:]
+
+
+def test_stop_early(tmp_path):
+    fname = _write_table(tmp_path)
+    rows = iter_delimited_rows(fname, delimiter='|', processes=2, chunk_bytes=64)
+    first = [next(rows) for ii in range(3)]
+    rows.close()
+    assert [row[0].strip() for off, num, row in first] == ["SDSS0000", "SDSS0001", "SDSS0002"]
@@ -0,0 +1,132 @@
+"""Tests of `entry_store.SQLiteEntryStore`: entries in an LRU working set backed by SQLite.
+"""
+import gc
+import threading
+
+import pytest
+
+from astrocats.catalog.struct import QUANTITY
+from astrocats.blackholes.blackhole import BLACKHOLE, BH_MASS_METHODS
+from astrocats.blackholes.entry_store import SQLiteEntryStore
+
+BIBCODES = ["2002ApJ...574..740T", "2008ApJ...680..169S"]
+
+
+@pytest.fixture
+def store(catalog):
+    store = SQLiteEntryStore(catalog, cache_size=2)
+    yield store
+    store.close()
+
+
+def _new_entry(catalog, name, mass=None, kind=None, bibcode=BIBCODES[0], alias=None):
+    entry = catalog.proto(catalog, name)
+    src = entry.add_source(bibcode=bibcode)
+    entry.add_alias(name, src)
+    if alias is not None:
+        entry.add_alias(alias, src)
+    if mass is not None:
+        kwargs = {QUANTITY.U_VALUE: 'log(M/Msol)'}
+        if kind is not None:
+            kwargs[QUANTITY.KIND] = kind
+        entry.add_quantity(BLACKHOLE.MASS, mass, src, **kwargs)
+    return entry
+
+
+def test_mapping_round_trip(catalog, store):
+    names = ["a", "b", "c", "d"]
+    for ii, name in enumerate(names):
+        store[name] = _new_entry(catalog, name, mass=str(7.5 + ii))
+
+    # Only the two most recent entries are held in memory, but all are stored in order
+    assert list(store.resident_entries()) == ["c", "d"]
+    assert len(store) == len(names)
+    assert list(store) == names
+    assert ("a" in store) and ("z" not in store)
+
+    # Entries evicted (and released) are loaded from the database
+    del store["b"]
+    gc.collect()
+    entry = store["a"]
+    assert entry[BLACKHOLE.NAME] == "a"
+    assert entry[BLACKHOLE.MASS][0][QUANTITY.VALUE] == "7.5"
+    assert list(store) == ["a", "c", "d"]
+    with pytest.raises(KeyError):
+        store["b"]
+    with pytest.raises(KeyError):
+        del store["b"]
+
+    store.clear()
+    assert len(store) == 0
+    assert list(store.resident_entries()) == []
+
+
+def test_edits_to_evicted_entries(catalog, store):
+    held = _new_entry(catalog, "a")
+    store["a"] = held
+    for name in ["b", "c"]:
+        store[name] = _new_entry(catalog, name)
+    assert "a" not in store.resident_entries()
+
+    # Changes made after the entry was evicted, while it is still referenced, are kept ...
+    src = held.add_source(bibcode=BIBCODES[1])
+    held.add_quantity(BLACKHOLE.MASS, '8.5', src)
+    assert store["a"] is held
+    for name in ["b", "c"]:
+        store[name]
+    held.add_alias("a2", src)
+    store.flush()
+
+    # ... and written to the database
+    del held
+    gc.collect()
+    assert "a" not in store.resident_entries()
+    entry = store["a"]
+    assert entry[BLACKHOLE.MASS][0][QUANTITY.VALUE] == '8.5'
+    assert store.find_name_of_alias("a2") == "a"
+
+
+def test_find_name_of_alias(catalog, store):
+    store["a"] = _new_entry(catalog, "a", alias="alpha")
+    store["b"] = _new_entry(catalog, "b", alias="beta")
+    # Aliases are only found once entries have been written
+    assert store.find_name_of_alias("alpha") is None
+    store.flush()
+    assert store.find_name_of_alias("alpha") == "a"
+    assert store.find_name_of_alias("beta") == "b"
+    assert store.find_name_of_alias("b") == "b"
+    assert store.find_name_of_alias("gamma") is None
+
+
+def test_select_names(catalog, store):
+    store["a"] = _new_entry(catalog, "a", mass='7.5', kind=BH_MASS_METHODS.VIR)
+    store["b"] = _new_entry(catalog, "b", mass='8.5', kind=BH_MASS_METHODS.DYN_STARS,
+                            bibcode=BIBCODES[1])
+    store["c"] = _new_entry(catalog, "c", mass='9.5', kind=BH_MASS_METHODS.VIR)
+    store["d"] = _new_entry(catalog, "d")
+
+    # Entries still in the working set are written first
+    assert sorted(store.select_names(BLACKHOLE.MASS)) == ["a", "b", "c"]
+    assert sorted(store.select_names(BLACKHOLE.MASS, min_value=8.0)) == ["b", "c"]
+    assert store.select_names(BLACKHOLE.MASS, min_value=8.0, max_value=9.0) == ["b"]
+    assert sorted(store.select_names(BLACKHOLE.MASS, kind=BH_MASS_METHODS.VIR)) == ["a", "c"]
+    assert store.select_names(BLACKHOLE.MASS, source_bibcode=BIBCODES[1]) == ["b"]
+    assert store.select_names(BLACKHOLE.REDSHIFT) == []
+
+
+def test_access_from_threads(catalog, store):
+    names = ["e{}".format(ii) for ii in range(20)]
+
+    def _add(names):
+        for name in names:
+            store[name] = _new_entry(catalog, name, mass='8.5')
+            assert store[name][BLACKHOLE.NAME] == name
+
+    threads = [threading.Thread(target=_add, args=(names[ii::4],)) for ii in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert sorted(store) == sorted(names)
+    assert sorted(store.select_names(BLACKHOLE.MASS, min_value=8.0)) == sorted(names)
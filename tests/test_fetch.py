@@ -0,0 +1,118 @@
+"""Tests of `utils.fetch`: concurrent downloads with `AsyncFetcher`, and `fetch_to_cache`.
+"""
+import os
+import time
+import threading
+import types
+
+from astrocats.blackholes.utils import AsyncFetcher, fetch_to_cache
+
+
+def _catalog(log, repo, archived=False, remote=None):
+    """Minimal stand-in for the catalog attributes used by `fetch_to_cache`.
+    """
+    return types.SimpleNamespace(
+        log=log, remote=remote,
+        args=types.SimpleNamespace(archived=archived, update=False),
+        current_task=types.SimpleNamespace(archived=False),
+        get_current_task_repo=lambda: repo)
+
+
+def test_results_in_order_of_completion(server, log, backend):
+    server.route('/slow', server.slow(0.5))
+    server.route('/missing', lambda num: (404, {}, 'not found'))
+    requests = [(server.url + '/slow', 'slow'), (server.url + '/missing', 'missing')]
+    requests += [(server.url + '/page/{}'.format(ii), 'page{}'.format(ii)) for ii in range(5)]
+
+    results = list(AsyncFetcher(log=log, timeout=5).iter_fetch(requests))
+
+    assert sorted(rr.fname for rr in results) == sorted(ff for _, ff in requests)
+    assert results[-1].fname == 'slow'
+    for rr in results:
+        assert not rr.cached
+        if rr.fname == 'missing':
+            assert (rr.text is None) and (rr.error is not None)
+        else:
+            assert (rr.error is None) and (rr.text == rr.url[len(server.url):] or rr.text == 'slow')
+
+
+def test_requests_per_host_are_bounded(server, log, backend):
+    state = {'active': 0, 'max': 0}
+    lock = threading.Lock()
+
+    def counted(num):
+        with lock:
+            state['active'] += 1
+            state['max'] = max(state['max'], state['active'])
+        time.sleep(0.1)
+        with lock:
+            state['active'] -= 1
+        return 200, {}, 'ok'
+
+    server.route('/page', counted)
+    requests = [(server.url + '/page/{}'.format(ii), ii) for ii in range(12)]
+    results = list(AsyncFetcher(log=log, concurrency=8, per_host=3).iter_fetch(requests))
+
+    assert len(results) == 12
+    assert all(rr.text == 'ok' for rr in results)
+    assert 1 < state['max'] <= 3
+
+
+def test_stopping_early_cancels_outstanding_requests(server, log, backend):
+    server.route('/slow', server.slow(2.0))
+    requests = [(server.url + '/fast', 'fast')]
+    requests += [(server.url + '/slow/{}'.format(ii), ii) for ii in range(4)]
+
+    beg = time.monotonic()
+    for result in AsyncFetcher(log=log, timeout=10).iter_fetch(requests):
+        assert result.fname == 'fast'
+        break
+
+    # Without cancellation, closing the iterator would wait for the slow requests
+    if backend == 'aiohttp':
+        assert time.monotonic() - beg < 1.5
+
+
+def test_cancel_after_event_loop_closed(server, log, backend, monkeypatch):
+    """Closing the iterator after the event loop has closed (a race with the loop's thread).
+    """
+    results = AsyncFetcher(log=log).iter_fetch([(server.url + '/page', 'page')])
+    assert next(results).text == '/page'
+
+    # Let the loop finish and close, but have its thread still appear to be running
+    time.sleep(0.5)
+    monkeypatch.setattr(threading.Thread, 'is_alive', lambda self: True)
+    # Previously raised "RuntimeError: Event loop is closed" from `call_soon_threadsafe`
+    results.close()
+
+
+def test_fetch_to_cache_writes_and_falls_back(server, log, backend, tmpdir):
+    repo = str(tmpdir)
+    server.route('/dead', lambda num: (500, {}, 'error'))
+    with open(os.path.join(repo, 'dead.txt'), 'w') as out:
+        out.write('cached copy')
+
+    requests = [(server.url + '/good', 'good.txt'), (server.url + '/dead', 'dead.txt'),
+                (server.url + '/dead/none', 'none.txt')]
+    results = {rr.fname: rr for rr in fetch_to_cache(_catalog(log, repo), requests)}
+
+    assert (results['good.txt'].text == '/good') and not results['good.txt'].cached
+    with open(os.path.join(repo, 'good.txt')) as inp:
+        assert inp.read() == '/good'
+    assert (results['dead.txt'].text == 'cached copy') and results['dead.txt'].cached
+    assert results['none.txt'].text is None
+
+
+def test_fetch_to_cache_archived_uses_cache(server, log, backend, tmpdir):
+    repo = str(tmpdir)
+    with open(os.path.join(repo, 'cached.txt'), 'w') as out:
+        out.write('cached copy')
+
+    requests = [(server.url + '/cached', 'cached.txt'), (server.url + '/new', 'new.txt')]
+    results = {rr.fname: rr for rr in fetch_to_cache(_catalog(log, repo, archived=True),
+                                                     requests)}
+
+    assert results['cached.txt'].text == 'cached copy' and results['cached.txt'].cached
+    assert results['new.txt'].text == '/new'
+    assert server.count('/cached') == 0
+    assert server.count('/new') == 1
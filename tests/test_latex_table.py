@@ -0,0 +1,153 @@
+"""Tests of `utils.latex_table`: streaming parsing of LaTeX tables.
+"""
+import pytest
+
+from astrocats.blackholes.utils import (
+    LatexTable, clean_latex_cell, count_latex_columns, iter_latex_table, split_value_error)
+
+TABULAR = r"""
+\begin{table}
+\caption{Velocity dispersions and masses}  % comment
+\label{tab:masses}
+\begin{tabular}{lcc}
+\hline
+Name & $\sigma$ & $\log(M_\mathrm{BH})$ \\
+ & (km/s) & \\
+\hline
+ASASSN-14ae & $53 \pm 2$ & $5.42^{+0.46}_{-0.46}$ \\
+ASASSN-14li & $81 \pm 2$ &
+    $6.23^{+0.39}_{-0.40}$ \\
+PTF09ge & \nodata & $6.31^{+0.39}_{-0.39}$ \\
+\hline
+\end{tabular}
+\end{table}
+"""
+
+BOOKTABS = r"""
+\begin{tabular}{@{}l|c c@{}}
+\toprule
+Name & $\sigma$ & Mass \\
+\midrule
+A & 1 & 2 \\
+\multicolumn{3}{c}{Second sample} \\
+B & 3 & 4 \\
+\bottomrule
+\end{tabular}
+"""
+
+NO_RULES = r"""
+\begin{tabular}{lcc}
+Name & $\sigma$ & Mass \\
+A & 1 & 2 \\
+B & 3 & 4 \\
+\end{tabular}
+"""
+
+DELUXETABLE = r"""
+\begin{deluxetable*}{lccr}
+\tablecaption{Sample}
+\tablehead{\colhead{Name} & \colhead{$z$} & \colhead{$\sigma$} & \colhead{Note}}
+\startdata
+A & 0.1 & $53 \pm 2$ & x \\
+B & 0.2 & $81 \pm 2$ & y \\
+C & 0.3 & \ldots & z
+\enddata
+\end{deluxetable*}
+"""
+
+
+def _rows(text, **kwargs):
+    return list(iter_latex_table(text.splitlines(), **kwargs))
+
+
+def test_tabular_with_rules():
+    rows = _rows(TABULAR)
+    header = [cells for cells, head in rows if head]
+    data = [cells for cells, head in rows if not head]
+
+    assert header == [['Name', '\\sigma', '\\log(M_BH)'], ['', '(km/s)', '']]
+    assert data == [
+        ['ASASSN-14ae', '53 ± 2', '5.42^{+0.46}_{-0.46}'],
+        ['ASASSN-14li', '81 ± 2', '6.23^{+0.39}_{-0.40}'],
+        ['PTF09ge', '', '6.31^{+0.39}_{-0.39}'],
+    ]
+
+    table = LatexTable(TABULAR.splitlines())
+    assert len(list(table)) == 5
+    assert (table.num_columns == 3) and (table.num_data_rows == 3)
+
+
+def test_booktabs_and_multicolumn():
+    table = LatexTable(BOOKTABS.splitlines())
+    rows = list(table)
+    assert rows[0] == (['Name', '\\sigma', 'Mass'], True)
+    assert [cells for cells, head in rows[1:]] == [
+        ['A', '1', '2'], ['Second sample'], ['B', '3', '4']]
+    assert all(not head for cells, head in rows[1:])
+    # Rows spanning columns are recognized by comparing with the declared number of columns
+    assert table.num_columns == 3
+    assert [len(cells) == table.num_columns for cells, head in rows[1:]] == [True, False, True]
+
+
+def test_table_without_rules():
+    # Without a rule, the header cannot be told apart from the data ...
+    with pytest.raises(ValueError, match='header_rows'):
+        _rows(NO_RULES)
+
+    # ... unless the number of header rows is given
+    rows = _rows(NO_RULES, header_rows=1)
+    assert rows == [(['Name', '\\sigma', 'Mass'], True), (['A', '1', '2'], False),
+                    (['B', '3', '4'], False)]
+
+
+def test_rule_only_after_all_rows():
+    text = NO_RULES.replace("\\end{tabular}", "\\hline\n\\end{tabular}")
+    with pytest.raises(ValueError):
+        _rows(text)
+
+
+def test_deluxetable():
+    table = LatexTable(DELUXETABLE.splitlines())
+    rows = list(table)
+
+    assert rows[0] == (['Name', 'z', '\\sigma', 'Note'], True)
+    # Everything after '\startdata' is data, and the last row has no trailing '\\'
+    assert [cells for cells, head in rows[1:]] == [
+        ['A', '0.1', '53 ± 2', 'x'], ['B', '0.2', '81 ± 2', 'y'], ['C', '0.3', '', 'z']]
+    assert not any(head for cells, head in rows[1:])
+    assert (table.num_columns == 4) and (table.num_data_rows == 3)
+
+
+def test_plain_text_rows():
+    # Without a column specification or rules, only `header_rows` separates the header
+    text = ["Name & a & b \\\\", "", "A & 1 & 2 \\\\"]
+    table = LatexTable(text, header_rows=1)
+    assert list(table) == [(['Name', 'a', 'b'], True), (['A', '1', '2'], False)]
+    assert table.num_columns is None
+
+
+@pytest.mark.parametrize("spec, num", [
+    ('lcc', 3), ('l|c|c', 3), ('@{}lcr@{}', 3), ('lp{3cm}r', 3), ('*{3}{c}', 3),
+    ('l*{2}{c|}r', 4), ('>{\\bfseries}lc', 2), ('lD{.}{.}{2}', 2), ('lS[table-format=1.2]c', 3),
+    ('p{0.3\\textwidth}X', 2),
+])
+def test_count_latex_columns(spec, num):
+    assert count_latex_columns(spec) == num
+
+
+def test_column_spec_of_environments():
+    for begin, num in [("\\begin{tabular}[t]{lccc}", 4), ("\\begin{tabular*}{\\textwidth}{lc}", 2),
+                       ("\\begin{tabularx}{\\linewidth}{lXX}", 3),
+                       ("\\begin{deluxetable}{lcccc}", 5)]:
+        table = LatexTable([begin, "a & b \\\\", "\\hline", "c & d \\\\"])
+        list(table)
+        assert table.num_columns == num
+
+
+def test_clean_and_split_values():
+    assert clean_latex_cell('$53 \\pm 2$') == '53 ± 2'
+    assert clean_latex_cell('\\textbf{NGC 4258}') == 'NGC 4258'
+    assert clean_latex_cell('\\ldots') == ''
+    assert split_value_error('53 ± 2') == ('53', '2', '2')
+    assert split_value_error('5.42^{+0.46}_{-0.30}') == ('5.42', '0.30', '0.46')
+    assert split_value_error('6.5') == ('6.5', '', '')
@@ -0,0 +1,95 @@
+"""Tests of `utils.merge` and `BlackholeCatalog.merge_duplicates`: finding and merging duplicates.
+"""
+import os
+
+from astrocats.catalog.struct import QUANTITY
+from astrocats.blackholes.blackhole import BLACKHOLE
+from astrocats.blackholes.utils import DisjointSets, identifier_key, find_duplicates
+
+BIBCODE = "2002ApJ...574..740T"
+
+
+def test_identifier_key(catalog):
+    def _same(*aliases):
+        return len(set(identifier_key(catalog, aa) for aa in aliases)) == 1
+
+    assert _same('NGC 4258', 'NGC4258', 'N4258', 'ngc 4258')
+    assert _same('SDSS J003500.42+003914.4', 'SDSS003500.42+003914.4',
+                 'sdssj003500.42+003914.4')
+    assert _same('Mrk 110', 'MRK110', 'mrk 110')
+    # Case is ignored only in the prefixes of known catalogues
+    assert not _same('Q0957+561a', 'Q0957+561A')
+    assert not _same('Mrk 110a', 'Mrk 110A')
+    assert not _same('NGC 4258', 'NGC 4285')
+
+
+def test_disjoint_sets():
+    sets = DisjointSets(6)
+    assert len(sets) == 6
+    assert sets.groups() == [[ii] for ii in range(6)]
+
+    sets.union(4, 1)
+    sets.union(5, 3)
+    sets.union(3, 1)
+    assert sets.find(5) == sets.find(4) == sets.find(1)
+    assert sets.find(0) != sets.find(1)
+    # Joining elements of the same set changes nothing
+    root = sets.find(3)
+    assert sets.union(1, 5) == root
+    assert sets.groups(min_size=2) == [[1, 3, 4, 5]]
+    assert sets.groups() == [[0], [1, 3, 4, 5], [2]]
+
+
+def _add_entries(catalog, **aliases):
+    # Entries are only added to the catalog once all have been made, as adding an alias of an
+    # entry already in the catalog merges the entries immediately
+    entries = []
+    for name, names in aliases.items():
+        entry = catalog.proto(catalog, name)
+        src = entry.add_source(bibcode=BIBCODE)
+        for alias in [name] + names:
+            entry.add_alias(alias, src)
+        entry.add_quantity(BLACKHOLE.MASS, '8.5', src)
+        entries.append(entry)
+    for entry in entries:
+        catalog.entries[entry[BLACKHOLE.NAME]] = entry
+    return
+
+
+def test_merge_chain(catalog, monkeypatch):
+    # 'a' shares an alias with 'b', and 'b' with 'c': 'd' and 'e' share one in different forms
+    _add_entries(catalog, a=["ab"], b=["ab", "bc"], c=["bc"], d=["NGC 4258"], e=["N4258"])
+    assert find_duplicates(catalog) == [["a", "b", "c"], ["d", "e"]]
+    catalog.journal_entries()
+
+    # Record the entries copied (the aliases are enough to find duplicates)
+    copies = []
+
+    def _copy(fromname, destname):
+        copies.append((fromname, destname))
+        # All entries have the same (single) source
+        dest = catalog.entries[destname]
+        for alias in catalog.entries[fromname][BLACKHOLE.ALIAS]:
+            if alias[QUANTITY.VALUE] not in dest.get_aliases():
+                dest[BLACKHOLE.ALIAS].append(alias)
+
+    monkeypatch.setattr(catalog, 'copy_to_entry_in_catalog', _copy)
+    catalog.merge_duplicates()
+
+    # Each group is merged once, into a single entry with all the aliases of the group
+    merge = catalog.report['merge_duplicates']
+    assert (merge['groups'] == 2) and (merge['merged'] == 3)
+    assert len(copies) == 3
+    assert sorted(ff for ff, dd in copies) == sorted(set("abcde") - set(dd for ff, dd in copies))
+    assert find_duplicates(catalog) == []
+
+    names = []
+    for name in ["a", "b", "c", "d", "e"]:
+        entry = catalog.proto(catalog, name)
+        outdir, fname = entry._get_save_path()
+        if os.path.exists(os.path.join(outdir, fname + ".json")):
+            names.append(name)
+    assert len(names) == 2
+
+    merged = catalog.proto.init_from_file(catalog, name=names[0])
+    assert set(["a", "b", "c", "ab", "bc"]) <= set(merged.get_aliases())
@@ -0,0 +1,118 @@
+"""Tests of `utils.repos.sync_repos` against local bare repositories standing in for the remotes.
+"""
+import os
+import subprocess
+
+import pytest
+
+from astrocats.blackholes.utils import REPO_ACTION, sync_repos
+
+
+def _git(args, cwd):
+    return subprocess.check_output(['git'] + args, cwd=cwd, universal_newlines=True).strip()
+
+
+@pytest.fixture
+def remotes(tmpdir, monkeypatch):
+    """Bare repositories 'a' and 'b' (each with two commits), and a working clone to push from.
+
+    Returns the URL template of the remotes, the directory for local repositories, and a function
+    which pushes a new commit to a remote (returning its sha).
+    """
+    for key, val in [('GIT_AUTHOR_NAME', 'test'), ('GIT_AUTHOR_EMAIL', 'test@example.com'),
+                     ('GIT_COMMITTER_NAME', 'test'), ('GIT_COMMITTER_EMAIL', 'test@example.com')]:
+        monkeypatch.setenv(key, val)
+
+    base = str(tmpdir)
+    work = os.path.join(base, 'work')
+    for name in ['a', 'b']:
+        bare = os.path.join(base, 'remotes', name + '.git')
+        _git(['init', '--quiet', '--bare', '--initial-branch=master', bare], base)
+        _git(['clone', '--quiet', bare, os.path.join(work, name)], base)
+
+    def push(name, fname='data.json'):
+        path = os.path.join(work, name)
+        with open(os.path.join(path, fname), 'a') as out:
+            out.write('{}\n')
+        _git(['add', fname], path)
+        _git(['commit', '--quiet', '-m', 'Add ' + fname], path)
+        _git(['push', '--quiet', 'origin', 'HEAD:master'], path)
+        return _git(['rev-parse', 'HEAD'], path)
+
+    for name in ['a', 'b']:
+        push(name, 'first.json')
+        push(name, 'second.json')
+
+    local = os.path.join(base, 'local')
+    os.makedirs(local)
+    url = 'file://' + os.path.join(base, 'remotes', '{}.git')
+    return url, local, push
+
+
+def _actions(results):
+    return {os.path.basename(path): res['action'] for path, res in results.items()}
+
+
+def test_clone_then_no_op(remotes, log):
+    url, local, push = remotes
+    paths = [os.path.join(local, name) for name in ['a', 'b']]
+
+    results = sync_repos(paths, url, log, depth=1)
+    assert _actions(results) == {'a': REPO_ACTION.CLONED, 'b': REPO_ACTION.CLONED}
+    for path in paths:
+        assert results[path]['sha'] == _git(['rev-parse', 'HEAD'], path)
+        # Shallow clones only have the latest commit
+        assert _git(['rev-list', '--count', 'HEAD'], path) == '1'
+        assert not os.path.exists(path + '.partial')
+
+    # Rerunning does nothing: both are already current
+    again = sync_repos(paths, url, log, depth=1)
+    assert _actions(again) == {'a': REPO_ACTION.CURRENT, 'b': REPO_ACTION.CURRENT}
+    assert [res['sha'] for res in again.values()] == [res['sha'] for res in results.values()]
+
+
+def test_update_keeps_untracked_files(remotes, log):
+    url, local, push = remotes
+    paths = [os.path.join(local, name) for name in ['a', 'b']]
+    sync_repos(paths, url, log)
+
+    untracked = os.path.join(paths[0], 'untracked.json')
+    with open(untracked, 'w') as out:
+        out.write('{}')
+    sha = push('a', 'third.json')
+
+    results = sync_repos(paths, url, log)
+    assert _actions(results) == {'a': REPO_ACTION.UPDATED, 'b': REPO_ACTION.CURRENT}
+    assert results[paths[0]]['sha'] == sha
+    assert os.path.exists(os.path.join(paths[0], 'third.json'))
+    assert os.path.exists(untracked)
+
+
+def test_local_commits_are_not_discarded(remotes, log):
+    url, local, push = remotes
+    path = os.path.join(local, 'a')
+    sync_repos([path], url, log)
+
+    with open(os.path.join(path, 'local.json'), 'w') as out:
+        out.write('{}')
+    _git(['add', 'local.json'], path)
+    _git(['commit', '--quiet', '-m', 'Local change'], path)
+    sha = _git(['rev-parse', 'HEAD'], path)
+    push('a', 'third.json')
+
+    results = sync_repos([path], url, log)
+    assert results[path]['action'] == REPO_ACTION.SKIPPED
+    assert _git(['rev-parse', 'HEAD'], path) == sha
+
+
+def test_missing_remote(remotes, log):
+    url, local, push = remotes
+    paths = [os.path.join(local, name) for name in ['a', 'missing']]
+
+    results = sync_repos(paths, url, log)
+    assert _actions(results) == {'a': REPO_ACTION.CLONED, 'missing': REPO_ACTION.FAILED}
+    failed = results[paths[1]]
+    assert (failed['sha'] is None) and failed['message']
+    # Neither the repository nor a partial clone is left behind
+    assert not os.path.exists(paths[1])
+    assert not os.path.exists(paths[1] + '.partial')
@@ -0,0 +1,175 @@
+"""Tests of `utils.retry`: retries with backoff, retry budgets and per-host circuit breakers.
+
+Faults are injected by the routes of the local stand-in server (see `conftest.StandInServer`).
+"""
+import os
+import time
+import types
+
+import pytest
+import requests
+
+from astrocats.blackholes.utils import (
+    AsyncFetcher, CircuitOpenError, RemoteInputs, RetryPolicy, fetch_to_cache)
+
+
+def _remote(log, threshold=3, **kwargs):
+    """`RemoteInputs` with short, fixed (jitter-free) delays, so that timings can be checked.
+    """
+    settings = dict(attempts=4, backoff=0.1, max_backoff=1.0, jitter=0.0, connect_timeout=1.0,
+                    read_timeout=2.0, budget=20)
+    settings.update(kwargs)
+    return RemoteInputs(log, policy=RetryPolicy(**settings), threshold=threshold)
+
+
+def _failing(num_failures, status=503, headers={}):
+    """Route which fails with `status` for the first `num_failures` requests to each path.
+    """
+    def func(num):
+        if num <= num_failures:
+            return status, headers, 'error'
+        return 200, {}, 'ok'
+    return func
+
+
+def test_transient_failures_are_retried_with_backoff(server, log):
+    server.route('/flaky', _failing(2))
+    remote = _remote(log)
+
+    beg = time.monotonic()
+    assert remote.request(server.url + '/flaky') == 'ok'
+    # Delays of 0.1 s then 0.2 s before the two retries
+    assert time.monotonic() - beg >= 0.3
+    assert server.count('/flaky') == 3
+    assert not remote.is_open(server.url)
+
+
+def test_backoff_delays():
+    policy = RetryPolicy(backoff=1.0, max_backoff=5.0, jitter=0.0)
+    assert [policy.delay(attempt) for attempt in range(5)] == [1.0, 2.0, 4.0, 5.0, 5.0]
+    # The server's 'Retry-After' lengthens (but never shortens) the delay, up to the maximum
+    assert policy.delay(0, retry_after=3.0) == 3.0
+    assert policy.delay(2, retry_after=0.5) == 4.0
+    assert policy.delay(0, retry_after=60.0) == 5.0
+
+    policy = RetryPolicy(backoff=1.0, jitter=0.5)
+    delays = [policy.delay(0) for _ in range(50)]
+    assert all(0.5 <= dd <= 1.0 for dd in delays)
+    assert len(set(delays)) > 1
+
+
+def test_retry_after_is_respected(server, log):
+    server.route('/limited', _failing(1, status=429, headers={'Retry-After': '0.5'}))
+    remote = _remote(log, backoff=0.01)
+
+    beg = time.monotonic()
+    assert remote.request(server.url + '/limited') == 'ok'
+    assert time.monotonic() - beg >= 0.5
+    assert server.count('/limited') == 2
+
+
+def test_client_errors_are_not_retried(server, log):
+    server.route('/missing', lambda num: (404, {}, 'not found'))
+    remote = _remote(log, threshold=1)
+
+    with pytest.raises(requests.HTTPError):
+        remote.request(server.url + '/missing')
+    assert server.count('/missing') == 1
+    # '404 Not Found' means that the host itself is working
+    assert not remote.is_open(server.url)
+
+
+def test_retry_budget_limits_retries_per_host(server, log):
+    server.route('/dead', lambda num: (500, {}, 'error'))
+    remote = _remote(log, threshold=100, backoff=0.01, budget=2)
+
+    # The first request uses up the budget (one attempt and two retries) ...
+    with pytest.raises(requests.HTTPError):
+        remote.request(server.url + '/dead/1')
+    assert server.count('/dead/1') == 3
+    # ... so later requests to the host are not retried
+    with pytest.raises(requests.HTTPError):
+        remote.request(server.url + '/dead/2')
+    assert server.count('/dead/2') == 1
+
+    # The budget is restored for a new task
+    remote.reset()
+    with pytest.raises(requests.HTTPError):
+        remote.request(server.url + '/dead/3')
+    assert server.count('/dead/3') == 3
+
+
+def test_circuit_breaker_opens_per_host(server, log):
+    server.route('/dead', lambda num: (500, {}, 'error'))
+    remote = _remote(log, threshold=3, attempts=1)
+    # The same server under a second name is a separate host
+    other = server.url.replace('127.0.0.1', 'localhost')
+
+    for ii in range(3):
+        assert not remote.is_open(server.url)
+        with pytest.raises(requests.HTTPError):
+            remote.request(server.url + '/dead/{}'.format(ii))
+    assert remote.is_open(server.url)
+
+    # Requests to the host are skipped, without reaching the server
+    with pytest.raises(CircuitOpenError):
+        remote.request(server.url + '/page')
+    assert server.count() == 3
+
+    assert not remote.is_open(other)
+    assert remote.request(other + '/page') == '/page'
+
+    remote.reset()
+    assert remote.request(server.url + '/page') == '/page'
+
+
+def test_success_resets_consecutive_failures(server, log):
+    server.route('/dead', lambda num: (500, {}, 'error'))
+    remote = _remote(log, threshold=2, attempts=1)
+
+    for ii in range(3):
+        with pytest.raises(requests.HTTPError):
+            remote.request(server.url + '/dead/{}'.format(ii))
+        remote.request(server.url + '/page')
+    assert not remote.is_open(server.url)
+
+
+def test_async_fetcher_retries(server, log, backend):
+    server.route('/flaky', _failing(2))
+    server.route('/missing', lambda num: (404, {}, 'not found'))
+    remote = _remote(log, backoff=0.05)
+    urls = [(server.url + '/flaky/{}'.format(ii), ii) for ii in range(6)]
+    urls.append((server.url + '/missing', 'missing'))
+
+    results = list(AsyncFetcher(log=log, remote=remote, per_host=3).iter_fetch(urls))
+
+    errors = [rr.fname for rr in results if rr.error is not None]
+    assert errors == ['missing']
+    assert all(rr.text == 'ok' for rr in results if rr.fname != 'missing')
+    assert server.count('/flaky') == 6 * 3
+    assert server.count('/missing') == 1
+
+
+def test_open_circuit_switches_to_cache_only(server, log, backend, tmpdir):
+    server.route('/dead', lambda num: (503, {}, 'error'))
+    repo = str(tmpdir)
+    num = 8
+    for ii in range(num):
+        with open(os.path.join(repo, 'file{}.txt'.format(ii)), 'w') as out:
+            out.write('cached {}'.format(ii))
+
+    remote = _remote(log, threshold=3, attempts=1)
+    catalog = types.SimpleNamespace(
+        log=log, remote=remote,
+        args=types.SimpleNamespace(archived=False, update=False),
+        current_task=types.SimpleNamespace(archived=False),
+        get_current_task_repo=lambda: repo)
+    urls = [(server.url + '/dead/{}'.format(ii), 'file{}.txt'.format(ii)) for ii in range(num)]
+
+    results = list(fetch_to_cache(catalog, urls, per_host=1))
+
+    assert sorted(rr.text for rr in results) == sorted('cached {}'.format(ii) for ii in range(num))
+    assert all(rr.cached for rr in results)
+    # Once the breaker opened, the remaining files were taken from the cache without requests
+    assert remote.is_open(server.url)
+    assert server.count('/dead') == 3
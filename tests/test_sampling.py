@@ -0,0 +1,132 @@
+"""Tests of `utils.sampling`: deterministic sampling of input rows.
+"""
+import types
+
+import pytest
+
+from astrocats.blackholes.utils import RowSampler
+
+TRAVIS_QUERY_LIMIT = 10
+NAMES = ["SDSS{:06d}".format(ii) for ii in range(5000)]
+
+
+def _sampler(total=None, **args):
+    """`RowSampler` for a catalog with the given arguments (e.g. `sample=10`).
+    """
+    args.setdefault('travis', False)
+    catalog = types.SimpleNamespace(
+        args=types.SimpleNamespace(**args), TRAVIS_QUERY_LIMIT=TRAVIS_QUERY_LIMIT)
+    return RowSampler(catalog, total=total)
+
+
+def _kept(sampler, names=NAMES, strata=None):
+    if strata is None:
+        return [nn for nn in names if sampler.keep(nn)]
+    return [nn for nn, ss in zip(names, strata) if sampler.keep(nn, stratum=ss)]
+
+
+def test_no_sampling():
+    sampler = _sampler(total=len(NAMES))
+    assert not sampler.active
+    assert _kept(sampler) == NAMES
+
+
+def test_same_seed_same_sample():
+    first = _kept(_sampler(sample_fraction=0.1, sample_seed=3))
+    assert _kept(_sampler(sample_fraction=0.1, sample_seed=3)) == first
+    # Rows are chosen by their keys, not by their position in the input
+    assert _kept(_sampler(sample_fraction=0.1, sample_seed=3), names=NAMES[::-1]) == first[::-1]
+
+    other = _kept(_sampler(sample_fraction=0.1, sample_seed=4))
+    assert other != first
+
+
+@pytest.mark.parametrize("num", [10, 100, 1000])
+def test_sample_size(num):
+    sampler = _sampler(total=len(NAMES), sample=num)
+    assert sampler.active
+    kept = _kept(sampler)
+    assert sampler.count == len(kept)
+    assert abs(len(kept) - num) < 4 * num**0.5
+
+
+def test_sample_without_total_keeps_first_rows():
+    sampler = _sampler(sample=25)
+    assert _kept(sampler) == NAMES[:25]
+    assert sampler.done
+
+
+@pytest.mark.parametrize("fraction", [0.01, 0.2, 1.0])
+def test_sample_fraction(fraction):
+    sampler = _sampler(sample_fraction=fraction)
+    assert sampler.active == (fraction < 1.0)
+    num = len(NAMES) * fraction
+    assert abs(len(_kept(sampler)) - num) < 4 * num**0.5 + 1
+
+
+def test_travis_default():
+    # `--travis` alone keeps a small sample ...
+    assert len(_kept(_sampler(travis=True))) == TRAVIS_QUERY_LIMIT
+    sampler = _sampler(total=len(NAMES), travis=True)
+    assert sampler.fraction == TRAVIS_QUERY_LIMIT / len(NAMES)
+
+    # ... unless sampling is set explicitly
+    assert len(_kept(_sampler(travis=True, sample=50))) == 50
+    assert _kept(_sampler(travis=True, sample_fraction=0.1)) == _kept(
+        _sampler(sample_fraction=0.1))
+
+
+@pytest.mark.parametrize("args", [
+    dict(sample=10, sample_fraction=0.1), dict(sample=0), dict(sample_fraction=0.0),
+    dict(sample_fraction=1.5)])
+def test_invalid_settings(args):
+    with pytest.raises(ValueError):
+        _sampler(**args)
+
+
+def test_stratified_selection():
+    # Strata of very different sizes, interleaved in the input
+    sizes = {'HBETA': 3000, 'MGII': 1500, 'CIV': 490, 'RARE': 10}
+    strata = []
+    for ii in range(max(sizes.values())):
+        strata.extend(ss for ss, num in sizes.items() if ii < num)
+    names = ["row{}".format(ii) for ii in range(len(strata))]
+
+    fraction = 0.05
+    sampler = _sampler(sample_fraction=fraction, sample_seed=1)
+    kept = set(_kept(sampler, names, strata))
+
+    for ss, num in sizes.items():
+        rows = [nn for nn, st in zip(names, strata) if st == ss]
+        sel = [nn in kept for nn in rows]
+        # Each stratum is represented in proportion to its size, and its first row is kept
+        assert abs(sum(sel) - num * fraction) <= 2
+        assert sel[0]
+        # Rows are chosen systematically: the gaps between selected rows are (almost) equal
+        idx = [ii for ii, kk in enumerate(sel) if kk]
+        gaps = set(bb - aa for aa, bb in zip(idx[1:], idx[2:]))
+        assert gaps <= {int(1 / fraction), int(1 / fraction) + 1}
+
+    assert sampler.get_state()['strata'] == {
+        ss: sum(nn in kept for nn, st in zip(names, strata) if st == ss) for ss in sizes}
+    assert "RARE: " in sampler.summary()
+
+    # The seed shifts which rows are chosen
+    other = set(_kept(_sampler(sample_fraction=fraction, sample_seed=2), names, strata))
+    assert other != kept
+
+
+def test_resume_from_state():
+    strata = [ii % 3 for ii in range(len(NAMES))]
+    half = len(NAMES) // 2
+    for args in [dict(sample_fraction=0.1), dict(sample=30)]:
+        full = _sampler(**args)
+        expect = _kept(full, strata=strata)
+
+        first = _sampler(**args)
+        kept = _kept(first, NAMES[:half], strata[:half])
+        second = _sampler(**args)
+        second.set_state(first.get_state())
+        kept += _kept(second, NAMES[half:], strata[half:])
+        assert kept == expect
+        assert second.count == full.count
@@ -0,0 +1,261 @@
+"""Tests of `scheduler.TaskGraph`, and of tasks run concurrently by `BlackholeCatalog`.
+
+The tasks run by the catalog are the `do_*` functions of this module (see `tasks_catalog`).
+"""
+import os
+import sys
+import json
+import time
+import threading
+from collections import OrderedDict
+
+import pytest
+
+from astrocats.catalog.task import Task
+from astrocats.blackholes.blackhole import BLACKHOLE
+from astrocats.blackholes.entry_store import ENTRY_STORE, init_entry_store
+from astrocats.blackholes.scheduler import TaskGraph
+
+# Module name under which the tasks are imported by the catalog (relative to `astrocats`)
+TASKS_MODULE = "_scheduler_test_tasks"
+BIBCODE = "2002ApJ...574..740T"
+TIMEOUT = 10.0
+
+# Events set by the tasks, and the order in which they happened (reset by `tasks_catalog`)
+_events = {}
+_order = []
+
+
+def _tasks(**depends_on):
+    tasks = OrderedDict()
+    for ii, name in enumerate(depends_on):
+        tasks[name] = Task(name=name, priority=ii // 2, module=TASKS_MODULE, function='do_' + name)
+    return tasks
+
+
+class _Log:
+    def debug(self, msg):
+        return
+
+    error = debug
+
+
+# ==== TaskGraph ====
+
+
+def test_priority_order():
+    tasks = _tasks(a=None, b=None, c=None, d=None, e=None)
+    graph = TaskGraph(tasks, {}, _Log())
+    # Tasks depend on all tasks of the preceding priority
+    assert graph.deps == OrderedDict([
+        ('a', []), ('b', []), ('c', ['a', 'b']), ('d', ['a', 'b']), ('e', ['c', 'd'])])
+    assert not graph.explicit
+
+    graph = TaskGraph(tasks, dict(e=['a']), _Log())
+    assert graph.explicit and (graph.deps['e'] == ['a'])
+    path, total = graph.critical_path(dict(a=1.0, b=2.0, c=3.0, d=1.0, e=10.0))
+    assert (path == ['a', 'e']) and (total == 11.0)
+    path, total = graph.critical_path(dict(a=1.0, b=2.0, c=3.0, d=1.0, e=1.0))
+    assert (path == ['b', 'c']) and (total == 5.0)
+
+
+def test_cycle():
+    tasks = _tasks(a=None, b=None, c=None)
+    with pytest.raises(ValueError, match="cycle"):
+        TaskGraph(tasks, dict(a=['c'], c=['a']), _Log())
+    with pytest.raises(ValueError, match="cycle"):
+        TaskGraph(tasks, dict(a=['a']), _Log())
+    with pytest.raises(ValueError, match="unknown"):
+        TaskGraph(tasks, dict(a=['z']), _Log())
+
+
+@pytest.mark.parametrize("workers", [1, 3])
+def test_run_order(workers):
+    tasks = _tasks(a=None, b=None, c=None, d=None, e=None)
+    graph = TaskGraph(tasks, dict(b=['c'], c=[], e=['a']), _Log())
+    finished = []
+    lock = threading.Lock()
+
+    def _run(task):
+        time.sleep(0.01)
+        with lock:
+            finished.append(task.name)
+
+    durations = graph.run(_run, workers=workers)
+    assert sorted(durations) == sorted(tasks)
+    assert sorted(finished) == sorted(tasks)
+    for name, deps in graph.deps.items():
+        assert all(finished.index(dd) < finished.index(name) for dd in deps)
+
+
+def test_failing_task():
+    tasks = _tasks(a=None, b=None, c=None, d=None)
+    graph = TaskGraph(tasks, dict(b=[], c=['a'], d=['b']), _Log())
+    started = []
+    release = threading.Event()
+
+    def _run(task):
+        started.append(task.name)
+        if task.name == 'a':
+            raise RuntimeError("task 'a' failed")
+        # 'b' is still running when 'a' fails
+        assert release.wait(TIMEOUT)
+
+    def _release():
+        while 'a' not in started:
+            time.sleep(0.01)
+        time.sleep(0.05)
+        release.set()
+
+    thread = threading.Thread(target=_release)
+    thread.start()
+    with pytest.raises(RuntimeError, match="task 'a' failed"):
+        graph.run(_run, workers=2)
+    thread.join()
+    # Tasks depending on the failed one, and tasks not yet started, are not run
+    assert sorted(started) == ['a', 'b']
+
+
+# ==== Tasks run by the catalog ====
+
+
+def _wait(name):
+    assert _events.setdefault(name, threading.Event()).wait(TIMEOUT), name
+
+
+def _set(name):
+    _order.append(name)
+    _events.setdefault(name, threading.Event()).set()
+
+
+def _add(catalog, name, value):
+    name = catalog.add_entry(name)
+    entry = catalog.entries[name]
+    src = entry.add_source(bibcode=BIBCODE)
+    entry.add_quantity(BLACKHOLE.MASS, value, src)
+    return name
+
+
+def do_first(catalog):
+    _add(catalog, "shared", '8.1')
+    _set('first added')
+    # Give the second task time to wait for the shared entry
+    time.sleep(0.2)
+    _set('first done')
+
+
+def do_second(catalog):
+    _wait('first added')
+    _add(catalog, "other", '7.1')
+    _add(catalog, "shared", '8.2')
+    _set('second added')
+
+
+def do_cross_a(catalog):
+    _add(catalog, "x", '8.1')
+    _set('a added')
+    _wait('b added')
+    _add(catalog, "y", '8.2')
+
+
+def do_cross_b(catalog):
+    _add(catalog, "y", '7.1')
+    _set('b added')
+    # Wait until task 'cross_a' waits for entry 'y'
+    while 'cross_a' not in catalog._entry_waits:
+        time.sleep(0.01)
+    _add(catalog, "x", '7.2')
+
+
+def do_fail(catalog):
+    _add(catalog, "failed", '8.1')
+    raise ValueError("task 'fail' failed")
+
+
+def do_after_fail(catalog):
+    _set('after fail')
+
+
+def do_independent(catalog):
+    _add(catalog, "independent", '8.1')
+
+
+@pytest.fixture
+def tasks_catalog(catalog, tmp_path, monkeypatch):
+    """Catalog running the tasks of this module, given to `run` with their `depends_on`.
+    """
+    monkeypatch.setitem(sys.modules, "astrocats." + TASKS_MODULE, sys.modules[__name__])
+    _events.clear()
+    del _order[:]
+    for arg in ['update', 'delete_old', 'load_stubs', 'min_task_priority', 'max_task_priority',
+                'args_task_list', 'yes_task_list', 'no_task_list', 'task_groups']:
+        setattr(catalog.args, arg, None)
+    catalog.args.task_workers = 2
+
+    def run(**depends_on):
+        data = OrderedDict()
+        for name, deps in depends_on.items():
+            data[name] = dict(module=TASKS_MODULE, function='do_' + name, priority=1)
+            if deps is not None:
+                data[name]['depends_on'] = deps
+        fname = str(tmp_path / "tasks.json")
+        with open(fname, 'w') as out:
+            json.dump(data, out)
+        catalog.PATHS.TASK_LIST = fname
+        return catalog.import_data()
+
+    catalog.run_tasks = run
+    return catalog
+
+
+def _saved_masses(catalog, name):
+    outdir, fname = catalog.proto(catalog, name)._get_save_path()
+    with open(os.path.join(outdir, fname + ".json"), 'r') as inp:
+        data = json.load(inp)
+    return sorted(qq['value'] for qq in data[name][BLACKHOLE.MASS])
+
+
+def test_tasks_sharing_an_entry(tasks_catalog):
+    tasks_catalog.run_tasks(first=None, second=None)
+
+    # The second task could only add to the shared entry once the first had journaled it ...
+    assert _order == ['first added', 'first done', 'second added']
+    # ... and both values are kept
+    assert _saved_masses(tasks_catalog, "shared") == ['8.1', '8.2']
+    assert _saved_masses(tasks_catalog, "other") == ['7.1']
+    assert not len(tasks_catalog._entry_owners) and not len(tasks_catalog._entry_waits)
+    report = tasks_catalog.report['tasks']
+    assert (report['scheduler'] == 'graph') and (report['workers'] == 2)
+
+
+def test_tasks_waiting_for_each_other(tasks_catalog):
+    with pytest.raises(RuntimeError, match="cannot run concurrently"):
+        tasks_catalog.run_tasks(cross_a=None, cross_b=None)
+    # Entries of the failed task are released, so the other task could finish
+    assert not len(tasks_catalog._entry_owners)
+    assert _saved_masses(tasks_catalog, "y") == ['7.1', '8.2']
+
+
+def test_failing_task_in_catalog(tasks_catalog):
+    with pytest.raises(ValueError, match="task 'fail' failed"):
+        tasks_catalog.run_tasks(fail=None, after_fail=['fail'], independent=None)
+    assert 'after fail' not in _order
+    assert not len(tasks_catalog._entry_owners)
+    assert _saved_masses(tasks_catalog, "independent") == ['8.1']
+
+
+def test_cycle_in_catalog(tasks_catalog):
+    with pytest.raises(ValueError, match="cycle"):
+        tasks_catalog.run_tasks(first=['second'], second=['first'])
+    assert not len(_order)
+
+
+def test_sqlite_entry_store(catalog, tasks_catalog):
+    # Tasks using the SQLite store run one at a time, in threads of the scheduler
+    catalog.args.entry_store = ENTRY_STORE.SQLITE
+    catalog.entries = init_entry_store(catalog)
+    tasks_catalog.run_tasks(independent=None, first=['independent'], second=None)
+    assert _order == ['first added', 'first done', 'second added']
+    assert _saved_masses(catalog, "shared") == ['8.1', '8.2']
+    assert catalog.entries["shared"]._stub
+    catalog.entries.close()
@@ -0,0 +1,150 @@
+"""Tests of `validation`: skipped and deferred schema validation of the structures of entries.
+"""
+import types
+import threading
+
+import pytest
+import pyastroschema as pas
+from jsonschema import ValidationError
+
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
+from astrocats.catalog import struct, utils
+from astrocats.blackholes.blackhole import (
+    BLACKHOLE, BlackholeQuantity, BlackholePhotometry, BlackholeSource)
+from astrocats.blackholes.validation import VALIDATION, validation_skipped
+
+STRUCT_VALIDATE = pas.struct.Struct.validate
+
+
+def _invalid_quantity(entry, key=BLACKHOLE.MASS):
+    # Sources are aliases (integers), this fails validation against the schema
+    return entry._init_cat_dict(struct.Quantity, key, **{
+        QUANTITY.VALUE: '8.1', QUANTITY.SOURCE: 'x'})
+
+
+def test_catalog_structures(catalog):
+    entry = catalog.proto(catalog, "a")
+    src = entry.add_source(bibcode="2002ApJ...574..740T")
+    entry.add_quantity(BLACKHOLE.MASS, '8.1', src)
+    entry.add_photometry(**{PHOTOMETRY.MAGNITUDE: '12.1', PHOTOMETRY.BAND: 'B',
+                            PHOTOMETRY.HOST: True, PHOTOMETRY.SOURCE: src})
+
+    assert type(entry[BLACKHOLE.SOURCES][0]) is BlackholeSource
+    assert type(entry[BLACKHOLE.MASS][0]) is BlackholeQuantity
+    with validation_skipped([BLACKHOLE.PHOTOMETRY]):
+        row = entry._init_cat_dict(struct.Photometry, BLACKHOLE.PHOTOMETRY,
+                                   **entry[BLACKHOLE.PHOTOMETRY][0])
+    assert type(row) is BlackholePhotometry
+
+    # Structures of other users of `pyastroschema` are unaffected
+    assert pas.struct.Struct.validate is STRUCT_VALIDATE
+    with pytest.raises(ValidationError):
+        struct.Quantity(entry, key=BLACKHOLE.MASS, **{QUANTITY.VALUE: '8.1', QUANTITY.SOURCE: 'x'})
+
+
+def test_skip_only_given_structures(catalog):
+    entry = catalog.proto(catalog, "a")
+    with pytest.raises(ValidationError):
+        _invalid_quantity(entry)
+
+    with validation_skipped([BLACKHOLE.MASS]):
+        # Only the next structure of each given key is not validated ...
+        assert _invalid_quantity(entry) is not None
+        with pytest.raises(ValidationError):
+            _invalid_quantity(entry)
+        # ... and only of those keys
+        with pytest.raises(ValidationError):
+            _invalid_quantity(entry, BLACKHOLE.REDSHIFT)
+
+    with validation_skipped([BLACKHOLE.MASS]):
+        pass
+    with pytest.raises(ValidationError):
+        _invalid_quantity(entry)
+
+
+def test_skip_in_one_thread(catalog):
+    entry = catalog.proto(catalog, "a")
+    errors = []
+
+    def _add():
+        try:
+            _invalid_quantity(entry)
+        except ValidationError as err:
+            errors.append(err)
+
+    with validation_skipped([BLACKHOLE.MASS]):
+        thread = threading.Thread(target=_add)
+        thread.start()
+        thread.join()
+    assert len(errors) == 1
+
+
+def _deferred_additions(catalog):
+    """Begin a task with deferred validation, and add two invalid (and some valid) structures.
+    """
+    catalog.validation.mode = VALIDATION.DEFERRED
+    catalog.validation.begin(types.SimpleNamespace(name="deferred"))
+    assert catalog.validation.active
+
+    entry = catalog.proto(catalog, "a")
+    src = entry.add_source(bibcode="2002ApJ...574..740T")
+    entry.add_quantity(BLACKHOLE.MASS, '8.1', src)
+    # Invalid structures are constructed without errors
+    _invalid_quantity(entry, BLACKHOLE.MASS)
+    _invalid_quantity(entry, BLACKHOLE.REDSHIFT)
+    entry.add_quantity(BLACKHOLE.REDSHIFT, '0.1', src)
+    return entry
+
+
+def _failures(caplog):
+    return [rr.getMessage() for rr in caplog.records if "Validation failed" in rr.getMessage()]
+
+
+def test_deferred_failures_raise_together(catalog, caplog):
+    assert catalog.ADDITION_FAILURE_BEHAVIOR == utils.ADD_FAIL_ACTION.RAISE
+    _deferred_additions(catalog)
+    with pytest.raises(ValueError, match="2 of [0-9]+ deferred additions failed validation"):
+        catalog.validation.flush()
+
+    # Each failure is reported (with its entry), before the single error
+    failures = _failures(caplog)
+    assert len(failures) == 2
+    assert all(("'a' BlackholeQuantity" in msg) and ("'x'" in msg) for msg in failures)
+
+    # Deferral continues with a new batch
+    assert catalog.validation.active
+    catalog.validation.flush()
+    catalog.validation.end()
+    assert not catalog.validation.active
+    with pytest.raises(ValidationError):
+        _invalid_quantity(catalog.proto(catalog, "b"))
+
+
+def test_deferred_failures_warn(catalog, caplog, monkeypatch):
+    monkeypatch.setattr(catalog, 'ADDITION_FAILURE_BEHAVIOR', utils.ADD_FAIL_ACTION.WARN)
+    _deferred_additions(catalog)
+    catalog.validation.end()
+    assert len(_failures(caplog)) == 2
+    assert any("2 of" in rr.getMessage() for rr in caplog.records)
+    assert not catalog.validation.active
+
+
+def test_deferral_in_one_thread(catalog):
+    _deferred_additions(catalog)
+    errors = []
+
+    def _add():
+        try:
+            _invalid_quantity(catalog.proto(catalog, "b"))
+        except ValidationError as err:
+            errors.append(err)
+
+    # Other threads (e.g. tasks running concurrently) still validate immediately
+    thread = threading.Thread(target=_add)
+    thread.start()
+    thread.join()
+    assert len(errors) == 1
+
+    with pytest.raises(ValueError):
+        catalog.validation.end()
+    assert not catalog.validation.active
@@ -2,6 +2,57 @@
 """
 from . import input_data
 from .input_data import *
+from . import column_spec
+from .column_spec import *
+from . import latex_table
+from .latex_table import *
+from . import sampling
+from .sampling import *
+from . import archive
+from .archive import *
+from . import fetch
+from .fetch import *
+from . import checkpoint
+from .checkpoint import *
+from . import progress
+from .progress import *
+from . import entries
+from .entries import *
+from . import cosmology
+from .cosmology import *
+from . import interning
+from .interning import *
+from . import delimited
+from .delimited import *
+from . import report
+from .report import *
+from . import memory
+from .memory import *
+from . import repos
+from .repos import *
+from . import retry
+from .retry import *
+from . import references
+from .references import *
+from . import merge
+from .merge import *
 
 __all__ = []
 __all__.extend(input_data.__all__)
+__all__.extend(column_spec.__all__)
+__all__.extend(latex_table.__all__)
+__all__.extend(sampling.__all__)
+__all__.extend(archive.__all__)
+__all__.extend(fetch.__all__)
+__all__.extend(checkpoint.__all__)
+__all__.extend(progress.__all__)
+__all__.extend(entries.__all__)
+__all__.extend(cosmology.__all__)
+__all__.extend(interning.__all__)
+__all__.extend(delimited.__all__)
+__all__.extend(report.__all__)
+__all__.extend(memory.__all__)
+__all__.extend(repos.__all__)
+__all__.extend(retry.__all__)
+__all__.extend(references.__all__)
+__all__.extend(merge.__all__)
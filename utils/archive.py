@@ -0,0 +1,171 @@
+"""Single-file archives of cached web pages, indexed by URL.
+
+Tasks which load many web pages (e.g. one subpage per entry) would otherwise cache each page in
+its own file, and reopen each of those files in archived mode.  A `PageArchive` instead packs all
+of the pages for a source into a single zip file.  The zip central-directory is read once when the
+archive is opened, after which each page is found by its URL with a dictionary lookup and read
+with a single seek.
+
+Member names are a hash of the URL (so they do not depend on e.g. `clean_entry_name` output), and
+each member stores its URL and original cache filename in the member comment.
+
+"""
+import os
+import zipfile
+import hashlib
+
+__all__ = ["PageArchive"]
+
+
+class PageArchive:
+    """Zip file containing cached pages, retrievable by URL.
+
+    New and updated pages are kept in memory until `close()` (or leaving a `with` block), when
+    they are appended to the archive.  If any existing pages have been updated, the archive is
+    rewritten instead, as zip files cannot replace members in-place.
+
+    Arguments
+    ---------
+    path : str
+        Filename of the zip archive, it is created if it does not exist.
+    log : `logging.Logger` or None
+
+    """
+
+    _COMMENT_SEP = "\n"
+
+    def __init__(self, path, log=None):
+        self.path = os.path.abspath(path)
+        self.log = log
+        self._zip = None
+        self._index = {}
+        self._pending = {}
+        self._rewrite = False
+        if os.path.isfile(self.path):
+            self._zip = zipfile.ZipFile(self.path, 'r')
+            for info in self._zip.infolist():
+                url, fname = self._parse_comment(info)
+                if url is not None:
+                    self._index[url] = (info, fname)
+        return
+
+    def __repr__(self):
+        return "PageArchive('{}', pages={})".format(self.path, len(self))
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def __len__(self):
+        return len(set(self._index.keys()) | set(self._pending.keys()))
+
+    def __contains__(self, url):
+        return (url in self._pending) or (url in self._index)
+
+    def urls(self):
+        """Return a sorted list of the URLs of all pages in the archive.
+        """
+        return sorted(set(self._index.keys()) | set(self._pending.keys()))
+
+    def get(self, url, default=None):
+        """Return the text of the page for `url`, or `default` if it is not in the archive.
+        """
+        if url in self._pending:
+            return self._pending[url][0]
+        if url not in self._index:
+            return default
+        info, fname = self._index[url]
+        return self._zip.read(info).decode('utf8')
+
+    def filename(self, url):
+        """Return the original cache filename stored for `url` (or None).
+        """
+        if url in self._pending:
+            return self._pending[url][1]
+        if url in self._index:
+            return self._index[url][1]
+        return None
+
+    def put(self, url, text, fname=None):
+        """Add (or replace) the page for `url`.  Unchanged pages are not rewritten.
+        """
+        if url in self._index:
+            if self.get(url) == text:
+                return
+            self._rewrite = True
+        self._pending[url] = (text, fname)
+        return
+
+    def close(self):
+        """Write any new or updated pages to disk, and close the archive.
+        """
+        if len(self._pending):
+            if self._rewrite:
+                self._write_all()
+            else:
+                self._append()
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        self._pending = {}
+        self._index = {}
+        self._rewrite = False
+        return
+
+    def _append(self):
+        if self._zip is not None:
+            self._zip.close()
+            self._zip = None
+        base_path = os.path.dirname(self.path)
+        if not os.path.isdir(base_path):
+            os.makedirs(base_path)
+        with zipfile.ZipFile(self.path, 'a', compression=zipfile.ZIP_DEFLATED) as out:
+            for url, (text, fname) in sorted(self._pending.items()):
+                self._write_member(out, url, text, fname)
+        if self.log is not None:
+            self.log.debug("Added {} pages to '{}'".format(len(self._pending), self.path))
+        return
+
+    def _write_all(self):
+        # Read everything that is kept from the existing archive, then write to a new file
+        pages = {}
+        for url in self._index:
+            if url not in self._pending:
+                pages[url] = (self.get(url), self._index[url][1])
+        pages.update(self._pending)
+        self._zip.close()
+        self._zip = None
+
+        temp_path = self.path + '.tmp'
+        with zipfile.ZipFile(temp_path, 'w', compression=zipfile.ZIP_DEFLATED) as out:
+            for url, (text, fname) in sorted(pages.items()):
+                self._write_member(out, url, text, fname)
+        os.replace(temp_path, self.path)
+        if self.log is not None:
+            self.log.debug("Rewrote '{}' with {} pages".format(self.path, len(pages)))
+        return
+
+    @classmethod
+    def _write_member(cls, out, url, text, fname):
+        info = zipfile.ZipInfo(cls._member_name(url), date_time=(1980, 1, 1, 0, 0, 0))
+        info.compress_type = zipfile.ZIP_DEFLATED
+        info.comment = cls._COMMENT_SEP.join([url, fname or '']).encode('utf8')
+        out.writestr(info, text.encode('utf8'))
+        return
+
+    @classmethod
+    def _parse_comment(cls, info):
+        comment = info.comment.decode('utf8')
+        if cls._COMMENT_SEP not in comment:
+            return None, None
+        url, fname = comment.split(cls._COMMENT_SEP, 1)
+        return url, (fname if len(fname) else None)
+
+    @staticmethod
+    def _member_name(url):
+        """Stable member name for the given URL.
+        """
+        return hashlib.sha1(url.encode('utf8')).hexdigest() + '.txt'
@@ -0,0 +1,149 @@
+"""Durable checkpoints for long-running import tasks, to allow interrupted runs to be resumed.
+
+A task creates a `TaskCheckpoint`, periodically records its position in the input (a file offset
+and/or row number, along with any other state needed to continue), and calls
+`catalog.journal_entries()`.  Each time entries are journaled, the catalog then writes the
+checkpoint (see `BlackholeCatalog.journal_entries`), so that the checkpoint never claims more
+progress than has actually been saved.  Only the position and state are needed to resume (the
+entries themselves are reloaded from their journaled files), so each write is of constant size.
+
+When the catalog is run with `--resume`, a task finds the last checkpoint (if its fingerprint
+matches: same task, same input file, and same sampling arguments) and continues from there.
+Finished tasks are marked as complete, and are skipped entirely when resuming.
+
+Checkpoints are stored in 'output/checkpoints/<task-name>.json'.
+
+"""
+import os
+import json
+import hashlib
+
+__all__ = ["TaskCheckpoint"]
+
+
+class TaskCheckpoint:
+    """Position and state of the current task, written whenever entries are journaled.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+    input_fname : str or None
+        Input file read by this task, its size and modification time are included in the task
+        fingerprint.
+
+    """
+
+    _VERSION = 1
+
+    def __init__(self, catalog, input_fname=None):
+        self.catalog = catalog
+        self.log = catalog.log
+        task = catalog.current_task
+        self.task_name = task.name
+        self.path = os.path.join(catalog.PATHS.PATH_OUTPUT, 'checkpoints', self.task_name + '.json')
+        self.fingerprint = self._fingerprint(catalog, input_fname)
+
+        self.offset = None
+        self.row = None
+        self.state = {}
+        self.complete = False
+        # Whether this checkpoint was loaded from a previous run
+        self.resumed = False
+
+        if getattr(catalog.args, 'resume', False):
+            self._load()
+        elif os.path.exists(self.path):
+            os.remove(self.path)
+
+        # Register with the catalog so that this checkpoint is written on each journal
+        catalog.checkpoint = self
+        return
+
+    def __repr__(self):
+        return "TaskCheckpoint('{}', offset={}, row={}, complete={})".format(
+            self.task_name, self.offset, self.row, self.complete)
+
+    def update(self, offset=None, row=None, **state):
+        """Record the current position in the input, and any additional task state.
+
+        The position should be that just *after* the last row which has been fully processed.
+        """
+        self.offset = offset
+        self.row = row
+        self.state.update(state)
+        return
+
+    def finish(self):
+        """Mark the task as complete.  The checkpoint is written with the final journal.
+        """
+        self.complete = True
+        return
+
+    def journal(self):
+        """Write the checkpoint to disk, called by the catalog after entries have been journaled.
+        """
+        self.save()
+        if self.complete:
+            self.catalog.checkpoint = None
+        return
+
+    def save(self):
+        """Write the checkpoint to disk atomically.
+        """
+        data = {
+            'version': self._VERSION,
+            'task': self.task_name,
+            'fingerprint': self.fingerprint,
+            'offset': self.offset,
+            'row': self.row,
+            'state': self.state,
+            'complete': self.complete,
+        }
+
+        base_path = os.path.dirname(self.path)
+        if not os.path.isdir(base_path):
+            os.makedirs(base_path)
+        temp_path = self.path + '.tmp'
+        with open(temp_path, 'w') as out:
+            json.dump(data, out)
+            out.flush()
+            os.fsync(out.fileno())
+        os.replace(temp_path, self.path)
+        self.log.debug("Wrote checkpoint {}".format(self))
+        return
+
+    def _load(self):
+        if not os.path.exists(self.path):
+            self.log.info("No checkpoint found for '{}', starting from the beginning.".format(
+                self.task_name))
+            return
+
+        with open(self.path, 'r') as inp:
+            data = json.load(inp)
+
+        if (data.get('version') != self._VERSION) or (data.get('fingerprint') != self.fingerprint):
+            self.log.warning("Checkpoint '{}' does not match the current task, ignoring.".format(
+                self.path))
+            return
+
+        self.offset = data['offset']
+        self.row = data['row']
+        self.state = data['state']
+        self.complete = data['complete']
+        self.resumed = True
+        self.log.warning("Resuming from checkpoint {}".format(self))
+        return
+
+    @staticmethod
+    def _fingerprint(catalog, input_fname):
+        task = catalog.current_task
+        args = catalog.args
+        items = [task.name, task.module, task.function]
+        if input_fname is not None:
+            stat = os.stat(input_fname)
+            items += [os.path.abspath(input_fname), stat.st_size, int(stat.st_mtime)]
+        for arg in ['sample', 'sample_fraction', 'sample_seed', 'travis']:
+            items.append(getattr(args, arg, None))
+
+        val = json.dumps(items).encode('utf-8')
+        return hashlib.sha1(val).hexdigest()
@@ -0,0 +1,255 @@
+"""Declarative specifications for loading columns of tabular input data into entries.
+
+A `ColumnSpec` is a list of `Column` objects, each describing how a single input column maps onto
+an entry quantity, photometry point or alias.  The specification is 'compiled' once, when it is
+constructed, so that adding a row only involves a loop over pre-built keyword dictionaries.
+With `lazy=True`, `add_row` only keeps the (compact) row in the entry, and its values are added
+when the catalog materializes the entry, e.g. before journaling, or when one of the keys they
+change (`ColumnSpec.entry_keys`) is accessed (see `Blackhole.add_raw_row`).
+
+Example
+-------
+>>> SPEC = ColumnSpec([
+...     Column(3, BLACKHOLE.REDSHIFT),
+...     Column(17, BLACKHOLE.MASS, unit='log(M/Msol)', kind=BH_MASS_METHODS.VIR_HBETA),
+...     Column(6, PHOTOMETRY.LUMINOSITY, target=COLUMN_TARGET.PHOTOMETRY,
+...            unit='log (L/[erg/s])', refs={PHOTOMETRY.TIME: 9}),
+... ], num_columns=30, missing='9999')
+>>> SPEC.add_row(catalog.entries[name], row, source)
+
+"""
+from astrocats.catalog.struct import ENTRY, QUANTITY, PHOTOMETRY
+
+__all__ = ["COLUMN_TARGET", "Column", "ColumnSpec"]
+
+
+class COLUMN_TARGET:
+    QUANTITY = "quantity"
+    PHOTOMETRY = "photometry"
+    ALIAS = "alias"
+
+
+class Column:
+    """Specification for a single column of an input table.
+
+    Arguments
+    ---------
+    col : int
+        Index of this column in each row.
+    key : str
+        For `COLUMN_TARGET.QUANTITY`, the quantity to store (e.g. `BLACKHOLE.MASS`).
+        For `COLUMN_TARGET.PHOTOMETRY`, the photometry value key (e.g. `PHOTOMETRY.LUMINOSITY`).
+        Ignored for `COLUMN_TARGET.ALIAS`.
+    target : str
+        One of the `COLUMN_TARGET` values.
+    unit : str or None
+        Units of the value (`QUANTITY.U_VALUE` or `PHOTOMETRY.U_LUMINOSITY`).
+    desc : str or None
+        Description of the value.
+    kind : str or None
+        Kind of the quantity (`QUANTITY.KIND`), e.g. one of `BH_MASS_METHODS`.
+    cast : callable or None
+        Function applied to the (stripped) value before storing it.
+    missing : str, list of str, or None
+        Raw values which indicate that there is no measurement, in addition to empty strings and
+        the `missing` values of the parent `ColumnSpec`.
+    refs : dict or None
+        Additional fields taken from other columns of the same row, as `{field: col}`,
+        e.g. `{PHOTOMETRY.TIME: 9}`.  Referenced values which are missing are skipped.
+    extra : dict or None
+        Additional, constant fields.
+    source : dict or None
+        Keyword arguments for an additional source (`Entry.add_source`) to which this value is
+        attributed *instead of* the row source.
+
+    """
+
+    def __init__(self, col, key=None, target=COLUMN_TARGET.QUANTITY, unit=None, desc=None,
+                 kind=None, cast=None, missing=None, refs=None, extra=None, source=None):
+        if target not in [COLUMN_TARGET.QUANTITY, COLUMN_TARGET.PHOTOMETRY, COLUMN_TARGET.ALIAS]:
+            raise ValueError("Unrecognized column target '{}'!".format(target))
+        if (key is None) and (target != COLUMN_TARGET.ALIAS):
+            raise ValueError("`key` is required for target '{}'!".format(target))
+
+        self.col = col
+        self.key = key
+        self.target = target
+        self.unit = unit
+        self.desc = desc
+        self.kind = kind
+        self.cast = cast
+        self.missing = _to_set(missing)
+        self.refs = dict() if (refs is None) else dict(refs)
+        self.extra = dict() if (extra is None) else dict(extra)
+        self.source = source
+        return
+
+    def __repr__(self):
+        return "Column({}, '{}', target='{}')".format(self.col, self.key, self.target)
+
+    def static_kwargs(self):
+        """Construct the keyword-arguments which are the same for every row.
+        """
+        kwargs = {}
+        if self.target == COLUMN_TARGET.QUANTITY:
+            if self.unit is not None:
+                kwargs[QUANTITY.U_VALUE] = self.unit
+            if self.desc is not None:
+                kwargs[QUANTITY.DESCRIPTION] = self.desc
+            if self.kind is not None:
+                kwargs[QUANTITY.KIND] = self.kind
+        elif self.target == COLUMN_TARGET.PHOTOMETRY:
+            if self.unit is not None:
+                kwargs[PHOTOMETRY.U_LUMINOSITY] = self.unit
+            if self.desc is not None:
+                kwargs[PHOTOMETRY.DESCRIPTION] = self.desc
+
+        kwargs.update(self.extra)
+        return kwargs
+
+
+class ColumnSpec:
+    """Collection of `Column` specifications describing a full input table.
+
+    Arguments
+    ---------
+    columns : list of `Column`
+    num_columns : int or None
+        If given, rows with a different number of columns are rejected by `check_row`.
+    missing : str, list of str, or None
+        Raw values indicating missing measurements in *any* column (e.g. '9999' or '...').
+        Empty strings are always treated as missing.
+    strip : bool
+        Strip whitespace from every value before it is used.
+
+    """
+
+    def __init__(self, columns, num_columns=None, missing=None, strip=True):
+        self.columns = list(columns)
+        self.num_columns = num_columns
+        self.missing = _to_set(missing)
+        self.missing.add('')
+        self.strip = strip
+        self.max_col = max(cc.col for cc in self.columns) if len(self.columns) else -1
+        for cc in self.columns:
+            refs = list(cc.refs.values())
+            self.max_col = max([self.max_col] + refs)
+
+        # Compile each column into a tuple of everything needed for each row
+        self._compiled = [self._compile(cc) for cc in self.columns]
+        # Aliases are needed to identify entries, so they can't be added later (see `add_row`)
+        self._deferrable = all(cc.target != COLUMN_TARGET.ALIAS for cc in self.columns)
+        # Keys of the entry which are changed by adding a row
+        self.entry_keys = frozenset(self._entry_key(cc) for cc in self.columns)
+        if any(cc.source is not None for cc in self.columns):
+            self.entry_keys |= {ENTRY.SOURCES}
+        return
+
+    def __len__(self):
+        return len(self.columns)
+
+    def __iter__(self):
+        return iter(self.columns)
+
+    @staticmethod
+    def _entry_key(column):
+        if column.target == COLUMN_TARGET.QUANTITY:
+            return column.key
+        if column.target == COLUMN_TARGET.PHOTOMETRY:
+            return ENTRY.PHOTOMETRY
+        return ENTRY.ALIAS
+
+    def _compile(self, column):
+        missing = frozenset(self.missing | column.missing)
+        refs = tuple(column.refs.items())
+        return (column.col, column.target, column.key, column.static_kwargs(), column.cast,
+                missing, refs, column.source)
+
+    def check_row(self, row):
+        """Return True if the given row has the expected number of columns.
+        """
+        if self.num_columns is not None:
+            return len(row) == self.num_columns
+        return len(row) > self.max_col
+
+    def prepare_row(self, row):
+        """Return the row with stripped values (if `strip`), otherwise unchanged.
+        """
+        if self.strip:
+            return [rr.strip() for rr in row]
+        return row
+
+    def add_row(self, entry, row, source, prepared=False, lazy=False):
+        """Add all of the values in `row` to the given `entry` attributed to `source`.
+
+        Arguments
+        ---------
+        entry : `Blackhole`
+        row : list of str
+        source : str
+            Source alias (or comma-separated aliases) for all values in this row.
+        prepared : bool
+            Whether `prepare_row` has already been applied to `row`.
+        lazy : bool
+            Keep the row in the entry, and only add its values once the entry is materialized
+            (see `Blackhole.add_raw_row`).  Ignored if there are alias columns.
+
+        Returns
+        -------
+        num : int or None
+            Number of (non-missing) values that were added, None if the row was kept.
+
+        """
+        if not prepared:
+            row = self.prepare_row(row)
+
+        if lazy and self._deferrable:
+            entry.add_raw_row(self, row, source)
+            return None
+
+        num = 0
+        extra_sources = {}
+        for col, target, key, static, cast, missing, refs, col_source in self._compiled:
+            val = row[col]
+            if val in missing:
+                continue
+
+            if cast is not None:
+                val = cast(val)
+
+            src = source
+            if col_source is not None:
+                src_key = id(col_source)
+                if src_key not in extra_sources:
+                    extra_sources[src_key] = entry.add_source(**col_source)
+                src = extra_sources[src_key]
+
+            if target == COLUMN_TARGET.ALIAS:
+                entry.add_alias(val, src)
+                num += 1
+                continue
+
+            kwargs = dict(static)
+            for field, ref in refs:
+                ref_val = row[ref]
+                if ref_val not in missing:
+                    kwargs[field] = ref_val
+
+            if target == COLUMN_TARGET.QUANTITY:
+                entry.add_quantity(key, val, src, **kwargs)
+            else:
+                kwargs[key] = val
+                kwargs[PHOTOMETRY.SOURCE] = src
+                entry.add_photometry(**kwargs)
+
+            num += 1
+
+        return num
+
+
+def _to_set(vals):
+    if vals is None:
+        return set()
+    if isinstance(vals, str):
+        return set([vals])
+    return set(vals)
@@ -0,0 +1,84 @@
+"""Cosmological distances from a cached interpolation table.
+
+Instead of integrating the distance for each object, the comoving distance is tabulated once on a
+grid in `log(1+z)` (for the cosmology in `constants.COSMOLOGY`), saved to disk, and all distances
+are then computed by (vectorized) interpolation.
+
+"""
+import os
+import json
+import hashlib
+
+import numpy as np
+
+from astrocats.blackholes.constants import COSMOLOGY, SPLC_KMS
+
+__all__ = ["CosmoDistances"]
+
+
+class CosmoDistances:
+    """Interpolation table of cosmological distances for a flat LCDM cosmology.
+
+    Arguments
+    ---------
+    cache_dir : str or None
+        Directory in which the table is cached.  If None, the table is not saved.
+    log : `logging.Logger` or None
+
+    """
+
+    def __init__(self, cache_dir=None, log=None, h0=COSMOLOGY.H0, omega_m=COSMOLOGY.OMEGA_M,
+                 omega_l=COSMOLOGY.OMEGA_L, z_max=COSMOLOGY.Z_MAX, num=COSMOLOGY.NUM_POINTS):
+        self.params = dict(h0=h0, omega_m=omega_m, omega_l=omega_l, z_max=z_max, num=num)
+        self.log = log
+
+        fname = None
+        if cache_dir is not None:
+            key = hashlib.sha1(json.dumps(self.params, sort_keys=True).encode('utf-8'))
+            fname = os.path.join(cache_dir, "cosmo-distances_{}.npz".format(key.hexdigest()[:12]))
+
+        if (fname is not None) and os.path.exists(fname):
+            data = np.load(fname)
+            self._lzp1 = data['lzp1']
+            self._dist_com = data['dist_com']
+            self._debug("Loaded distance table from '{}'".format(fname))
+        else:
+            self._lzp1, self._dist_com = self._calculate(**self.params)
+            if fname is not None:
+                if not os.path.isdir(cache_dir):
+                    os.makedirs(cache_dir)
+                np.savez(fname, lzp1=self._lzp1, dist_com=self._dist_com)
+                self._debug("Saved distance table to '{}'".format(fname))
+
+        return
+
+    def dist_com(self, redz):
+        """Comoving distance [Mpc] at the given redshift(s).
+        """
+        redz = np.asarray(redz, dtype=float)
+        if np.any(redz > self.params['z_max']) or np.any(redz < 0.0):
+            raise ValueError("Redshifts must be in [0.0, {}]!".format(self.params['z_max']))
+        return np.interp(np.log1p(redz), self._lzp1, self._dist_com)
+
+    def dist_lum(self, redz):
+        """Luminosity distance [Mpc] at the given redshift(s).
+        """
+        redz = np.asarray(redz, dtype=float)
+        return (1.0 + redz) * self.dist_com(redz)
+
+    @staticmethod
+    def _calculate(h0, omega_m, omega_l, z_max, num):
+        lzp1 = np.linspace(0.0, np.log1p(z_max), num)
+        zp1 = np.exp(lzp1)
+        efunc = np.sqrt(omega_m * zp1**3 + omega_l)
+        # Integrate `dz / E(z)` as `(1+z) dlog(1+z) / E(z)` with the trapezoid rule
+        integrand = zp1 / efunc
+        dlz = np.diff(lzp1)
+        cum = np.concatenate([[0.0], np.cumsum(0.5 * (integrand[1:] + integrand[:-1]) * dlz)])
+        dist_com = (SPLC_KMS / h0) * cum
+        return lzp1, dist_com
+
+    def _debug(self, msg):
+        if self.log is not None:
+            self.log.debug(msg)
+        return
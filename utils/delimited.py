@@ -0,0 +1,155 @@
+"""Chunked, multi-process reading of large delimited (e.g. '|'-separated VizieR) tables.
+
+The input file is split on line boundaries into byte-range chunks.  Each chunk is read, split into
+rows and normalized (by an optional, picklable `func`) in a worker process, and returned as a
+compact batch.  Batches are streamed back to the main process *in file order*, where the task
+adds entries as usual, e.g.
+
+>>> for offset, line_num, row in iter_delimited_rows(fname, delimiter='|', func=_prepare_row):
+...     name = _add_entry_for_data_line(catalog, row)
+
+The file offset (end of the line) and line number of each row are also returned, so that tasks
+can checkpoint their position and resume from it (with the `start` argument).  At most a few
+chunks per worker are in flight at a time, so memory use does not grow with the file size.
+
+"""
+import os
+import csv
+from array import array
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+
+__all__ = ["DEFAULT_CHUNK_BYTES", "iter_delimited_rows", "split_chunks"]
+
+# Size of each chunk read by a worker process
+DEFAULT_CHUNK_BYTES = 4 * 1024**2
+# Number of chunks submitted ahead of the one being consumed, per worker process
+_CHUNKS_PER_WORKER = 2
+
+
+def split_chunks(fname, start=0, chunk_bytes=DEFAULT_CHUNK_BYTES):
+    """Split the file (from byte `start`) into `(begin, end)` byte ranges ending on line boundaries.
+    """
+    size = os.path.getsize(fname)
+    chunks = []
+    with open(fname, 'rb') as data:
+        beg = start
+        while beg < size:
+            end = beg + chunk_bytes
+            if end >= size:
+                end = size
+            else:
+                # Extend the chunk to the end of the line containing its last byte
+                data.seek(end - 1)
+                data.readline()
+                end = data.tell()
+            chunks.append((beg, end))
+            beg = end
+
+    return chunks
+
+
+def iter_delimited_rows(fname, delimiter=',', start=0, func=None, processes=None,
+                        chunk_bytes=DEFAULT_CHUNK_BYTES, comment='#', encoding='utf-8'):
+    """Yield the rows of a delimited file in order, parsed in parallel.
+
+    Empty lines, and lines whose first value starts with `comment`, are skipped.
+
+    Arguments
+    ---------
+    fname : str
+    delimiter : str
+    start : int
+        Byte offset at which to start reading (must be the start of a line).
+    func : callable or None
+        Function applied to each row (list of str) in the worker processes, returning the
+        normalized row, or None to skip it.  Must be picklable (i.e. a module-level function).
+    processes : int or None
+        Number of worker processes, by default the number of CPUs.  With 1 (or a single chunk),
+        the file is read in this process.
+    chunk_bytes : int
+    comment : str or None
+    encoding : str
+
+    Yields
+    ------
+    offset : int
+        Byte offset of the end of this row's line (i.e. where to `start` to continue after it).
+    line_num : int
+        Line number of this row, counting from 1 at `start`.
+    row : list of str, or the return value of `func`
+
+    """
+    chunks = split_chunks(fname, start=start, chunk_bytes=chunk_bytes)
+    if processes is None:
+        processes = os.cpu_count() or 1
+    processes = max(min(processes, len(chunks)), 1)
+
+    args = (fname, delimiter, func, comment, encoding)
+    if processes == 1:
+        batches = (_parse_chunk(beg, end, *args) for beg, end in chunks)
+    else:
+        batches = _iter_parallel(chunks, args, processes)
+
+    line_base = 0
+    for num_lines, offsets, line_nums, rows in batches:
+        for off, ll, row in zip(offsets, line_nums, rows):
+            yield off, line_base + ll, row
+        line_base += num_lines
+
+    return
+
+
+def _iter_parallel(chunks, args, processes):
+    """Parse chunks in worker processes, and yield their batches in order.
+    """
+    chunks = deque(chunks)
+    pending = deque()
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        try:
+            while len(chunks) or len(pending):
+                while len(chunks) and (len(pending) < processes * _CHUNKS_PER_WORKER):
+                    beg, end = chunks.popleft()
+                    pending.append(pool.submit(_parse_chunk, beg, end, *args))
+
+                yield pending.popleft().result()
+        finally:
+            # e.g. if the consumer stops early, don't parse the rest of the file
+            for fut in pending:
+                fut.cancel()
+
+    return
+
+
+def _parse_chunk(beg, end, fname, delimiter, func, comment, encoding):
+    """Parse the lines in byte range [`beg`, `end`) of the file into a compact batch of rows.
+
+    Returns `(num_lines, offsets, line_nums, rows)`, where `line_nums` are relative to `beg`.
+    """
+    offsets = array('q')
+    line_nums = array('l')
+    rows = []
+    num_lines = 0
+    pos = beg
+    with open(fname, 'rb') as data:
+        data.seek(beg)
+        while pos < end:
+            line = data.readline()
+            if not len(line):
+                break
+            num_lines += 1
+            pos += len(line)
+
+            row = next(csv.reader([line.decode(encoding)], delimiter=delimiter), [])
+            if len(row) == 0 or ((comment is not None) and row[0].startswith(comment)):
+                continue
+            if func is not None:
+                row = func(row)
+                if row is None:
+                    continue
+
+            offsets.append(pos)
+            line_nums.append(num_lines)
+            rows.append(row)
+
+    return num_lines, offsets, line_nums, rows
@@ -0,0 +1,40 @@
+"""Helpers for (meta) tasks which operate on all entries in the catalog.
+"""
+from .progress import task_progress
+
+__all__ = ["iter_entry_chunks", "first_float"]
+
+
+def iter_entry_chunks(catalog, chunk_size=1000):
+    """Load all entries in chunks, yielding the list of (loaded) entry names in each chunk.
+
+    Entries are journaled after each chunk is processed, so that only `chunk_size` entries are
+    loaded at a time.
+    """
+    if len(catalog.entries) == 0:
+        catalog.log.error("WARNING: `entries` is empty, loading stubs")
+        catalog.load_stubs()
+
+    names = list(catalog.entries.keys())
+    with task_progress(catalog, total=len(names), unit='entries') as progress:
+        for ii in range(0, len(names), chunk_size):
+            chunk = [catalog.add_entry(nn) for nn in names[ii:ii+chunk_size]]
+            yield chunk
+            progress.update(len(chunk))
+            catalog.journal_entries()
+
+    return
+
+
+def first_float(values, key):
+    """Return `(float(value), item)` for the first element of `values` with a numeric `key`.
+
+    Returns `(None, None)` if there are none.
+    """
+    for item in values:
+        try:
+            return float(item[key]), item
+        except (KeyError, TypeError, ValueError):
+            continue
+
+    return None, None
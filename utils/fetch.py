@@ -0,0 +1,299 @@
+"""Concurrent (asyncio based) downloading of URLs, for tasks which load many web pages.
+
+`AsyncFetcher.iter_fetch` takes a batch of `(url, fname)` pairs and yields a `FetchResult` for
+each of them *as they complete*, while the remaining downloads continue in the background.  The
+number of simultaneous requests is bounded both in total and per host.  Closing the iterator
+(e.g. `break`ing out of the loop, or an exception in the consumer) cancels outstanding requests.
+
+`fetch_to_cache` wraps this with the same caching behavior as `Catalog.load_url`: cached files
+in the current task's repository are used in archived mode, successful downloads are written to
+the cache, and failed downloads fall back to the cached copy.  Cached pages can optionally be
+stored in a single `PageArchive` instead of individual files.
+
+`aiohttp` is used if it is installed, otherwise each request is made with `request_url_text`
+in a worker thread.  If given a `RemoteInputs` (`fetch_to_cache` uses the catalog's), failed
+requests are retried with backoff, and requests to hosts whose circuit breaker is open are skipped,
+so that their cached copies are used instead (see `utils.retry`).
+
+"""
+import os
+import queue
+import asyncio
+import threading
+import functools
+from collections import namedtuple
+from urllib.parse import urlparse
+
+from .input_data import request_url_text
+from .archive import PageArchive
+from .retry import CircuitOpenError
+
+__all__ = ["FetchResult", "AsyncFetcher", "fetch_to_cache"]
+
+FetchResult = namedtuple("FetchResult", ["url", "fname", "text", "error", "cached"])
+
+_DONE = object()
+
+
+class AsyncFetcher:
+    """Download batches of URLs concurrently.
+
+    Arguments
+    ---------
+    log : `logging.Logger` or None
+    concurrency : int
+        Maximum number of simultaneous requests.
+    per_host : int
+        Maximum number of simultaneous requests to any single host.
+    timeout : float
+        Time (in seconds) after which each request is abandoned.
+    remote : `utils.RemoteInputs` or None
+        Retry policies and circuit breakers.  If None, each request is made only once.
+
+    """
+
+    def __init__(self, log=None, concurrency=8, per_host=4, timeout=120, remote=None):
+        self.log = log
+        self.concurrency = concurrency
+        self.per_host = per_host
+        self.timeout = timeout
+        self.remote = remote
+        return
+
+    def iter_fetch(self, requests):
+        """Download each `(url, fname)` pair, yielding `FetchResult`s in order of completion.
+
+        `fname` is not used here except to identify the request in the returned `FetchResult`.
+        """
+        requests = [tuple(rr) for rr in requests]
+        if not len(requests):
+            return
+
+        out = queue.Queue()
+        state = {}
+
+        # Run the event-loop in a separate thread so that results can be consumed synchronously
+        def runner():
+            loop = asyncio.new_event_loop()
+            state['loop'] = loop
+            try:
+                state['task'] = loop.create_task(self._run(requests, out))
+                loop.run_until_complete(state['task'])
+            except asyncio.CancelledError:
+                pass
+            finally:
+                loop.close()
+                out.put(_DONE)
+            return
+
+        thread = threading.Thread(target=runner, daemon=True)
+        thread.start()
+        try:
+            while True:
+                item = out.get()
+                if item is _DONE:
+                    break
+                yield item
+        finally:
+            # Cancel anything still running if the consumer stopped early
+            loop = state.get('loop')
+            task = state.get('task')
+            if thread.is_alive() and (loop is not None) and (task is not None):
+                try:
+                    loop.call_soon_threadsafe(task.cancel)
+                except RuntimeError:
+                    # The loop has closed in the meantime, i.e. all requests are finished
+                    pass
+            thread.join()
+
+        return
+
+    async def _run(self, requests, out):
+        total_sem = asyncio.Semaphore(self.concurrency)
+        host_sems = {}
+        for url, fname in requests:
+            host = urlparse(url).netloc
+            if host not in host_sems:
+                host_sems[host] = asyncio.Semaphore(self.per_host)
+
+        session = None
+        try:
+            import aiohttp
+            timeout = aiohttp.ClientTimeout(total=self.timeout)
+            session = aiohttp.ClientSession(timeout=timeout)
+        except ImportError:
+            pass
+
+        tasks = [
+            asyncio.ensure_future(self._fetch_one(
+                session, url, fname, total_sem, host_sems[urlparse(url).netloc]))
+            for url, fname in requests
+        ]
+        try:
+            for fut in asyncio.as_completed(tasks):
+                out.put(await fut)
+        finally:
+            for tt in tasks:
+                tt.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+            if session is not None:
+                await session.close()
+
+        return
+
+    async def _fetch_one(self, session, url, fname, total_sem, host_sem):
+        text = None
+        error = None
+        attempt = 0
+        while True:
+            try:
+                async with host_sem:
+                    # Checked once a slot is free, as the breaker may have opened while waiting
+                    if self.remote is not None:
+                        self.remote.check(url)
+                    async with total_sem:
+                        text = await self._get(session, url)
+                if self.remote is not None:
+                    self.remote.record_success(url)
+                break
+            except asyncio.CancelledError:
+                raise
+            except Exception as err:
+                delay = None
+                if (self.remote is not None) and not isinstance(err, CircuitOpenError):
+                    delay = self.remote.next_delay(url, attempt, err)
+                if delay is not None:
+                    # Wait without holding the semaphores, so that other requests continue
+                    await asyncio.sleep(delay)
+                    attempt += 1
+                    continue
+
+                error = err
+                if self.log is not None:
+                    # Skipped requests are expected once the host's circuit breaker is open
+                    log_func = self.log.warning
+                    if isinstance(err, CircuitOpenError):
+                        log_func = self.log.debug
+                    log_func("Download of '{}' failed: '{}'".format(url, str(err)))
+                break
+
+        return FetchResult(url, fname, text, error, False)
+
+    async def _get(self, session, url):
+        timeout = self.timeout
+        connect = None
+        if self.remote is not None:
+            policy = self.remote.policy(url)
+            timeout = min(timeout, policy.read_timeout)
+            connect = policy.connect_timeout
+
+        if session is not None:
+            import aiohttp
+            timeout = aiohttp.ClientTimeout(
+                total=self.timeout, sock_connect=connect, sock_read=timeout)
+            async with session.get(url, timeout=timeout) as response:
+                response.raise_for_status()
+                return await response.text()
+
+        loop = asyncio.get_running_loop()
+        func = functools.partial(request_url_text, url, protect=False, timeout=timeout)
+        return await loop.run_in_executor(None, func)
+
+
+def fetch_to_cache(catalog, requests, repo=None, write=True, archive=None, **kwargs):
+    """Load each `(url, fname)` pair from cache or the web, yielding results as they complete.
+
+    The cached-file behavior follows `Catalog.load_url`, with `fname` relative to the current
+    task's repository (or `repo` if given).  If `archive` is given, it is the filename (again
+    relative to the repository) of a `PageArchive` which is used for cached pages instead of the
+    individual `fname` files.  Individual files are still read if a page is missing from the
+    archive, so that existing caches are migrated into the archive.  Additional `kwargs` are
+    passed to `AsyncFetcher`; by default it uses the catalog's `remote` (`utils.RemoteInputs`).
+
+    Yields
+    ------
+    result : `FetchResult`
+        `result.text` is None if both the download and the cached file failed, and
+        `result.cached` is True if the text was loaded from the cached file.
+
+    """
+    log = catalog.log
+    if repo is None:
+        repo = catalog.get_current_task_repo()
+
+    archived_mode = catalog.args.archived
+    archived_task = catalog.current_task.archived
+    update_mode = catalog.args.update
+    use_cache = archived_mode or (archived_task and not update_mode)
+
+    pages = None
+    if archive is not None:
+        pages = PageArchive(os.path.join(repo, archive), log=log)
+
+    def load_cached(url, fname):
+        if pages is not None and url in pages:
+            return pages.get(url)
+        cached_path = os.path.join(repo, fname)
+        if os.path.isfile(cached_path):
+            text = _read_cache(cached_path)
+            if (pages is not None) and write:
+                pages.put(url, text, fname)
+            return text
+        return None
+
+    def save_cached(url, fname, text):
+        if pages is not None:
+            pages.put(url, text, fname)
+        else:
+            cached_path = os.path.join(repo, fname)
+            _write_cache(text, cached_path)
+            log.debug("Wrote '{}' to '{}'.".format(url, cached_path))
+        return
+
+    try:
+        # In archived mode, return cached files immediately; only download those that are missing
+        downloads = []
+        for url, fname in requests:
+            text = load_cached(url, fname) if use_cache else None
+            if text is not None:
+                yield FetchResult(url, fname, text, None, True)
+            else:
+                downloads.append((url, fname))
+
+        kwargs.setdefault('log', log)
+        kwargs.setdefault('remote', getattr(catalog, 'remote', None))
+        fetcher = AsyncFetcher(**kwargs)
+        for result in fetcher.iter_fetch(downloads):
+            if result.text is None:
+                text = load_cached(result.url, result.fname)
+                if text is not None:
+                    log.warning("URL download failed, using cached data for '{}'.".format(
+                        result.fname))
+                    result = result._replace(text=text, cached=True)
+                else:
+                    log.error("Both url and file retrieval failed for '{}'!".format(result.url))
+            elif write:
+                save_cached(result.url, result.fname, result.text)
+
+            yield result
+
+    finally:
+        if pages is not None:
+            pages.close()
+
+    return
+
+
+def _read_cache(path):
+    with open(path, 'r', encoding='utf8') as infile:
+        return infile.read()
+
+
+def _write_cache(text, path):
+    path = os.path.abspath(path)
+    base_path = os.path.dirname(path)
+    if not os.path.isdir(base_path):
+        os.makedirs(base_path)
+    with open(path, 'w', encoding='utf8') as outfile:
+        outfile.write(text)
+    return
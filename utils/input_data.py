@@ -1,5 +1,11 @@
 """Functions for processing input files and data sources.
 """
+import os
+
+__all__ = ["load_cached_or_download", "request_url_text"]
+
+# Time allowed to establish a connection [seconds], see `utils.retry` for requests with retries
+_CONNECT_TIMEOUT = 10.0
 
 
 def load_cached_or_download(url, fname, log, refresh=False, write=True):
@@ -14,17 +20,42 @@ def load_cached_or_download(url, fname, log, refresh=False, write=True):
 
     #
     if refresh or _refresh:
+        text = request_url_text(url, log=log)
+        if text is not None:
+            if write:
+                with open(fname, 'w') as out:
+                    out.write(text)
+                log.debug("Saved '{}' to '{}'".format(url, fname))
+            return text
+
+        # If the download failed, fall back to an existing copy (if there is one)
+        if _refresh:
+            log.error("Failed to download '{}', no cached copy at '{}'".format(url, fname))
+            return None
+
+        log.warning("Failed to refresh '{}', using cached copy '{}'".format(url, fname))
 
+    with open(fname, 'r') as inp:
+        text = inp.read()
 
-def request_url_text(url, log=None, protect=True, timeout=120, raise_errors=[500, 307, 404]):
+    return text
+
+
+def request_url_text(url, log=None, protect=True, timeout=120, raise_errors=[500, 307, 404],
+                     remote=None):
     """Load text from given URL.
+
+    If `remote` (`utils.RemoteInputs`) is given, it is used to make the request, with retries.
     """
     url_text = None
     # Try to download text from URL
     try:
+        if remote is not None:
+            return remote.request(url, timeout=timeout)
+
         import requests
         session = requests.Session()
-        response = session.get(url, timeout=timeout)
+        response = session.get(url, timeout=(min(_CONNECT_TIMEOUT, timeout), timeout))
         response.raise_for_status()
         # Look for errors
         for xx in response.history:
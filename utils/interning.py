@@ -0,0 +1,74 @@
+"""Interning of repeated (low-cardinality) strings in quantities and photometry.
+
+Tasks construct the same units, descriptions, kinds and bands again for every row (e.g. Shen+2008
+adds 'log(M/Msol)' and "Virial mass estimated using H-Beta (5100 A)" for each of ~77k quasars).
+`StringInterner` replaces each such value with a single, shared (`sys.intern`-ed) instance before
+it is stored in an entry, and keeps track of how much memory this saves.
+
+"""
+import sys
+
+from astrocats.catalog.struct import QUANTITY, PHOTOMETRY
+
+__all__ = ["INTERN_KEYS", "StringInterner"]
+
+# Keys of quantities and photometry whose values are interned
+INTERN_KEYS = frozenset([
+    QUANTITY.SOURCE, QUANTITY.U_VALUE, QUANTITY.DESCRIPTION, QUANTITY.KIND,
+    PHOTOMETRY.BAND, PHOTOMETRY.U_LUMINOSITY, PHOTOMETRY.U_TIME, PHOTOMETRY.U_WAVELENGTH,
+    PHOTOMETRY.WAVELENGTH, PHOTOMETRY.TELESCOPE, PHOTOMETRY.INSTRUMENT, PHOTOMETRY.SYSTEM,
+])
+
+# Strings longer than this are assumed to be unique, and are not interned
+_MAX_LENGTH = 512
+
+
+class StringInterner:
+    """Intern the values of low-cardinality fields, and record the resulting memory savings.
+
+    Arguments
+    ---------
+    keys : iterable of str
+        Keys whose values are interned.
+
+    """
+
+    def __init__(self, keys=INTERN_KEYS):
+        self.keys = frozenset(keys)
+        # Number of strings seen, and the number (and size in bytes) which were duplicates
+        self.num_seen = 0
+        self.num_dupes = 0
+        self.bytes_saved = 0
+        self._unique = set()
+        return
+
+    def intern(self, value):
+        """Return the shared instance of `value` (a str, or list of str).
+        """
+        if isinstance(value, list):
+            return [self.intern(vv) for vv in value]
+        if (type(value) is not str) or (len(value) > _MAX_LENGTH):
+            return value
+
+        self.num_seen += 1
+        shared = sys.intern(value)
+        # Only separately allocated copies are savings (not e.g. re-used string constants)
+        if shared is not value:
+            self.num_dupes += 1
+            self.bytes_saved += sys.getsizeof(value)
+        self._unique.add(shared)
+        return shared
+
+    def intern_kwargs(self, kwargs):
+        """Intern the values of all `keys` in the given dictionary (in place), and return it.
+        """
+        for key in self.keys.intersection(kwargs):
+            kwargs[key] = self.intern(kwargs[key])
+        return kwargs
+
+    def report(self):
+        """Return a one-line summary of the interned strings and memory saved.
+        """
+        return ("Interned strings: {} seen, {} unique, {} duplicates; "
+                "{:.2f} MB saved").format(self.num_seen, len(self._unique), self.num_dupes,
+                                          self.bytes_saved / 1024**2)
@@ -0,0 +1,301 @@
+"""Streaming parser for tables in LaTeX (and plain ASCII '&'-delimited) format.
+
+Tables copied from papers are parsed one row at a time, without constructing an intermediate
+table object.  Both `tabular` style tables (rows ended by a double backslash) and AASTeX
+`deluxetable` style tables (data between 'startdata' and 'enddata' commands) are supported.
+
+Rows are marked as header rows until the first horizontal rule (e.g. '\\hline' or '\\midrule')
+following them, all rows of a `deluxetable` body are data, and `header_rows` sets the number of
+header rows explicitly (e.g. for tables without rules).  As rows cannot be classified
+retroactively, a table in which no row follows the header raises a `ValueError`, instead of
+silently producing no data.  The number of columns declared in the table's column
+specification (e.g. 'lcc' in '\\begin{tabular}{lcc}') is available as `LatexTable.num_columns`, to
+check the width of each row against.
+
+Example
+-------
+>>> with open(fname, 'r') as data:
+...     table = LatexTable(data)
+...     for cells, header in table:
+...         if header or (len(cells) != table.num_columns):
+...             continue
+...         val, err_lo, err_hi = split_value_error(cells[1])
+
+"""
+import re
+
+__all__ = ["LatexTable", "iter_latex_table", "count_latex_columns", "clean_latex_cell",
+           "split_value_error"]
+
+# Lines which only draw horizontal rules (these separate the header from the data)
+_RULE_COMMANDS = ["\\hline", "\\toprule", "\\midrule", "\\bottomrule", "\\cline"]
+# Markers for the start and end of the table body
+_BEGIN_MARKERS = ["\\begin{tabular", "\\startdata"]
+_END_MARKERS = ["\\end{tabular", "\\enddata"]
+
+_RE_COMMENT = re.compile(r'(?<!\\)%.*$')
+_RE_MULTICOL = re.compile(r'\\multicolumn\{[^}]*\}\{[^}]*\}\{(.*)\}')
+_RE_TEXT_CMD = re.compile(r'\\(?:textbf|textit|textrm|mathrm|rm|bf|it|emph|text)\{([^}]*)\}')
+_RE_ASYM_ERR = re.compile(r'^(.*?)\^\{?\+([^}_]*)\}?_\{?-([^}]*)\}?$')
+_RE_SYM_ERR = re.compile(r'^(.*?)(?:\\pm|±)(.*)$')
+# Environments with a column specification, e.g. '\begin{tabular*}{\textwidth}{lcc}'
+_RE_BEGIN_ENV = re.compile(r'^\\begin\{(tabular\*?|tabularx|deluxetable\*?)\}')
+
+# Values used in tables to indicate that there is no data
+MISSING_VALUES = ['', '-', '--', '...', '\\ldots', '\\nodata', 'nan']
+
+
+class LatexTable:
+    """Rows of a LaTeX table, parsed one at a time while iterating.
+
+    Iterating yields `(cells, header)` for each row: the list of (str) cells, and whether the
+    row is part of the column headers.
+
+    Arguments
+    ---------
+    lines : iterable of str
+        Lines of text, e.g. an open file handle.
+    clean : bool
+        Remove LaTeX formatting from each cell (see `clean_latex_cell`).
+    header_rows : int or None
+        Number of header rows at the start of each `tabular`.  By default, the header ends at the
+        first horizontal rule following at least one row.
+
+    Attributes
+    ----------
+    num_columns : int or None
+        Number of columns declared by the column specification of the current table, or None if
+        there is none (e.g. for plain '&'-delimited text).
+    num_data_rows : int
+        Number of data (i.e. non-header) rows so far.
+
+    """
+
+    def __init__(self, lines, clean=True, header_rows=None):
+        self._lines = lines
+        self.clean = clean
+        self.header_rows = header_rows
+        self.num_columns = None
+        self.num_data_rows = 0
+        return
+
+    def __iter__(self):
+        in_body = False
+        has_markers = False
+        header = True
+        # Rows, and data rows, in the body of the current table
+        body_rows = 0
+        body_data = 0
+        buffer = ''
+        for line in self._lines:
+            line = _RE_COMMENT.sub('', line).strip()
+            if not len(line):
+                continue
+
+            match = _RE_BEGIN_ENV.match(line)
+            if match is not None:
+                self.num_columns = _column_spec_count(match.group(1), line[match.end():])
+
+            if any(line.startswith(mm) for mm in _BEGIN_MARKERS):
+                has_markers = True
+                in_body = True
+                body_rows = 0
+                body_data = 0
+                # Everything after '\startdata' is data
+                header = not line.startswith("\\startdata")
+                continue
+
+            if any(line.startswith(mm) for mm in _END_MARKERS):
+                in_body = False
+                # The last row of a 'deluxetable' is not ended by '\\'
+                if '&' in buffer:
+                    body_rows += 1
+                    body_data += (not header)
+                    yield self._row(buffer, header)
+                buffer = ''
+                self._check_body(body_rows, body_data)
+                continue
+
+            # `deluxetable` column headers
+            if line.startswith("\\tablehead"):
+                cells = re.findall(r'\\colhead\{([^}]*)\}', line)
+                if self.clean:
+                    cells = [clean_latex_cell(cc) for cc in cells]
+                yield cells, True
+                continue
+
+            if has_markers and not in_body:
+                continue
+
+            if any(line.startswith(rr) for rr in _RULE_COMMANDS):
+                # The first rule *after* at least one row marks the end of the header
+                if (body_rows > 0) and (self.header_rows is None):
+                    header = False
+                continue
+
+            # Other commands (e.g. '\caption', '\label') are not data, but rows starting with a
+            # command (e.g. '\multicolumn') are
+            if line.startswith("\\") and ('&' not in line) and not line.endswith('\\\\'):
+                continue
+
+            # Rows may be split across multiple lines, only yield complete rows
+            buffer += ' ' + line
+            if not buffer.endswith('\\\\'):
+                continue
+
+            if self.header_rows is not None:
+                header = header and (body_rows < self.header_rows)
+            body_rows += 1
+            body_data += (not header)
+            yield self._row(buffer, header)
+            buffer = ''
+
+        if not has_markers:
+            self._check_body(body_rows, body_data)
+        return
+
+    def _row(self, buffer, header):
+        if not header:
+            self.num_data_rows += 1
+        return _split_row(buffer, self.clean), header
+
+    def _check_body(self, num_rows, num_data):
+        """Raise an error if a table has rows, but none of them follow the header.
+        """
+        if (num_rows > 0) and (num_data == 0):
+            raise ValueError("None of the {} rows of the table follow its header: add a rule "
+                             "after the header, or set `header_rows`".format(num_rows))
+        return
+
+
+def iter_latex_table(lines, clean=True, header_rows=None):
+    """Iterate over the rows of a LaTeX table, yielding the cells of each row.
+
+    See `LatexTable`, which also gives the number of columns declared by the table.
+
+    Yields
+    ------
+    cells : list of str
+    header : bool
+        Whether this row is part of the column headers.
+
+    """
+    return iter(LatexTable(lines, clean=clean, header_rows=header_rows))
+
+
+def count_latex_columns(spec):
+    """Number of columns in a LaTeX column specification, e.g. 3 for 'l|cc', 'lp{2cm}r', '*{3}{c}'.
+
+    Rules ('|'), inter-column material ('@{...}', '!{...}'), declarations ('>{...}', '<{...}')
+    and optional arguments (e.g. 'S[table-format=1.2]') are not columns.
+    """
+    tokens = _spec_tokens(spec)
+    num = 0
+    ii = 0
+    while ii < len(tokens):
+        tok = tokens[ii]
+        ii += 1
+        if tok == '*':
+            reps, sub = tokens[ii:ii+2]
+            num += int(reps.strip('{} ')) * count_latex_columns(sub[1:-1])
+            ii += 2
+        elif tok in ['@', '!', '>', '<']:
+            ii += 1
+        elif tok in ['p', 'm', 'b', 'D']:
+            # Columns with arguments: 'p{width}', and 'D{sep}{sep}{places}' (dcolumn)
+            num += 1
+            ii += 3 if (tok == 'D') else 1
+        elif tok.isalpha():
+            num += 1
+    return num
+
+
+def _spec_tokens(spec):
+    """Split a column specification into single characters, and complete '{...}' and '[...]'.
+    """
+    tokens = []
+    close = None
+    depth = 0
+    for cc in spec:
+        if depth > 0:
+            tokens[-1] += cc
+            if (close == '}') and (cc == '{'):
+                depth += 1
+            elif cc == close:
+                depth -= 1
+        elif cc in '{[':
+            tokens.append(cc)
+            close = '}' if (cc == '{') else ']'
+            depth = 1
+        elif not cc.isspace():
+            tokens.append(cc)
+    return tokens
+
+
+def _column_spec_count(env, args):
+    """Number of columns declared by the arguments following '\\begin{env}', None if not given.
+    """
+    # Optional arguments are skipped, e.g. the position in '\begin{tabular}[t]{lcc}'
+    groups = [gg[1:-1] for gg in _spec_tokens(args) if gg.startswith('{')]
+    # 'tabular*' and 'tabularx' first take the width of the table
+    index = 1 if (env == 'tabular*') or (env == 'tabularx') else 0
+    if len(groups) <= index:
+        return None
+    return count_latex_columns(groups[index])
+
+
+def _split_row(row, clean):
+    row = row.strip()
+    if row.endswith('\\\\'):
+        row = row[:-2]
+    cells = [cc.strip() for cc in row.split('&')]
+    if clean:
+        cells = [clean_latex_cell(cc) for cc in cells]
+    return cells
+
+
+def clean_latex_cell(cell):
+    """Remove LaTeX math-mode, spacing and font commands from the contents of a single cell.
+
+    Uncertainties are converted to a standard form: symmetric errors to '±', and asymmetric errors
+    to '^{+hi}_{-lo}' so that they can be parsed with `split_value_error`.
+    """
+    cell = cell.strip()
+    match = _RE_MULTICOL.match(cell)
+    if match is not None:
+        cell = match.groups()[0]
+    cell = _RE_TEXT_CMD.sub(r'\1', cell)
+    cell = cell.replace('$', '').replace('\\,', '').replace('\\ ', ' ').replace('~', ' ')
+    cell = cell.replace('\\pm', '±')
+    cell = cell.replace('{', '').replace('}', '') if ('^' not in cell) else cell
+    cell = cell.strip()
+    if cell in MISSING_VALUES:
+        cell = ''
+    return cell
+
+
+def split_value_error(cell):
+    """Split a (cleaned) cell into a value and its lower and upper uncertainties.
+
+    e.g. '81±2' ==> ('81', '2', '2'); '7.2^{+0.1}_{-0.3}' ==> ('7.2', '0.3', '0.1');
+         '6.5' ==> ('6.5', '', '')
+
+    Returns
+    -------
+    val : str
+    err_lo : str
+    err_hi : str
+        Empty strings are returned for missing components.
+
+    """
+    match = _RE_ASYM_ERR.match(cell)
+    if match is not None:
+        val, err_hi, err_lo = [mm.strip(' {}') for mm in match.groups()]
+        return val, err_lo, err_hi
+
+    match = _RE_SYM_ERR.match(cell)
+    if match is not None:
+        val, err = [mm.strip() for mm in match.groups()]
+        return val, err, err
+
+    return cell.strip(), '', ''
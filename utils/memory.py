@@ -0,0 +1,237 @@
+"""Optional memory profiling of import tasks and catalog phases.
+
+When run with `--memory-profile`, the catalog records a `MemoryProfiler` phase around each task,
+and around `journal_entries`, `merge_duplicates` and `save_caches`.  For each phase, the following
+are added to the 'memory' section of the run report (see `utils.report`):
+    -   duration, and resident set size (RSS) at the start and end of the phase,
+    -   peak RSS of the process so far,
+    -   peak traced (`tracemalloc`) memory during the phase, and the top allocation sites
+        (`--memory-top`) at its end,
+    -   the number of resident entries and stubs, their estimated total size (from the deep size
+        of a sample of entries), and the memory per 1,000 entries.
+Phases may be nested (e.g. `journal_entries` within a task), in which case the peak memory of the
+inner phase is included in that of the outer one.  Each thread has its own stack of phases, so that
+tasks running concurrently (see `scheduler`) each record their own phase; `tracemalloc` traces the
+whole process though, so the peak traced memory of phases which overlap in time includes the
+allocations of all of them.
+
+Without `--memory-profile`, phases are no-ops and `tracemalloc` is not started.
+
+"""
+import sys
+import time
+import threading
+import tracemalloc
+from contextlib import contextmanager
+
+from astrocats.blackholes.columnar import PhotometryColumns
+
+__all__ = ["MemoryProfiler", "deep_sizeof"]
+
+_MB = 1024.0**2
+# Number of (non-stub) entries whose size is measured, to estimate the size of all entries
+_SAMPLE_ENTRIES = 200
+# Default number of allocation sites reported for each phase
+_NUM_TOP = 10
+
+
+class MemoryProfiler:
+    """Record memory use around phases of the catalog import.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+    report : `utils.RunReport`
+        Report to which each phase record is appended (in the 'memory' section).
+    enabled : bool
+    num_top : int
+        Number of `tracemalloc` allocation sites reported for each phase.
+
+    """
+
+    SECTION = 'memory'
+
+    def __init__(self, catalog, report, enabled=False, num_top=_NUM_TOP):
+        self.catalog = catalog
+        self.report = report
+        self.enabled = enabled
+        self.num_top = _NUM_TOP if (num_top is None) else num_top
+        # Stack of open phases in each thread (by thread identifier)
+        self._stacks = {}
+        self._lock = threading.RLock()
+        if enabled and not tracemalloc.is_tracing():
+            tracemalloc.start()
+        return
+
+    @contextmanager
+    def phase(self, name):
+        """Context manager recording a single phase.
+        """
+        rec = self.start(name)
+        try:
+            yield rec
+        finally:
+            self.stop(rec)
+
+    def start(self, name):
+        """Start recording the named phase, returns the phase record (None if not enabled).
+        """
+        if not self.enabled:
+            return None
+
+        with self._lock:
+            stack = self._stacks.setdefault(threading.get_ident(), [])
+            # Peak memory up to now belongs to the enclosing phase
+            peak = tracemalloc.get_traced_memory()[1]
+            if len(stack):
+                stack[-1]['traced_peak'] = max(stack[-1]['traced_peak'], peak)
+            self._reset_peak(stack)
+
+            rec = dict(phase=name, depth=len(stack), rss_start_mb=_rss_mb(),
+                       traced_peak=0, _start=time.monotonic())
+            stack.append(rec)
+        return rec
+
+    def stop(self, rec):
+        """Finish recording the given phase, and add it to the run report.
+        """
+        if rec is None:
+            return
+        with self._lock:
+            stack = self._stack_of(rec)
+            if stack is None:
+                return
+            # Close any phases which were left open within this one (e.g. after an error)
+            while stack[-1] is not rec:
+                self.stop(stack[-1])
+            stack.pop()
+
+            peak = max(rec.pop('traced_peak'), tracemalloc.get_traced_memory()[1])
+            self._reset_peak(stack)
+            if len(stack):
+                stack[-1]['traced_peak'] = max(stack[-1]['traced_peak'], peak)
+
+        rec['duration'] = time.monotonic() - rec.pop('_start')
+        rec['rss_end_mb'] = _rss_mb()
+        rec['rss_peak_mb'] = _rss_peak_mb()
+        rec['traced_peak_mb'] = peak / _MB
+        rec['top_allocations'] = self._top_allocations()
+        rec.update(self._entry_stats())
+
+        self.catalog.log.info("Memory: '{}' rss={:.1f} MB, peak traced={:.1f} MB, "
+                              "entries={}".format(rec['phase'], rec['rss_end_mb'] or 0.0,
+                                                  rec['traced_peak_mb'], rec['entries']))
+        self.report.append(self.SECTION, rec)
+        return
+
+    def stop_all(self):
+        """Finish recording all open phases (of all threads).
+        """
+        with self._lock:
+            for stack in list(self._stacks.values()):
+                if len(stack):
+                    self.stop(stack[0])
+        return
+
+    def _stack_of(self, rec):
+        for stack in self._stacks.values():
+            if any(rr is rec for rr in stack):
+                return stack
+        return None
+
+    def _reset_peak(self, stack):
+        # Other threads' open phases still need the peak up to now
+        if not any(len(ss) for ss in self._stacks.values() if ss is not stack):
+            tracemalloc.reset_peak()
+        return
+
+    def _top_allocations(self):
+        if self.num_top <= 0:
+            return []
+        stats = tracemalloc.take_snapshot().filter_traces([
+            tracemalloc.Filter(False, tracemalloc.__file__),
+        ]).statistics('lineno')
+        top = []
+        for stat in stats[:self.num_top]:
+            frame = stat.traceback[0]
+            top.append(dict(site="{}:{}".format(frame.filename, frame.lineno),
+                            size_mb=stat.size / _MB, count=stat.count))
+        return top
+
+    def _entry_stats(self):
+        """Number of resident entries and stubs, and their estimated total size.
+        """
+        entries = self.catalog.entries
+        if hasattr(entries, 'resident_entries'):
+            entries = entries.resident_entries()
+        else:
+            # Entries may be added by other (concurrently running) tasks
+            with self.catalog.entries_lock:
+                entries = dict(entries)
+
+        names = []
+        num_stubs = 0
+        for name, entry in entries.items():
+            if entry._stub:
+                num_stubs += 1
+            else:
+                names.append(name)
+
+        num = len(names)
+        size = 0.0
+        if num > 0:
+            step = max(num // _SAMPLE_ENTRIES, 1)
+            sample = names[::step]
+            seen = set()
+            sample_size = sum(deep_sizeof(entries[nn], seen) for nn in sample)
+            size = sample_size * num / len(sample)
+
+        return dict(entries=num, stubs=num_stubs, entries_size_mb=size / _MB,
+                    mb_per_1000_entries=(1000 * size / num / _MB) if num else None)
+
+
+def deep_sizeof(obj, seen=None):
+    """Approximate size in bytes of the given object and all of its contents.
+
+    Only the contents of containers (and photometry tables) are followed, not other attributes,
+    so that references to e.g. the catalog are not counted.  Objects in `seen` are not counted
+    again (e.g. interned strings shared between entries).
+    """
+    if seen is None:
+        seen = set()
+    if id(obj) in seen:
+        return 0
+    seen.add(id(obj))
+
+    size = sys.getsizeof(obj)
+    if isinstance(obj, dict):
+        size += sum(deep_sizeof(kk, seen) + deep_sizeof(vv, seen) for kk, vv in obj.items())
+    elif isinstance(obj, (list, tuple, set, frozenset)):
+        size += sum(deep_sizeof(vv, seen) for vv in obj)
+    elif isinstance(obj, PhotometryColumns):
+        size += deep_sizeof(obj._layouts, seen) + deep_sizeof(obj._columns, seen)
+
+    return size
+
+
+def _rss_mb():
+    """Current resident set size of this process [MB], or None if it is not available.
+    """
+    try:
+        import psutil
+        return psutil.Process().memory_info().rss / _MB
+    except Exception:
+        return None
+
+
+def _rss_peak_mb():
+    """Peak resident set size of this process [MB], or None if it is not available.
+    """
+    try:
+        import resource
+        peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    except Exception:
+        return None
+    # Linux returns units of kilobytes, OSX of bytes
+    unit = _MB if sys.platform == 'darwin' else 1024.0
+    return peak / unit
@@ -0,0 +1,121 @@
+"""Finding duplicate entries with a union-find over their names, aliases and identifiers.
+
+The base `Catalog.merge_duplicates` compares the names and aliases of every entry with those of
+every later entry, which grows quadratically with the size of the catalog.  Instead,
+`find_duplicates` makes a single pass over all entries, assigning each identifier (name, alias,
+or extra alias, see `identifier_key`) to the first entry which has it, and joining every later
+entry with the same identifier to that entry in a `DisjointSets` (union-find) structure.  The
+connected components with more than one entry are the groups of duplicates, which
+`BlackholeCatalog.merge_duplicates` then merges once each.  Entries are joined transitively: if
+'A' shares an alias with 'B', and 'B' with 'C', all three are merged.
+
+Identifiers are compared in the form given by `catalog.clean_entry_name` (e.g. 'NGC 4258',
+'NGC4258' and 'N4258' are the same), with equivalent survey prefixes replaced (e.g.
+'SDSS J003500.42+003914.4' and 'SDSS003500.42+003914.4').  Case is ignored only in the prefixes
+of known catalogues (e.g. 'Mrk 110' and 'MRK110'): elsewhere, designations which differ only in
+case may be different objects, so they are not merged.
+
+"""
+import re
+from collections import OrderedDict
+
+__all__ = ["DisjointSets", "identifier_key", "find_duplicates"]
+
+# Prefixes of catalogue designations, which are compared ignoring case (e.g. 'Mrk' and 'MRK'),
+# when followed by the number or coordinates of the object
+_CATALOGUE_PREFIX = re.compile(
+    r'^(NGC|IC|UGC|PGC|MCG|ESO|MRK|ARK|AKN|PG|SDSS|2MASX|2MASS|3C|4C|PKS|HE|1RXS|RX)'
+    r'(?=[0-9+\-J])', re.IGNORECASE)
+
+# Equivalent forms of identifier prefixes, applied to keys after `clean_entry_name`
+_IDENTIFIER_FORMS = [
+    # 'SDSSJhhmmss.ss+ddmmss.s' --> 'SDSShhmmss.ss+ddmmss.s'
+    [re.compile(r'^SDSS[Jj]([0-9])'), r'SDSS\1'],
+]
+
+
+class DisjointSets:
+    """Union-find over the integers `0 ... size-1`, with path halving and union by size.
+
+    Arguments
+    ---------
+    size : int
+        Number of elements, each initially in its own set.
+
+    """
+
+    def __init__(self, size):
+        self._parent = list(range(size))
+        self._size = [1] * size
+        return
+
+    def __len__(self):
+        return len(self._parent)
+
+    def find(self, ii):
+        """Representative element of the set containing `ii`.
+        """
+        parent = self._parent
+        while parent[ii] != ii:
+            parent[ii] = parent[parent[ii]]
+            ii = parent[ii]
+        return ii
+
+    def union(self, ii, jj):
+        """Join the sets containing `ii` and `jj`, returning the representative of the union.
+        """
+        ii = self.find(ii)
+        jj = self.find(jj)
+        if ii == jj:
+            return ii
+        if self._size[ii] < self._size[jj]:
+            ii, jj = jj, ii
+        self._parent[jj] = ii
+        self._size[ii] += self._size[jj]
+        return ii
+
+    def groups(self, min_size=1):
+        """Elements of each set with at least `min_size` elements, each list in ascending order.
+        """
+        groups = OrderedDict()
+        for ii in range(len(self._parent)):
+            groups.setdefault(self.find(ii), []).append(ii)
+        return [gg for gg in groups.values() if len(gg) >= min_size]
+
+
+def identifier_key(catalog, alias):
+    """Form of a name or alias used to compare identifiers between entries.
+    """
+    key = catalog.clean_entry_name(str(alias).strip())
+    key = _CATALOGUE_PREFIX.sub(lambda match: match.group(1).upper(), key)
+    for regex, replace in _IDENTIFIER_FORMS:
+        key = regex.sub(replace, key)
+    return key
+
+
+def find_duplicates(catalog):
+    """Groups of entries which share any name, alias or extra alias (see `identifier_key`).
+
+    Returns
+    -------
+    groups : list of (list of str)
+        Names of the entries in each group of (two or more) duplicates, each group in the order
+        of `catalog.entries`.
+
+    """
+    names = list(catalog.entries.keys())
+    sets = DisjointSets(len(names))
+    # Index of the first entry with each identifier, and the keys of already seen aliases
+    owners = {}
+    keys = {}
+    for ii, name in enumerate(names):
+        entry = catalog.entries[name]
+        for alias in entry.get_aliases() + entry.extra_aliases():
+            key = keys.get(alias)
+            if key is None:
+                key = keys[alias] = identifier_key(catalog, alias)
+            owner = owners.setdefault(key, ii)
+            if owner != ii:
+                sets.union(owner, ii)
+
+    return [[names[ii] for ii in gg] for gg in sets.groups(min_size=2)]
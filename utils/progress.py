@@ -0,0 +1,208 @@
+"""Progress reporting shared by all tasks.
+
+Tasks create a progress object with `task_progress(catalog, total)` and call `update()` for each
+row processed.  Depending on the `--progress` argument, progress is shown as:
+    'bar'  : an interactive `tqdm` progress bar,
+    'log'  : periodic, structured log lines (suitable for non-TTY batch logs), e.g.
+             "progress task=shen_2008 count=12000 total=77429 pct=15.5 rate=1523.4/s
+              elapsed=7.9s eta=42.9s"
+    'none' : nothing at all, `update()` is a no-op,
+    'auto' : (default) 'bar' if stderr is a terminal, otherwise 'log' if the catalog is run with
+             `--verbose` or `--debug`, and 'none' if not (progress lines are 'info' messages,
+             which are only shown at those verbosities).
+
+The clock is not read on every `update()`; instead the number of updates between checks is
+adapted to the current rate, so the per-row cost is only an addition and a comparison.
+
+"""
+import abc
+import sys
+import time
+
+__all__ = ["PROGRESS_MODE", "task_progress"]
+
+
+class PROGRESS_MODE:
+    AUTO = "auto"
+    BAR = "bar"
+    LOG = "log"
+    NONE = "none"
+
+
+# Default time (seconds) between progress log lines
+_LOG_INTERVAL = 10.0
+# Time (seconds) between progress bar refreshes
+_BAR_INTERVAL = 0.2
+# Number of clock checks per reporting interval
+_CHECKS_PER_INTERVAL = 10
+
+
+def task_progress(catalog, total=None, desc=None, initial=0, unit='rows'):
+    """Construct a progress reporter for the current task, based on the catalog arguments.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+    total : int or None
+        Expected number of updates (if known).
+    desc : str or None
+        Description, by default the current task string (bar) or task name (log).
+    initial : int
+        Starting count, e.g. when resuming a task.
+    unit : str
+
+    """
+    args = catalog.args
+    mode = getattr(args, 'progress', None) or PROGRESS_MODE.AUTO
+    if mode == PROGRESS_MODE.NONE:
+        return _NullProgress()
+
+    if mode == PROGRESS_MODE.AUTO:
+        if sys.stderr.isatty():
+            mode = PROGRESS_MODE.BAR
+        elif getattr(args, 'verbose', False) or getattr(args, 'debug', False):
+            mode = PROGRESS_MODE.LOG
+        else:
+            return _NullProgress()
+
+    if mode == PROGRESS_MODE.BAR:
+        if desc is None:
+            desc = catalog.get_current_task_str()
+        return _BarProgress(desc, total, initial=initial, unit=unit)
+
+    if mode == PROGRESS_MODE.LOG:
+        # Log lines are 'key=value' pairs, so use the (whitespace free) task name by default
+        if desc is None:
+            desc = catalog.current_task.name
+        interval = getattr(args, 'progress_interval', None) or _LOG_INTERVAL
+        return _LogProgress(desc, total, catalog.log, interval=interval, initial=initial, unit=unit)
+
+    raise ValueError("Unrecognized progress mode '{}'!".format(mode))
+
+
+class _NullProgress:
+    """Progress reporter which does nothing.
+    """
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+        return False
+
+    def update(self, num=1):
+        return
+
+    def iter(self, iterable):
+        """Yield from `iterable`, calling `update()` for each element.
+        """
+        for item in iterable:
+            yield item
+            self.update()
+        return
+
+    def close(self):
+        return
+
+
+class _Progress(_NullProgress, abc.ABC):
+    """Base class for time-throttled progress reporters, which implement `_report`.
+    """
+
+    def __init__(self, desc, total, interval, initial=0, unit='rows'):
+        self.desc = desc
+        self.total = total
+        self.interval = interval
+        self.unit = unit
+        self.initial = initial
+        self.count = initial
+        self._start = time.monotonic()
+        self._last = self._start
+        self._next_check = initial + 1
+        self._closed = False
+        return
+
+    def update(self, num=1):
+        self.count += num
+        if self.count >= self._next_check:
+            self._check()
+        return
+
+    def close(self):
+        if self._closed:
+            return
+        self._closed = True
+        self._report(time.monotonic(), final=True)
+        return
+
+    def _check(self):
+        now = time.monotonic()
+        if now - self._last >= self.interval:
+            self._report(now)
+            self._last = now
+
+        # Choose the number of updates until the clock is checked again
+        rate = self._rate(now)
+        stride = int(rate * self.interval / _CHECKS_PER_INTERVAL)
+        self._next_check = self.count + max(stride, 1)
+        return
+
+    def _rate(self, now):
+        dur = now - self._start
+        if dur <= 0.0:
+            return 0.0
+        return (self.count - self.initial) / dur
+
+    @abc.abstractmethod
+    def _report(self, now, final=False):
+        """Show the current progress (at time `now`), and finish if `final`.
+        """
+        return
+
+
+class _LogProgress(_Progress):
+    """Emit structured progress lines to the log.
+    """
+
+    def __init__(self, desc, total, log, **kwargs):
+        kwargs.setdefault('interval', _LOG_INTERVAL)
+        super().__init__(desc, total, **kwargs)
+        self.log = log
+        return
+
+    def _report(self, now, final=False):
+        elapsed = now - self._start
+        rate = self._rate(now)
+        items = ["task={}".format(self.desc), "count={}".format(self.count)]
+        if self.total:
+            items.append("total={}".format(self.total))
+            items.append("pct={:.1f}".format(100.0 * self.count / self.total))
+        items.append("rate={:.1f}/s".format(rate))
+        items.append("elapsed={:.1f}s".format(elapsed))
+        if self.total and (rate > 0.0) and not final:
+            items.append("eta={:.1f}s".format(max(self.total - self.count, 0) / rate))
+        if final:
+            items.append("done")
+
+        self.log.info("progress " + " ".join(items))
+        return
+
+
+class _BarProgress(_Progress):
+    """Interactive `tqdm` progress bar, refreshed at most every `_BAR_INTERVAL` seconds.
+    """
+
+    def __init__(self, desc, total, **kwargs):
+        import tqdm
+        kwargs.setdefault('interval', _BAR_INTERVAL)
+        super().__init__(desc, total, **kwargs)
+        self._bar = tqdm.tqdm(desc=desc, total=total, initial=self.initial, unit=self.unit,
+                              dynamic_ncols=True)
+        return
+
+    def _report(self, now, final=False):
+        self._bar.update(self.count - self._bar.n)
+        if final:
+            self._bar.close()
+        return
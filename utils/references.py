@@ -0,0 +1,101 @@
+"""Resolution of literature references (ADS and arXiv URLs) to the parameters of sources.
+
+Several tasks cite the same few papers for many entries (e.g. a reference per table row), and
+previously each parsed the bibcode or arXiv ID out of every reference URL itself.  Instead:
+    -   `parse_reference_url` determines the bibcode or arXiv ID of an abstract URL, memoized,
+        so that each distinct URL is only parsed once,
+    -   `ReferenceResolver`, shared by all tasks as `catalog.references`, caches the parameters
+        of each distinct reference (name, URL, bibcode and arXiv ID), with their strings interned
+        (see `StringInterner`), and adds them to entries with `ReferenceResolver.add_source`.
+`Source` objects themselves are not shared: each entry numbers its own sources (their 'alias'),
+so `Entry.add_source` is still called once per entry, with the cached parameters.
+
+"""
+import re
+from functools import lru_cache
+
+from astrocats.catalog.struct import SOURCE
+from astrocats.catalog.utils import decode_url
+
+__all__ = ["parse_reference_url", "ReferenceResolver"]
+
+# New-style arXiv identifiers, e.g. '1304.7762' or '0901.1234v2'
+_ARXIV_REGEX = re.compile(r"^[0-9]{4}\.[0-9]{4,5}(v[0-9]+)?$")
+
+
+@lru_cache(maxsize=None)
+def parse_reference_url(url):
+    """Bibcode or arXiv ID of a reference, from its abstract URL (at ADS or arXiv).
+
+    e.g. 'http://adsabs.harvard.edu/abs/2001A%26A...371..409B' gives the (URL-decoded) bibcode
+    '2001A&A...371..409B', and 'https://arxiv.org/abs/1304.7762' the arXiv ID '1304.7762'.
+
+    Returns
+    -------
+    bibcode : str or None
+    arxivid : str or None
+
+    """
+    if (not url) or ('/abs/' not in url):
+        return None, None
+    code = re.split(r"[?#]", url.split('/abs/', 1)[1])[0].strip().strip('/')
+    if not len(code):
+        return None, None
+    if ('arxiv.org' in url.lower()) or _ARXIV_REGEX.match(code):
+        return None, code
+    # Newer ADS URLs may have a trailing page, e.g. '.../abs/2013ApJ...764..184M/abstract'
+    return decode_url(code.split('/')[0]), None
+
+
+class ReferenceResolver:
+    """Parameters of `Entry.add_source` for each reference, resolved once for all tasks.
+
+    Arguments
+    ---------
+    interner : `StringInterner` or None
+        Used to share the strings of each reference with the rest of the catalog.
+
+    """
+
+    def __init__(self, interner=None):
+        self.interner = interner
+        self._sources = {}
+        return
+
+    def __len__(self):
+        return len(self._sources)
+
+    def source_kwargs(self, url=None, name=None, bibcode=None, arxivid=None):
+        """Parameters of `Entry.add_source` for a reference (a new dict for each call).
+
+        A bibcode or arXiv ID which is not given is determined from the URL, if possible (see
+        `parse_reference_url`).
+        """
+        key = (url, name, bibcode, arxivid)
+        kwargs = self._sources.get(key)
+        if kwargs is None:
+            kwargs = self._sources.setdefault(key, self._resolve(url, name, bibcode, arxivid))
+        return dict(kwargs)
+
+    def add_source(self, entry, url=None, name=None, bibcode=None, arxivid=None, **kwargs):
+        """Add a reference as a source of `entry`, returning its alias (None on failure).
+
+        Additional `kwargs` are passed on to `Entry.add_source`.
+        """
+        src_kw = self.source_kwargs(url=url, name=name, bibcode=bibcode, arxivid=arxivid)
+        src_kw.update(kwargs)
+        return entry.add_source(**src_kw)
+
+    def _resolve(self, url, name, bibcode, arxivid):
+        # e.g. `numpy.str_` values are stored as plain strings
+        url = str(url).strip() if url else None
+        url_bib, url_arx = parse_reference_url(url)
+        bibcode = decode_url(bibcode.strip()) if bibcode else url_bib
+        arxivid = arxivid.strip() if arxivid else url_arx
+
+        kwargs = {}
+        for key, val in [(SOURCE.NAME, name), (SOURCE.URL, url),
+                         (SOURCE.BIBCODE, bibcode), (SOURCE.ARXIVID, arxivid)]:
+            if val:
+                kwargs[key] = val if (self.interner is None) else self.interner.intern(val)
+        return kwargs
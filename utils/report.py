@@ -0,0 +1,71 @@
+"""Machine-readable report of an import run.
+
+Components of the catalog add their own sections (e.g. 'memory', see `utils.memory`) to the
+catalog's `RunReport`, which is written to 'output/run-report.json'.  The report is re-written
+whenever a section is updated, so that it is available even if the run is killed part way through.
+Updates may come from tasks running concurrently, so they are serialized.
+
+"""
+import os
+import json
+import time
+import threading
+from collections import OrderedDict
+
+__all__ = ["RunReport"]
+
+
+class RunReport:
+    """Sections of the report of the current run, saved to a JSON file on each update.
+
+    Arguments
+    ---------
+    path : str
+        Filename of the report.
+
+    """
+
+    def __init__(self, path):
+        self.path = path
+        self.data = OrderedDict()
+        self.data['started'] = time.strftime("%Y-%m-%dT%H:%M:%S")
+        self._lock = threading.RLock()
+        return
+
+    def __getitem__(self, section):
+        return self.data[section]
+
+    def __contains__(self, section):
+        return section in self.data
+
+    def set(self, section, value, save=True):
+        """Set the value of the given section (replacing any previous value).
+        """
+        with self._lock:
+            self.data[section] = value
+            if save:
+                self.save()
+        return
+
+    def append(self, section, value, save=True):
+        """Append a value to the given (list) section.
+        """
+        with self._lock:
+            self.data.setdefault(section, []).append(value)
+            if save:
+                self.save()
+        return
+
+    def save(self):
+        """Write the report, replacing the file only once it is complete.
+        """
+        with self._lock:
+            path_dir = os.path.dirname(self.path)
+            if len(path_dir) and not os.path.isdir(path_dir):
+                os.makedirs(path_dir)
+
+            temp = self.path + '.tmp'
+            with open(temp, 'w') as out:
+                json.dump(self.data, out, indent=2)
+            os.replace(temp, self.path)
+        return
@@ -0,0 +1,156 @@
+"""Concurrent, shallow cloning and updating of the catalog's data repositories.
+
+Each repository (see 'input/repos.json') is handled in its own thread, calling the `git` command
+line tool:
+    -   missing repositories are cloned (shallow by default, `depth`, and optionally partial, e.g.
+        `filter_spec='blob:none'`) into a temporary directory, which is renamed once complete, so
+        that an interrupted clone is never mistaken for a finished one,
+    -   existing repositories are compared to their remote with `git ls-remote`, and are skipped if
+        already current; otherwise the new commits are fetched (to the same depth) and checked out
+        with `git reset --keep`, which preserves (non-conflicting) uncommitted changes.
+Repositories with local commits, or directories which are not git repositories, are left alone.
+
+"""
+import os
+import shutil
+import subprocess
+import time
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+__all__ = ["REPO_ACTION", "sync_repos"]
+
+
+class REPO_ACTION:
+    CLONED = "cloned"
+    UPDATED = "updated"
+    CURRENT = "current"
+    SKIPPED = "skipped"
+    FAILED = "failed"
+
+
+# Suffix of the temporary directory used while cloning
+_PARTIAL_SUFFIX = ".partial"
+
+
+def sync_repos(paths, url_template, log, depth=1, filter_spec=None, update=True, workers=4,
+               timeout=None):
+    """Clone missing repositories, and update existing ones, concurrently.
+
+    Arguments
+    ---------
+    paths : list of str
+        Absolute paths of each repository.
+    url_template : str
+        Remote URL of each repository, formatted with the repository (directory) name,
+        e.g. "https://github.com/astrocatalogs/{}.git".
+    log : `logging.Logger`
+    depth : int or None
+        History depth for clones and fetches, None (or <= 0) for the full history.
+    filter_spec : str or None
+        Object filter for partial clones, e.g. 'blob:none'.
+    update : bool
+        Whether existing repositories are updated.
+    workers : int
+        Maximum number of repositories handled at the same time.
+    timeout : float or None
+        Timeout (seconds) for each `git` command.
+
+    Returns
+    -------
+    results : `OrderedDict`
+        For each path, a dict with the 'action' taken (one of `REPO_ACTION`), the resulting 'sha',
+        a 'message' and the 'duration' in seconds.
+
+    """
+    depth = depth if ((depth is not None) and (depth > 0)) else None
+    workers = max(min(workers, len(paths)), 1)
+    results = OrderedDict()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        futures = OrderedDict()
+        for path in paths:
+            url = url_template.format(os.path.basename(os.path.normpath(path)))
+            futures[path] = pool.submit(_sync_repo, path, url, depth, filter_spec, update, timeout)
+
+        for path, fut in futures.items():
+            try:
+                res = fut.result()
+            except (OSError, subprocess.SubprocessError) as err:
+                msg = getattr(err, 'stderr', None) or str(err)
+                res = dict(action=REPO_ACTION.FAILED, sha=None, message=str(msg).strip(),
+                           duration=None)
+
+            log_func = log.error if (res['action'] == REPO_ACTION.FAILED) else log.info
+            log_func("Repo '{}': {}{}".format(
+                path, res['action'], (": " + res['message']) if res['message'] else ""))
+            results[path] = res
+
+    return results
+
+
+def _sync_repo(path, url, depth, filter_spec, update, timeout):
+    beg = time.monotonic()
+    if not os.path.exists(path):
+        _clone(path, url, depth, filter_spec, timeout)
+        action, msg = REPO_ACTION.CLONED, None
+    elif not os.path.isdir(os.path.join(path, '.git')):
+        action, msg = REPO_ACTION.SKIPPED, "not a git repository"
+    elif not update:
+        action, msg = REPO_ACTION.SKIPPED, "updates disabled"
+    else:
+        action, msg = _update(path, depth, timeout)
+
+    sha = _git(['rev-parse', 'HEAD'], path, timeout) if (action != REPO_ACTION.SKIPPED) else None
+    return dict(action=action, sha=sha, message=msg, duration=time.monotonic() - beg)
+
+
+def _clone(path, url, depth, filter_spec, timeout):
+    temp = path.rstrip(os.sep) + _PARTIAL_SUFFIX
+    if os.path.exists(temp):
+        shutil.rmtree(temp)
+
+    args = ['clone', '--quiet']
+    if depth is not None:
+        args.append('--depth={}'.format(depth))
+    if filter_spec is not None:
+        args.append('--filter={}'.format(filter_spec))
+    args.extend([url, temp])
+    _git(args, None, timeout)
+    os.rename(temp, path)
+    return
+
+
+def _update(path, depth, timeout):
+    branch = _git(['rev-parse', '--abbrev-ref', 'HEAD'], path, timeout)
+    if branch == 'HEAD':
+        return REPO_ACTION.SKIPPED, "detached HEAD"
+
+    local = _git(['rev-parse', 'HEAD'], path, timeout)
+    remote = _git(['ls-remote', 'origin', 'refs/heads/' + branch], path, timeout).split()
+    if not len(remote):
+        return REPO_ACTION.SKIPPED, "branch '{}' not found on remote".format(branch)
+    if remote[0] == local:
+        return REPO_ACTION.CURRENT, None
+
+    # Don't discard commits which have not been pushed
+    tracking = _git(['rev-parse', '--verify', '--quiet', 'origin/' + branch], path, timeout,
+                    check=False)
+    if tracking != local:
+        return REPO_ACTION.SKIPPED, "has local commits"
+
+    args = ['fetch', '--quiet']
+    if depth is not None:
+        args.append('--depth={}'.format(depth))
+    args.extend(['origin', branch])
+    _git(args, path, timeout)
+    _git(['reset', '--quiet', '--keep', 'FETCH_HEAD'], path, timeout)
+    return REPO_ACTION.UPDATED, "{} --> {}".format(local[:8], remote[0][:8])
+
+
+def _git(args, cwd, timeout, check=True):
+    """Run a `git` command, and return its (stripped) standard output.
+    """
+    env = dict(os.environ, GIT_TERMINAL_PROMPT='0')
+    proc = subprocess.run(['git'] + args, cwd=cwd, env=env, timeout=timeout, check=check,
+                          stdout=subprocess.PIPE, stderr=subprocess.PIPE, universal_newlines=True)
+    return proc.stdout.strip()
@@ -0,0 +1,256 @@
+"""Retries with backoff, and a per-host circuit breaker, for downloads of remote inputs.
+
+Every download made by the catalog (`BlackholeCatalog.download_url`, used by `load_url`) and by
+`AsyncFetcher` (used by `fetch_to_cache`) goes through the catalog's `RemoteInputs`:
+    -   requests use a short connect timeout, so that an unreachable host fails quickly,
+    -   failures which may be transient (connection errors, timeouts, and HTTP statuses in
+        `RETRY_STATUSES`) are retried, after an exponentially increasing delay with random
+        jitter (or the server's 'Retry-After', if given), up to the policy's number of attempts,
+    -   the number of retries for each host during a task is limited by the policy's `budget`,
+    -   after `threshold` consecutive failed requests to a host, its circuit breaker opens: no
+        further requests are made to that host for the rest of the task, so that the task
+        continues from cached files only (see `Catalog.load_url` and `fetch_to_cache`).
+Policies can be set for individual hosts.  Retry budgets and circuit breakers are reset at the
+start of each task.
+
+"""
+import time
+import random
+import asyncio
+import threading
+from urllib.parse import urlparse
+
+__all__ = ["RETRY_STATUSES", "RetryPolicy", "RemoteInputs", "CircuitOpenError"]
+
+# HTTP statuses which are retried (all others fail immediately)
+RETRY_STATUSES = frozenset([408, 429, 500, 502, 503, 504])
+
+
+class CircuitOpenError(RuntimeError):
+    """A request was not made because the circuit breaker of its host is open.
+    """
+    pass
+
+
+class RetryPolicy:
+    """Timeouts, retries and backoff for requests to a single host.
+
+    Arguments
+    ---------
+    attempts : int
+        Maximum number of attempts for each request.
+    backoff : float
+        Delay before the first retry [seconds], doubled for each further retry.
+    max_backoff : float
+        Maximum delay before any retry [seconds].
+    jitter : float
+        Fraction of each delay which is random, between 0 (fixed delays) and 1.
+    connect_timeout : float
+        Time allowed to establish each connection [seconds].
+    read_timeout : float
+        Time allowed for the response [seconds].
+    budget : int
+        Maximum number of retries for this host during each task.
+
+    """
+
+    def __init__(self, attempts=4, backoff=1.0, max_backoff=30.0, jitter=0.5, connect_timeout=10.0,
+                 read_timeout=60.0, budget=20):
+        self.attempts = attempts
+        self.backoff = backoff
+        self.max_backoff = max_backoff
+        self.jitter = jitter
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.budget = budget
+        return
+
+    def delay(self, attempt, retry_after=None):
+        """Delay [seconds] before retrying, after the given (zero-based) attempt failed.
+        """
+        delay = min(self.backoff * 2**attempt, self.max_backoff)
+        delay *= 1.0 - self.jitter * random.random()
+        if retry_after is not None:
+            delay = max(delay, min(retry_after, self.max_backoff))
+        return delay
+
+
+class RemoteInputs:
+    """Retry policies and circuit breakers for all hosts.
+
+    Arguments
+    ---------
+    log : `logging.Logger` or None
+    policy : `RetryPolicy` or None
+        Default policy.
+    host_policies : dict
+        `RetryPolicy` for individual hosts (network locations, e.g. 'www.astro.gsu.edu').
+    threshold : int
+        Number of consecutive failed requests to a host after which its circuit breaker opens.
+
+    """
+
+    def __init__(self, log=None, policy=None, host_policies={}, threshold=3):
+        self.log = log
+        self.default_policy = RetryPolicy() if (policy is None) else policy
+        self.host_policies = dict(host_policies)
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self.reset()
+        return
+
+    def reset(self):
+        """Reset the retry budgets and circuit breakers of all hosts (e.g. for a new task).
+        """
+        with self._lock:
+            self._failures = {}
+            self._retries = {}
+            self._open = set()
+        return
+
+    def policy(self, url):
+        return self.host_policies.get(_host(url), self.default_policy)
+
+    def is_open(self, url):
+        """Whether the circuit breaker for the host of this URL is open (i.e. requests are skipped).
+        """
+        return _host(url) in self._open
+
+    def check(self, url):
+        """Raise `CircuitOpenError` if requests to the host of this URL are currently skipped.
+        """
+        if self.is_open(url):
+            raise CircuitOpenError("Skipping '{}': too many failures for host '{}'".format(
+                url, _host(url)))
+        return
+
+    def next_delay(self, url, attempt, err):
+        """Delay before retrying the request which failed with `err`, or None to give up.
+
+        Giving up is recorded as a failure of the host (if the error is one of the host).
+        """
+        policy = self.policy(url)
+        host = _host(url)
+        retry = _is_transient(err) and (attempt + 1 < policy.attempts) and not self.is_open(url)
+        with self._lock:
+            if retry and self._retries.get(host, 0) >= policy.budget:
+                retry = False
+                self._warn("Retry budget ({}) exhausted for host '{}'".format(policy.budget, host))
+            if retry:
+                self._retries[host] = self._retries.get(host, 0) + 1
+
+        if not retry:
+            self.record_failure(url, err)
+            return None
+
+        delay = policy.delay(attempt, _retry_after(err))
+        self._warn("Request for '{}' failed ({}), retrying in {:.1f} s".format(
+            url, str(err) or type(err).__name__, delay))
+        return delay
+
+    def record_success(self, url):
+        with self._lock:
+            self._failures[_host(url)] = 0
+        return
+
+    def record_failure(self, url, err):
+        """Record a failed request, opening the circuit breaker after repeated host failures.
+        """
+        # Errors such as '404 Not Found' mean that the host itself is working
+        if not _is_transient(err):
+            return
+        host = _host(url)
+        with self._lock:
+            self._failures[host] = self._failures.get(host, 0) + 1
+            if (self._failures[host] < self.threshold) or (host in self._open):
+                return
+            self._open.add(host)
+
+        self._warn("{} consecutive failures for host '{}', using cached files only for the rest "
+                   "of this task".format(self.threshold, host))
+        return
+
+    def request(self, url, post=None, verify=True, timeout=None, headers=None):
+        """Download the text of the given URL, retrying transient failures.
+
+        `timeout` limits the read timeout of the host's policy.  Raises `CircuitOpenError` if the
+        host's circuit breaker is open, and otherwise the error of the last attempt on failure.
+        """
+        import requests
+        policy = self.policy(url)
+        read_timeout = policy.read_timeout
+        if timeout is not None:
+            read_timeout = min(read_timeout, timeout)
+
+        attempt = 0
+        while True:
+            self.check(url)
+            try:
+                if post:
+                    response = requests.post(url, data=post, headers=headers, verify=verify,
+                                             timeout=(policy.connect_timeout, read_timeout))
+                else:
+                    response = requests.get(url, headers=headers, verify=verify,
+                                            timeout=(policy.connect_timeout, read_timeout))
+                response.raise_for_status()
+                for xx in response.history:
+                    xx.raise_for_status()
+                text = response.text
+            except (KeyboardInterrupt, SystemExit):
+                raise
+            except Exception as err:
+                delay = self.next_delay(url, attempt, err)
+                if delay is None:
+                    raise
+                time.sleep(delay)
+                attempt += 1
+                continue
+
+            self.record_success(url)
+            return text
+
+    def _warn(self, msg):
+        if self.log is not None:
+            self.log.warning(msg)
+        return
+
+
+def _host(url):
+    return urlparse(url).netloc
+
+
+def _status(err):
+    """HTTP status of a failed request (`requests` or `aiohttp`), or None if there isn't one.
+    """
+    response = getattr(err, 'response', None)
+    status = getattr(response, 'status_code', None)
+    if status is None:
+        status = getattr(err, 'status', None)
+    return status
+
+
+def _is_transient(err):
+    """Whether the error may be temporary (connection errors, timeouts and some HTTP statuses).
+    """
+    if isinstance(err, CircuitOpenError):
+        return False
+    status = _status(err)
+    if status is not None:
+        return status in RETRY_STATUSES
+    # `requests` exceptions derive from `OSError`; `aiohttp` connection errors don't all do
+    if isinstance(err, (OSError, asyncio.TimeoutError)):
+        return True
+    name = type(err).__name__
+    return ('Connection' in name) or ('Timeout' in name) or ('Disconnected' in name)
+
+
+def _retry_after(err):
+    """Delay [seconds] requested by the server with a 'Retry-After' header, if any.
+    """
+    headers = getattr(getattr(err, 'response', None), 'headers', None)
+    if headers is None:
+        headers = getattr(err, 'headers', None)
+    try:
+        return float(headers.get('Retry-After'))
+    except (AttributeError, TypeError, ValueError):
+        return None
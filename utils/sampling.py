@@ -0,0 +1,157 @@
+"""Deterministic sampling of input rows for quick (e.g. 'travis' or smoke-test) runs.
+
+Each task creates a `RowSampler` and asks it whether to keep each row.  Rows are selected by
+hashing a stable key for the row (e.g. its name) together with the seed, so the same rows are
+chosen on every run, independently of the ordering of the input file.
+
+Rows can instead be assigned to a 'stratum' (e.g. the emission line used for a virial mass).
+Within each stratum, rows are selected systematically: every `1/fraction`-th row (in input
+order, starting at an offset given by the seed), so that each stratum is represented in
+proportion to its size (to within a row), and the first rows of each stratum are always kept, so
+that every part of a table is exercised.
+
+Settings are taken from the catalog arguments:
+    `--sample N`            : keep approximately `N` rows per task
+    `--sample-fraction f`   : keep a fraction `f` of rows per task
+    `--sample-seed S`       : seed for the row selection
+    `--travis`              : if no other sampling is given, equivalent to
+                              `--sample TRAVIS_QUERY_LIMIT`
+
+"""
+import zlib
+
+__all__ = ["RowSampler"]
+
+
+class RowSampler:
+    """Choose which input rows to load, deterministically.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+        Sampling settings are taken from `catalog.args`.
+    total : int or None
+        (Expected) total number of rows.  Required to convert `--sample N` into a fraction, if it
+        is not given then the first `N` rows are kept.
+    min_per_stratum : int
+        Always keep at least this many rows of each stratum.
+
+    """
+
+    def __init__(self, catalog, total=None, min_per_stratum=1):
+        args = catalog.args
+        num = getattr(args, 'sample', None)
+        fraction = getattr(args, 'sample_fraction', None)
+        self.seed = getattr(args, 'sample_seed', 0)
+
+        if (num is not None) and (fraction is not None):
+            raise ValueError("Cannot use both `--sample` and `--sample-fraction`!")
+
+        # `travis` mode is only a (small) default sample
+        if (num is None) and (fraction is None) and getattr(args, 'travis', False):
+            num = catalog.TRAVIS_QUERY_LIMIT
+
+        if (num is not None) and (num <= 0):
+            raise ValueError("`--sample` must be positive, not '{}'!".format(num))
+        if (fraction is not None) and not (0.0 < fraction <= 1.0):
+            raise ValueError("`--sample-fraction` must be in (0.0, 1.0], not '{}'!".format(fraction))
+
+        if (num is not None) and (total is not None) and (total > 0):
+            fraction = min(1.0, num / total)
+            num = None
+
+        self.num = num
+        self.fraction = fraction
+        self.total = total
+        self.min_per_stratum = min_per_stratum
+        self.count = 0
+        # Number of rows selected, and seen, in each stratum
+        self._strata = {}
+        self._seen = {}
+        return
+
+    def __repr__(self):
+        return "RowSampler(num={}, fraction={}, seed={}, count={})".format(
+            self.num, self.fraction, self.seed, self.count)
+
+    @property
+    def active(self):
+        """Whether sampling is being performed (i.e. not all rows are kept).
+        """
+        return (self.num is not None) or (self.fraction is not None and self.fraction < 1.0)
+
+    @property
+    def done(self):
+        """Whether no more rows will be selected (only possible when keeping the first `num`).
+        """
+        return (self.num is not None) and (self.count >= self.num)
+
+    def keep(self, key, stratum=None):
+        """Determine whether the row identified by `key` should be loaded.
+
+        Arguments
+        ---------
+        key : str or int
+            Stable identifier for this row, e.g. the object name or row number.
+        stratum : hashable or None
+            Group to which this row belongs.
+
+        Returns
+        -------
+        keep : bool
+
+        """
+        if not self.active:
+            return True
+
+        if self.num is not None:
+            select = (self.count < self.num)
+        elif stratum is not None:
+            seen = self._seen.get(stratum, 0)
+            self._seen[stratum] = seen + 1
+            if self._strata.get(stratum, 0) < self.min_per_stratum:
+                select = True
+            else:
+                # Select whenever `seen * fraction` (offset by the seed) passes an integer
+                offset = self._unit_hash(stratum)
+                select = (int((seen + 1) * self.fraction + offset) >
+                          int(seen * self.fraction + offset))
+        else:
+            select = (self._unit_hash(key) < self.fraction)
+
+        if select:
+            self.count += 1
+            if stratum is not None:
+                self._strata[stratum] = self._strata.get(stratum, 0) + 1
+
+        return select
+
+    def get_state(self):
+        """Return the (JSON serializable) selection state, e.g. to store in a checkpoint.
+        """
+        return {'count': self.count, 'strata': dict(self._strata), 'seen': dict(self._seen)}
+
+    def set_state(self, state):
+        """Restore the selection state from `get_state()`.
+        """
+        self.count = state['count']
+        self._strata = dict(state['strata'])
+        self._seen = dict(state.get('seen', {}))
+        return
+
+    def summary(self):
+        """Return a string describing the rows that were selected.
+        """
+        msg = "Sampled {} rows".format(self.count)
+        if self.total is not None:
+            msg += " of {}".format(self.total)
+        if len(self._strata):
+            msg += " (strata: {})".format(", ".join(
+                "{}: {}".format(kk, vv) for kk, vv in sorted(self._strata.items(), key=str)))
+        return msg
+
+    def _unit_hash(self, key):
+        """Map the given key (and seed) to a number in [0.0, 1.0), the same on every run.
+        """
+        val = "{}:{}".format(self.seed, key).encode('utf-8')
+        return zlib.crc32(val) / 2**32
@@ -0,0 +1,179 @@
+"""Strict or deferred (batch) schema validation of additions to entries.
+
+By default ('strict'), every quantity, photometry point and source is validated against the schema
+(see `schema/bh_blackhole.json`) as soon as it is constructed, i.e. on every `add_quantity`,
+`add_photometry` and `add_source` call.  For trusted inputs this is mostly overhead, so with
+`--validation deferred` (all tasks) or `--validation archived` (only tasks loading archived data,
+see `Task.load_archive`), construction skips validation, and the new structures are instead
+validated together in one batch:
+    -   before entries are journaled (saved), i.e. in `BlackholeCatalog.journal_entries`, and
+    -   at the end of each task.
+All failures in a batch are logged together, and then (following the catalog's
+`ADDITION_FAILURE_BEHAVIOR`) a single error is raised for all of them.
+
+Deferral works through `ValidationHook`, a mixin overriding `validate` of the catalog's own
+structure classes (e.g. `blackhole.BlackholeQuantity`), which `Blackhole` entries construct instead
+of the generic ones; other users of `pyastroschema` structures are not affected.  The hook checks
+the state of the current thread: whether validation of this structure is skipped (see
+`validation_skipped`), or deferred (see `DeferredValidation.begin`), and otherwise validates as
+usual.  Deferral or skipping in one thread thus never affects other threads, e.g. tasks running
+concurrently.
+
+"""
+import threading
+from contextlib import contextmanager
+
+from astrocats.catalog import utils
+from astrocats.catalog.struct import ENTRY
+
+__all__ = ["VALIDATION", "DeferredValidation", "ValidationHook", "validation_skipped"]
+
+
+class VALIDATION:
+    STRICT = "strict"
+    DEFERRED = "deferred"
+    ARCHIVED = "archived"
+
+
+# Maximum number of individual failures logged for each batch
+_MAX_LOGGED = 100
+
+# Validation state of each thread: `skip` (keys of structures not to validate, see
+# `validation_skipped`), and `pending` (list of deferred structures, or None) of the
+# `DeferredValidation` in `deferral`
+_local = threading.local()
+
+
+class ValidationHook:
+    """Mixin for structures whose `validate` follows the validation state of the current thread.
+
+    Must precede the structure class in the bases, e.g. `blackhole.BlackholeQuantity`.
+    """
+
+    def validate(self):
+        skip = getattr(_local, 'skip', None)
+        key = getattr(self, '_key', None)
+        if skip and (key in skip):
+            skip.remove(key)
+            return
+        pending = getattr(_local, 'pending', None)
+        if pending is not None:
+            pending.append(self)
+            return
+        return super().validate()
+
+
+class DeferredValidation:
+    """Control deferral of schema validation for each task, and validate deferred structures.
+
+    Arguments
+    ---------
+    catalog : `BlackholeCatalog`
+
+    """
+
+    def __init__(self, catalog):
+        self.catalog = catalog
+        self.log = catalog.log
+        self.mode = getattr(catalog.args, 'validation', None) or VALIDATION.STRICT
+        if self.mode not in [VALIDATION.STRICT, VALIDATION.DEFERRED, VALIDATION.ARCHIVED]:
+            raise ValueError("Unrecognized validation mode '{}'!".format(self.mode))
+
+        return
+
+    @property
+    def active(self):
+        """Whether validation is deferred in the current thread.
+        """
+        return getattr(_local, 'deferral', None) is self
+
+    def begin(self, task):
+        """Start the given task, deferring validation if required by the validation mode.
+        """
+        self.end()
+        if self.mode == VALIDATION.STRICT:
+            return
+        if (self.mode == VALIDATION.ARCHIVED) and not task.load_archive(self.catalog.args):
+            return
+
+        self.log.info("Deferring validation for task '{}'".format(task.name))
+        # Structures constructed (but not yet validated) by this thread while deferral is active
+        _local.pending = []
+        _local.deferral = self
+        return
+
+    def end(self):
+        """Validate all deferred structures, and restore immediate validation in this thread.
+        """
+        try:
+            self.flush()
+        finally:
+            if self.active:
+                _local.pending = None
+                _local.deferral = None
+        return
+
+    def flush(self):
+        """Validate all structures constructed (in this thread) since the last flush.
+
+        All failures are reported together.
+        """
+        if (not self.active) or (not len(_local.pending)):
+            return
+
+        pending = _local.pending
+        _local.pending = []
+        failures = []
+        for struct in pending:
+            try:
+                super(ValidationHook, struct).validate()
+            except Exception as err:
+                failures.append((struct, err))
+
+        self.log.debug("Validated {} deferred structures, {} failures".format(
+            len(pending), len(failures)))
+        if not len(failures):
+            return
+
+        for struct, err in failures[:_MAX_LOGGED]:
+            # Use only the short message of `jsonschema.ValidationError`s
+            msg = getattr(err, 'message', str(err))
+            self.log.warning("Validation failed for {}: {}".format(_describe(struct), msg))
+        if len(failures) > _MAX_LOGGED:
+            self.log.warning("... and {} more".format(len(failures) - _MAX_LOGGED))
+
+        msg = "{} of {} deferred additions failed validation!".format(len(failures), len(pending))
+        if self.catalog.ADDITION_FAILURE_BEHAVIOR == utils.ADD_FAIL_ACTION.RAISE:
+            self.log.raise_error(msg, ValueError)
+        self.log.warning(msg)
+        return
+
+
+@contextmanager
+def validation_skipped(keys):
+    """Skip schema validation of the next structure constructed for each of `keys`.
+
+    Used when the data have already been validated, e.g. by the compiled validators in
+    `schema_validators` (see `Blackhole.add_quantity`): only the structure(s) constructed from
+    those data (a `ValidationHook`, stored under the given key of an entry) are not validated,
+    any others are.  Only applies to the current thread, and within this context (an inner
+    context replaces the keys of an outer one).
+    """
+    outer = getattr(_local, 'skip', None)
+    _local.skip = list(keys)
+    try:
+        yield
+    finally:
+        _local.skip = outer
+
+
+def _describe(struct):
+    """Short description of a structure (and the entry it belongs to) for error messages.
+    """
+    desc = "{}({})".format(type(struct).__name__, dict(struct))
+    if len(desc) > 200:
+        desc = desc[:197] + "..."
+    parent = getattr(struct, '_parent', None)
+    if isinstance(parent, dict) and (ENTRY.NAME in parent):
+        desc = "'{}' {}".format(parent[ENTRY.NAME], desc)
+    return desc